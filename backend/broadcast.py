@@ -0,0 +1,325 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import or_, select, true, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+try:
+    from .db import run_in_session
+    from .metrics import BROADCAST_MESSAGES
+    from .models import Broadcast, User
+    from .telegram_api import RateLimiter, TelegramAPIError, TelegramClient, TelegramNetworkError
+except ImportError:  # running as single-folder (no package)
+    from db import run_in_session
+    from metrics import BROADCAST_MESSAGES
+    from models import Broadcast, User
+    from telegram_api import RateLimiter, TelegramAPIError, TelegramClient, TelegramNetworkError
+
+logger = logging.getLogger(__name__)
+
+# Recipients (users with notifications_enabled) are read in keyset chunks of BROADCAST_CHUNK
+# in id order, never all at once; progress is checkpointed after every chunk, so a crashed
+# run resends at most one chunk when it is resumed.
+BROADCAST_CHUNK = int(os.getenv("BROADCAST_CHUNK", "100"))
+# A run holds its broadcast for BROADCAST_LEASE_SEC, renewed at every checkpoint. When a
+# worker dies the lease runs out and another worker (or the CLI) resumes the broadcast.
+BROADCAST_LEASE_SEC = float(os.getenv("BROADCAST_LEASE_SEC", "120"))
+# Share of the bot's global budget (TG_MAX_RPS in telegram_api.py, ~30/s allowed by Telegram)
+# used for broadcasts, so task checks still get through while one runs.
+BROADCAST_RPS = float(os.getenv("BROADCAST_RPS", "20"))
+# Telegram allows about one message per second to the same chat
+BROADCAST_CHAT_INTERVAL = float(os.getenv("BROADCAST_CHAT_INTERVAL", "1.0"))
+# Per message: 429 retries (after the whole bot paused for retry_after) and network error retries
+BROADCAST_RETRIES = int(os.getenv("BROADCAST_RETRIES", "5"))
+
+# Event broadcasts queued by the daily/weekly reset (weekly_reset, weekly_winner, daily_tasks)
+BROADCAST_EVENTS = {e.strip() for e in os.getenv("BROADCAST_EVENTS", "weekly_reset,weekly_winner").split(",") if e.strip()}
+
+MESSAGES: Dict[str, Dict[str, str]] = {
+    "weekly_reset": {
+        "en": "🏁 A new weekly leaderboard has started! Tap to climb to the top.",
+        "tr": "🏁 Yeni haftalık sıralama başladı! Zirveye çıkmak için hemen tap'le.",
+    },
+    "weekly_winner": {
+        "en": "🏆 You won last week's leaderboard! 0.5 TON credit has been added to your balance.",
+        "tr": "🏆 Geçen haftanın birincisi sensin! Bakiyene 0.5 TON kredi eklendi.",
+    },
+    "daily_tasks": {
+        "en": "✅ Daily tasks have been refreshed. Claim today's rewards!",
+        "tr": "✅ Günlük görevler yenilendi. Bugünün ödüllerini al!",
+    },
+}
+
+Recipient = Tuple[int, int, str]  # (user id, telegram_id, language)
+
+
+# -------------------- DB side (sync, run via run_in_session) --------------------
+def enqueue_broadcast(
+    db: Session,
+    kind: str,
+    text: Optional[Dict[str, str]] = None,
+    key: Optional[str] = None,
+    user_id: Optional[int] = None,
+) -> Optional[Broadcast]:
+    """Queues a broadcast in db's transaction (the caller commits); None if `key` is already queued.
+
+    Keyed (event) broadcasts are inserted with ON CONFLICT (key) DO NOTHING: two workers
+    running the same reset must not fail the request that triggered it.
+    """
+    body = json.dumps(text or MESSAGES[kind], ensure_ascii=False)
+    if key is None:
+        bc = Broadcast(kind=kind, text=body, user_id=user_id)
+        db.add(bc)
+        db.flush()
+        return bc
+    dialect = db.get_bind().dialect.name
+    if dialect in ("postgresql", "sqlite"):
+        if dialect == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert as upsert
+        else:
+            from sqlalchemy.dialects.sqlite import insert as upsert
+        stmt = (
+            upsert(Broadcast)
+            .values(kind=kind, key=key, text=body, user_id=user_id)
+            .on_conflict_do_nothing(index_elements=[Broadcast.key])
+            .returning(Broadcast.id)
+        )
+        new_id = db.execute(stmt).scalar()
+        return db.get(Broadcast, new_id) if new_id is not None else None
+    # Other backends: a savepoint keeps the caller's transaction usable after a duplicate
+    if db.query(Broadcast.id).filter(Broadcast.key == key).first() is not None:
+        return None
+    try:
+        with db.begin_nested():
+            bc = Broadcast(kind=kind, key=key, text=body, user_id=user_id)
+            db.add(bc)
+    except IntegrityError:
+        return None
+    return bc
+
+
+def runnable_broadcasts(db: Session) -> List[int]:
+    """Unfinished broadcasts nobody holds a live lease on (new ones and crashed runs)."""
+    now = datetime.utcnow()
+    q = (
+        select(Broadcast.id)
+        .where(Broadcast.status != "done", or_(Broadcast.lease_until.is_(None), Broadcast.lease_until < now))
+        .order_by(Broadcast.id)
+    )
+    return list(db.execute(q).scalars())
+
+
+def _claim(db: Session, broadcast_id: int, owner: str) -> Optional[Broadcast]:
+    now = datetime.utcnow()
+    res = db.execute(
+        update(Broadcast)
+        .where(
+            Broadcast.id == broadcast_id,
+            Broadcast.status != "done",
+            or_(Broadcast.lease_until.is_(None), Broadcast.lease_until < now, Broadcast.owner == owner),
+        )
+        .values(owner=owner, lease_until=now + timedelta(seconds=BROADCAST_LEASE_SEC), status="running")
+    )
+    db.commit()
+    return db.get(Broadcast, broadcast_id) if res.rowcount == 1 else None
+
+
+def _recipients(db: Session, user_id: Optional[int], after_id: int, limit: int) -> List[Recipient]:
+    q = select(User.id, User.telegram_id, User.language).where(User.notifications_enabled == true(), User.id > after_id)
+    if user_id is not None:
+        q = q.where(User.id == user_id)
+    return [tuple(r) for r in db.execute(q.order_by(User.id).limit(limit))]
+
+
+def _checkpoint(
+    db: Session, broadcast_id: int, owner: str, last_user_id: int, counts: Dict[str, int], blocked_ids: List[int], done: bool
+) -> bool:
+    """Stores progress (only while `owner` still holds the lease); users who blocked the bot are opted out."""
+    now = datetime.utcnow()
+    values = dict(
+        last_user_id=last_user_id,
+        sent=Broadcast.sent + counts["sent"],
+        failed=Broadcast.failed + counts["failed"],
+        blocked=Broadcast.blocked + counts["blocked"],
+        lease_until=now + timedelta(seconds=BROADCAST_LEASE_SEC),
+    )
+    if done:
+        values.update(status="done", finished_at=now, owner=None, lease_until=None)
+    res = db.execute(update(Broadcast).where(Broadcast.id == broadcast_id, Broadcast.owner == owner).values(**values))
+    if res.rowcount != 1:
+        db.rollback()
+        return False
+    if blocked_ids:
+        db.execute(update(User).where(User.id.in_(blocked_ids)).values(notifications_enabled=False))
+    db.commit()
+    return True
+
+
+def _release(db: Session, broadcast_id: int, owner: str) -> None:
+    db.execute(update(Broadcast).where(Broadcast.id == broadcast_id, Broadcast.owner == owner).values(owner=None, lease_until=None))
+    db.commit()
+
+
+# -------------------- Sending --------------------
+class ChatRateLimiter:
+    """Spaces messages to the same chat at least `interval` seconds apart."""
+
+    def __init__(self, interval: float, max_chats: int = 100_000):
+        self.interval = interval
+        self.max_chats = max_chats
+        self._next: Dict[int, float] = {}
+
+    async def wait(self, chat_id: int) -> None:
+        if self.interval <= 0:
+            return
+        now = time.monotonic()
+        at = self._next.get(chat_id, 0.0)
+        self._next[chat_id] = max(now, at) + self.interval
+        if len(self._next) > self.max_chats:
+            self._next = {c: t for c, t in self._next.items() if t > now}
+        if at > now:
+            await asyncio.sleep(at - now)
+
+
+class BroadcastRunner:
+    """Sends queued broadcasts through a pooled TelegramClient.
+
+    Global rate: BROADCAST_RPS here, under the client's per-token limit, which every
+    sender shares and which a 429 pauses for retry_after. Per chat: BROADCAST_CHAT_INTERVAL.
+    """
+
+    def __init__(self, client: TelegramClient, chunk: int = BROADCAST_CHUNK, rps: float = BROADCAST_RPS):
+        self.client = client
+        self.chunk = chunk
+        self.owner = f"{os.getpid()}-{uuid.uuid4().hex[:12]}"
+        self.rate = RateLimiter(rps)
+        self.chats = ChatRateLimiter(BROADCAST_CHAT_INTERVAL)
+
+    async def run(self, broadcast_id: int) -> Optional[Dict[str, int]]:
+        """Sends (or resumes) one broadcast; returns its totals, or None if it is done or held by another worker."""
+        bc = await run_in_session(_claim, broadcast_id, self.owner)
+        if bc is None:
+            return None
+        texts = json.loads(bc.text)
+        after = bc.last_user_id
+        totals = {"sent": bc.sent, "failed": bc.failed, "blocked": bc.blocked}
+        try:
+            while True:
+                rows = await run_in_session(_recipients, bc.user_id, after, self.chunk)
+                outcomes = await asyncio.gather(
+                    *(self._send(bc.kind, telegram_id, texts.get(lang) or texts["en"]) for _, telegram_id, lang in rows)
+                )
+                counts = {k: outcomes.count(k) for k in totals}
+                blocked_ids = [row[0] for row, outcome in zip(rows, outcomes) if outcome == "blocked"]
+                if rows:
+                    after = rows[-1][0]
+                done = len(rows) < self.chunk
+                if not await run_in_session(_checkpoint, bc.id, self.owner, after, counts, blocked_ids, done):
+                    logger.warning("broadcast %s: lease lost, another worker took over", bc.id)
+                    return None
+                for k in totals:
+                    totals[k] += counts[k]
+                if done:
+                    return totals
+        except asyncio.CancelledError:
+            # Shutdown: hand the broadcast back right away instead of waiting for the lease to run out
+            await asyncio.shield(run_in_session(_release, bc.id, self.owner))
+            raise
+
+    async def _send(self, kind: str, chat_id: int, text: str) -> str:
+        await self.chats.wait(chat_id)
+        await self.rate.wait()
+        outcome = "failed"
+        for attempt in range(BROADCAST_RETRIES + 1):
+            try:
+                await self.client.call("sendMessage", retries=BROADCAST_RETRIES, chat_id=chat_id, text=text)
+                outcome = "sent"
+            except TelegramAPIError as e:
+                # 403: the user blocked the bot (or deleted the account)
+                outcome = "blocked" if e.data.get("error_code") == 403 else "failed"
+            except TelegramNetworkError as e:
+                if attempt < BROADCAST_RETRIES:
+                    await asyncio.sleep(min(0.5 * 2 ** attempt, 30.0))
+                    continue
+                logger.warning("broadcast message to %s failed: %s", chat_id, e)
+            break
+        BROADCAST_MESSAGES.inc(kind, outcome)
+        return outcome
+
+
+async def run_pending(runner: BroadcastRunner) -> int:
+    """Runs every runnable broadcast (queued or abandoned); returns how many were finished."""
+    finished = 0
+    for broadcast_id in await run_in_session(runnable_broadcasts):
+        if await runner.run(broadcast_id) is not None:
+            finished += 1
+    return finished
+
+
+# -------------------- CLI --------------------
+def _queue(db: Session, text: Dict[str, str]) -> int:
+    bc = enqueue_broadcast(db, "custom", text=text)
+    db.commit()
+    return bc.id
+
+
+def _status(db: Session) -> List[Broadcast]:
+    return db.query(Broadcast).order_by(Broadcast.id.desc()).limit(20).all()
+
+
+async def _cli(args) -> None:
+    if args.status:
+        for bc in await run_in_session(_status):
+            print(
+                f"{bc.id:>5} {bc.kind:<14} {bc.status:<8} sent={bc.sent} failed={bc.failed}"
+                f" blocked={bc.blocked} last_user_id={bc.last_user_id}"
+            )
+        return
+
+    token = os.getenv("TELEGRAM_BOT_TOKEN", "")
+    if not token:
+        raise SystemExit("TELEGRAM_BOT_TOKEN is not set")
+    client = TelegramClient(token)
+    runner = BroadcastRunner(client)
+    try:
+        if args.text:
+            text = {"en": args.text}
+            if args.text_tr:
+                text["tr"] = args.text_tr
+            ids = [await run_in_session(_queue, text)]
+        else:
+            ids = await run_in_session(runnable_broadcasts)
+        for broadcast_id in ids:
+            t0 = time.perf_counter()
+            totals = await runner.run(broadcast_id)
+            elapsed = time.perf_counter() - t0
+            if totals is None:
+                print(f"broadcast {broadcast_id}: done or running elsewhere")
+                continue
+            print(f"broadcast {broadcast_id}: {totals} in {elapsed:.1f}s ({totals['sent'] / max(elapsed, 1e-9):.1f} msg/s)")
+    finally:
+        await client.aclose()
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Send a message to every opted-in user, or resume unfinished broadcasts.")
+    ap.add_argument("--text", help="message to queue and send (English / fallback text)")
+    ap.add_argument("--text-tr", help="Turkish text for users with language=tr")
+    ap.add_argument("--status", action="store_true", help="list recent broadcasts")
+    args = ap.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    asyncio.run(_cli(args))
+
+
+if __name__ == "__main__":
+    main()
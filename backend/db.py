@@ -1,30 +1,387 @@
+import asyncio
 import os
-from sqlalchemy import create_engine
+import time
+from typing import Any, Callable, Dict, Optional, Union
+
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.engine import URL, make_url
 from sqlalchemy.orm import declarative_base, sessionmaker
+from sqlalchemy.pool import QueuePool
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import Request
+
+try:
+    from .metrics import DB_READ_SESSIONS
+except ImportError:  # running as single-folder (no package)
+    from metrics import DB_READ_SESSIONS
 
 # Railway'de env değişkeni olarak DATABASE_URL tanımlıysa onu kullanır,
 # yoksa local için sqlite dosyası oluşturur.
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./taptoearnton.db")
 
-# SQLite ise check_same_thread ayarı gerekiyor
-connect_args = {"check_same_thread": False} if DATABASE_URL.startswith("sqlite") else {}
+# Async sürücülü bir URL (postgresql+asyncpg://, sqlite+aiosqlite://) async engine'i seçer;
+# diğer URL'ler eski sync engine + threadpool yolunu kullanır.
+ASYNC_DRIVERS = ("+asyncpg", "+aiosqlite", "+psycopg_async")
+DB_ASYNC = any(d in DATABASE_URL.split("://", 1)[0] for d in ASYNC_DRIVERS)
+
+# -------------------- Engine profile --------------------
+# DB_PROFILE=tuned aşağıdaki ayarları uygular; legacy = SQLAlchemy varsayılanları
+# (pool 5 + 10 overflow, pragma yok, SQLite rollback journal), karşılaştırma için.
+DB_PROFILE = os.getenv("DB_PROFILE", "tuned")
+# Pool (QueuePool drivers). Unset = by backend: 20 + 20 overflow on server databases (room
+# for the threadpool's 40 workers), 5 + 5 on SQLite (one writer at a time, more connections
+# only add busy-wait retries; see bench/bench_db_profile.py --direct)
+DB_POOL_SIZE = os.getenv("DB_POOL_SIZE", "")
+DB_MAX_OVERFLOW = os.getenv("DB_MAX_OVERFLOW", "")
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+# Server databases only: test connections on checkout and replace them before proxies /
+# PgBouncer / the server drop idle ones (seconds, -1 = never)
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "1") == "1"
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+# Postgres statement_timeout per connection (ms, 0 = off)
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "5000"))
+# SQLite pragmas, set on every new connection. WAL: readers no longer block the writer;
+# synchronous=NORMAL is durable across app crashes (fsync at checkpoints, not every commit).
+SQLITE_JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+SQLITE_CACHE_SIZE = int(os.getenv("SQLITE_CACHE_SIZE", "-65536"))  # negative = KiB (64 MiB per connection)
+
+# busy_timeout first: switching to WAL needs a lock another process may hold
+SQLITE_PRAGMAS = {
+    "busy_timeout": SQLITE_BUSY_TIMEOUT_MS,
+    "journal_mode": SQLITE_JOURNAL_MODE,
+    "synchronous": SQLITE_SYNCHRONOUS,
+    "mmap_size": SQLITE_MMAP_SIZE,
+    "cache_size": SQLITE_CACHE_SIZE,
+}
+
+
+def engine_options(url: Union[str, URL]) -> Dict[str, Any]:
+    """create_engine / create_async_engine keyword arguments for url under DB_PROFILE."""
+    u = make_url(url)
+    backend = u.get_backend_name()
+    # SQLite ise check_same_thread ayarı gerekiyor
+    connect_args: Dict[str, Any] = {"check_same_thread": False} if backend == "sqlite" else {}
+    opts: Dict[str, Any] = {"connect_args": connect_args}
+    if DB_PROFILE == "legacy":
+        return opts
+    if issubclass(u.get_dialect().get_pool_class(u), QueuePool):  # not NullPool / SQLite :memory:
+        size, overflow = (5, 5) if backend == "sqlite" else (20, 20)
+        opts.update(
+            pool_size=int(DB_POOL_SIZE or size),
+            max_overflow=int(DB_MAX_OVERFLOW or overflow),
+            pool_timeout=DB_POOL_TIMEOUT,
+        )
+    if backend != "sqlite":
+        opts.update(pool_pre_ping=DB_POOL_PRE_PING, pool_recycle=DB_POOL_RECYCLE)
+    if backend == "postgresql" and DB_STATEMENT_TIMEOUT_MS > 0:
+        if u.get_driver_name() == "asyncpg":
+            connect_args["server_settings"] = {"statement_timeout": str(DB_STATEMENT_TIMEOUT_MS)}
+        else:  # psycopg2 / psycopg
+            connect_args["options"] = f"-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}"
+    return opts
+
+
+def tune_engine(eng) -> None:
+    """Registers the SQLite pragmas as a connect event on eng (sync engine or AsyncEngine.sync_engine)."""
+    if DB_PROFILE == "legacy" or eng.dialect.name != "sqlite":
+        return
+
+    @event.listens_for(eng, "connect")
+    def _set_pragmas(dbapi_conn, _record):
+        cur = dbapi_conn.cursor()
+        try:
+            for name, value in SQLITE_PRAGMAS.items():
+                cur.execute(f"PRAGMA {name}={value}")
+        finally:
+            cur.close()
+
 
-engine = create_engine(DATABASE_URL, connect_args=connect_args)
+def engine_settings(conn) -> Dict[str, Any]:
+    """Effective settings of conn's engine for the startup log: pool options + what the database reports."""
+    eng = conn.engine
+    opts = engine_options(eng.url)
+    out: Dict[str, Any] = {"profile": DB_PROFILE, "driver": f"{eng.dialect.name}+{eng.dialect.driver}"}
+    out["pool"] = type(eng.pool).__name__
+    out.update((k, v) for k, v in opts.items() if k != "connect_args")
+    if eng.dialect.name == "sqlite":
+        for name in SQLITE_PRAGMAS:
+            out[name] = conn.exec_driver_sql(f"PRAGMA {name}").scalar()
+    elif eng.dialect.name == "postgresql":
+        out["statement_timeout"] = conn.exec_driver_sql("SHOW statement_timeout").scalar()
+    return out
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+if DB_ASYNC:
+    from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+    async_engine = create_async_engine(DATABASE_URL, **engine_options(DATABASE_URL))
+    AsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+    # Sync facade of the async engine: for event listeners only, not for direct queries
+    engine = async_engine.sync_engine
+else:
+    AsyncSession = None
+    async_engine = None
+    AsyncSessionLocal = None
+    engine = create_engine(DATABASE_URL, **engine_options(DATABASE_URL))
+tune_engine(engine)
+
+# expire_on_commit=False: rows returned by UPDATE ... RETURNING stay usable after commit (no refresh SELECT)
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
 
 Base = declarative_base()
 
+# -------------------- Read replica --------------------
+# DATABASE_REPLICA_URL tanımlıysa salt okunur endpoint'ler (get_read_db) oradan okur.
+# Aynı sürücü türünde olmalı (DATABASE_URL async ise replica da async).
+DATABASE_REPLICA_URL = os.getenv("DATABASE_REPLICA_URL", "")
+# Read-your-writes: a user who wrote within this many seconds reads from the primary.
+# Keep it above REPLICA_MAX_LAG_SEC: beyond that lag every read goes to the primary anyway.
+REPLICA_READ_YOUR_WRITES_SEC = float(os.getenv("REPLICA_READ_YOUR_WRITES_SEC", "5"))
+REPLICA_MAX_LAG_SEC = float(os.getenv("REPLICA_MAX_LAG_SEC", "2"))
+REPLICA_ENABLED = bool(DATABASE_REPLICA_URL)
+
+if REPLICA_ENABLED:
+    if any(d in DATABASE_REPLICA_URL.split("://", 1)[0] for d in ASYNC_DRIVERS) != DB_ASYNC:
+        raise RuntimeError("DATABASE_REPLICA_URL must use the same (sync or async) driver kind as DATABASE_URL")
+    if DB_ASYNC:
+        async_replica_engine = create_async_engine(DATABASE_REPLICA_URL, **engine_options(DATABASE_REPLICA_URL))
+        AsyncReadSessionLocal = async_sessionmaker(
+            bind=async_replica_engine, autoflush=False, expire_on_commit=False, info={"read_only": True}
+        )
+        replica_engine = async_replica_engine.sync_engine
+    else:
+        async_replica_engine = None
+        AsyncReadSessionLocal = None
+        replica_engine = create_engine(DATABASE_REPLICA_URL, **engine_options(DATABASE_REPLICA_URL))
+    ReadSessionLocal = sessionmaker(
+        autocommit=False, autoflush=False, expire_on_commit=False, bind=replica_engine, info={"read_only": True}
+    )
+else:
+    async_replica_engine = async_engine
+    AsyncReadSessionLocal = AsyncSessionLocal
+    replica_engine = engine
+    ReadSessionLocal = SessionLocal
+
+
+def is_read_only(db) -> bool:
+    """True for replica sessions from get_read_db (must not write, not even ensure_resets)."""
+    return bool(db.info.get("read_only"))
+
+
+class ReplicaGuard:
+    """Staleness guard: decides per read whether the replica may answer it.
+
+    The primary answers for a key (telegram_id) that wrote within `window` seconds
+    (read-your-writes), and for everyone while the measured replica lag exceeds
+    `max_lag` or could not be measured. Write times are per process.
+    """
+
+    def __init__(self, window: float, max_lag: float, max_keys: int = 200_000, clock: Callable[[], float] = time.monotonic):
+        self.window = window
+        self.max_lag = max_lag
+        self.max_keys = max_keys
+        self.clock = clock  # seconds, monotonic (a fake clock in tests)
+        self.lag: Optional[float] = 0.0  # seconds; None = unknown (replica unreachable)
+        self._written: Dict[int, float] = {}  # key -> monotonic deadline
+
+    def note_write(self, key: Optional[int]) -> None:
+        if key is None or not REPLICA_ENABLED:
+            return
+        now = self.clock()
+        self._written[key] = now + self.window
+        if len(self._written) > self.max_keys:
+            # list(): a snapshot, other threads keep inserting while this filters
+            self._written = {k: t for k, t in list(self._written.items()) if t > now}
+
+    def primary_reason(self, key: Optional[int]) -> Optional[str]:
+        """Why this read must go to the primary, or None if the replica is fresh enough."""
+        if self.lag is None or self.lag > self.max_lag:
+            return "lag"
+        if key is not None:
+            deadline = self._written.get(key)
+            if deadline is not None:
+                if deadline > self.clock():
+                    return "recent_write"
+                # pop, not del: another threadpool reader may expire the same key
+                self._written.pop(key, None)
+        return None
+
+
+replica_guard = ReplicaGuard(REPLICA_READ_YOUR_WRITES_SEC, REPLICA_MAX_LAG_SEC)
+
+# Seconds since the last replayed transaction, 0 when the standby has replayed everything it received
+_PG_REPLICA_LAG = text(
+    "SELECT CASE WHEN NOT pg_is_in_recovery() OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0"
+    " ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END"
+)
+
+
+def _replica_lag(conn) -> float:
+    if conn.dialect.name != "postgresql":
+        return 0.0  # stand-in replicas (e.g. a second SQLite URL) have no replication lag to read
+    return float(conn.execute(_PG_REPLICA_LAG).scalar() or 0.0)
+
+
+async def measure_replica_lag() -> float:
+    if DB_ASYNC:
+        async with async_replica_engine.connect() as conn:
+            return await conn.run_sync(_replica_lag)
+
+    def _call():
+        with replica_engine.connect() as conn:
+            return _replica_lag(conn)
+
+    return await run_in_threadpool(_call)
+
 
 def init_db() -> None:
-    """Tüm tabloları oluşturur (yoksa)."""
+    """Tüm tabloları oluşturur (yoksa). Sadece sync engine için."""
     Base.metadata.create_all(bind=engine)
 
 
-def get_db():
-    """FastAPI Depends(get_db) için session generator."""
+# Connections opened at startup so the first requests skip connect (+ TLS / auth on Postgres)
+DB_POOL_PREWARM = int(os.getenv("DB_POOL_PREWARM", "5"))
+
+
+def _pool_prewarm_count(eng) -> int:
+    size = getattr(eng.pool, "size", None)  # QueuePool; SQLite memory / NullPool have no size
+    return min(DB_POOL_PREWARM, size()) if callable(size) else 0
+
+
+async def prewarm_pool() -> int:
+    """Opens up to DB_POOL_PREWARM pooled connections (primary and replica) at once; returns how many."""
+    targets = [(async_engine, engine)]
+    if replica_engine is not engine:
+        targets.append((async_replica_engine, replica_engine))
+    opened = 0
+    for async_eng, sync_eng in targets:
+        n = _pool_prewarm_count(sync_eng)
+        if n == 0:
+            continue
+        # Held together (not one after another) so the pool really ends up with n connections
+        if DB_ASYNC:
+            conns = await asyncio.gather(*(async_eng.connect().start() for _ in range(n)))
+            await asyncio.gather(*(conn.close() for conn in conns))
+        else:
+            conns = await asyncio.gather(*(run_in_threadpool(sync_eng.connect) for _ in range(n)))
+            for conn in conns:
+                conn.close()
+        opened += n
+    return opened
+
+
+async def ping() -> None:
+    """SELECT 1 on the primary (readiness check)."""
+    if DB_ASYNC:
+        async with async_engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+        return
+
+    def _call():
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+
+    await run_in_threadpool(_call)
+
+
+def lift_statement_timeout(conn) -> None:
+    """Turns DB_STATEMENT_TIMEOUT_MS off until conn's transaction ends (Connection or Session).
+
+    For migrations and whole-table jobs (rank index load, history prune), which take longer
+    than a request statement on a real-size table.
+    """
+    bind = conn.get_bind() if hasattr(conn, "get_bind") else conn
+    if bind.dialect.name == "postgresql":
+        conn.execute(text("SET LOCAL statement_timeout = 0"))
+
+
+async def run_on_connection(fn, *args):
+    """Runs fn(connection, *args) in one transaction on either engine (DDL / migrations)."""
+    if DB_ASYNC:
+        async with async_engine.begin() as conn:
+            return await conn.run_sync(fn, *args)
+
+    def _call():
+        with engine.begin() as conn:
+            return fn(conn, *args)
+
+    return await run_in_threadpool(_call)
+
+
+def _get_sync_db():
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
+
+
+async def _get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+# FastAPI Depends(get_db) için session generator (AsyncSession veya Session).
+get_db = _get_async_db if DB_ASYNC else _get_sync_db
+
+
+def _read_sessionmaker(request: Request):
+    if not REPLICA_ENABLED:
+        return AsyncSessionLocal if DB_ASYNC else SessionLocal
+    try:
+        key = int(request.query_params.get("telegram_id", ""))
+    except ValueError:
+        key = None
+    reason = replica_guard.primary_reason(key)
+    DB_READ_SESSIONS.inc("primary" if reason else "replica", reason or "fresh")
+    if reason:
+        return AsyncSessionLocal if DB_ASYNC else SessionLocal
+    return AsyncReadSessionLocal if DB_ASYNC else ReadSessionLocal
+
+
+def _get_sync_read_db(request: Request):
+    db = _read_sessionmaker(request)()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+async def _get_async_read_db(request: Request):
+    async with _read_sessionmaker(request)() as db:
+        yield db
+
+
+# Depends(get_read_db): read-only endpoints; the replica unless replica_guard sends the
+# caller (?telegram_id=...) to the primary.
+get_read_db = _get_async_read_db if DB_ASYNC else _get_sync_read_db
+
+
+async def run_db(db, fn, *args):
+    """Runs sync ORM code fn(session, *args) on a session from get_db.
+
+    AsyncSession: via run_sync (non-blocking driver I/O on the event loop).
+    Session: in the threadpool, as plain sync endpoints did.
+    """
+    if DB_ASYNC:
+        return await db.run_sync(fn, *args)
+    return await run_in_threadpool(fn, db, *args)
+
+
+async def run_in_session(fn, *args):
+    """Like run_db, but with a fresh session (background jobs)."""
+    if DB_ASYNC:
+        async with AsyncSessionLocal() as db:
+            return await db.run_sync(fn, *args)
+
+    def _call():
+        db = SessionLocal()
+        try:
+            return fn(db, *args)
+        finally:
+            db.close()
+
+    return await run_in_threadpool(_call)
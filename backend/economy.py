@@ -0,0 +1,76 @@
+from __future__ import annotations
+
+from math import isqrt
+from typing import Iterable, List, NamedTuple, Tuple
+
+# Game economy arithmetic on plain numbers (no ORM / DB access).
+# Level thresholds grow by LEVEL_XP_STEP per level (1000, 2000, 3000 ... xp) and tap power
+# upgrades by UPGRADE_COST_STEP per level (500, 1000, 1500 ... coins). Both are arithmetic
+# series, so "how many levels does this xp / balance buy" has a closed-form answer instead
+# of one loop step (or UPDATE) per level.
+LEVEL_XP_STEP = 1000
+LEVEL_UP_REWARD_TON = 0.1  # TON credit per level
+UPGRADE_COST_STEP = 500
+
+
+def series_sum(first, step: int, n: int):
+    """first + (first + step) + ... (n terms). `first` may also be a SQL column expression."""
+    return n * first + step * (n * (n - 1) // 2)
+
+
+def series_count(first: int, step: int, budget: int) -> int:
+    """Largest n >= 0 with series_sum(first, step, n) <= budget."""
+    if first <= 0 or step < 0:
+        raise ValueError("series needs first > 0 and step >= 0")
+    if budget < first:
+        return 0
+    if step == 0:
+        return budget // first
+    # Root of step*n^2 + (2*first - step)*n - 2*budget = 0; isqrt floors, the loops settle it exactly
+    b = 2 * first - step
+    n = max((isqrt(b * b + 8 * step * budget) - b) // (2 * step), 0)
+    while series_sum(first, step, n + 1) <= budget:
+        n += 1
+    while n > 0 and series_sum(first, step, n) > budget:
+        n -= 1
+    return n
+
+
+class LevelUp(NamedTuple):
+    levels: int  # levels gained
+    xp: int  # xp left after them
+    next_level_xp: int
+    xp_spent: int
+    ton: float  # TON credit earned
+
+
+def level_ups(xp: int, next_level_xp: int) -> LevelUp:
+    """Level-ups for a user holding `xp` who needs `next_level_xp` for the next level."""
+    if xp < next_level_xp:  # the common case
+        return LevelUp(0, xp, next_level_xp, 0, 0.0)
+    levels = series_count(next_level_xp, LEVEL_XP_STEP, xp)
+    spent = series_sum(next_level_xp, LEVEL_XP_STEP, levels)
+    return LevelUp(levels, xp - spent, next_level_xp + LEVEL_XP_STEP * levels, spent, level_up_reward(levels))
+
+
+def level_up_reward(levels: int) -> float:
+    return LEVEL_UP_REWARD_TON * levels
+
+
+def bulk_level_ups(rows: Iterable[Tuple[int, int, int]]) -> List[Tuple[int, LevelUp]]:
+    """(user_id, xp, next_level_xp) rows -> (user_id, LevelUp) for the users that level up."""
+    out = []
+    for user_id, xp, next_level_xp in rows:
+        if xp >= next_level_xp:
+            out.append((user_id, level_ups(xp, next_level_xp)))
+    return out
+
+
+def upgrade_cost(tap_power, count: int = 1):
+    """Coins for `count` tap power upgrades starting at `tap_power` (int or SQL column expression)."""
+    return UPGRADE_COST_STEP * series_sum(tap_power, 1, count)
+
+
+def max_upgrades(tap_power: int, coins: int) -> int:
+    """How many tap power upgrades `coins` buys starting at `tap_power`."""
+    return series_count(UPGRADE_COST_STEP * tap_power, UPGRADE_COST_STEP, coins)
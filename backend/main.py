@@ -2,47 +2,132 @@ from __future__ import annotations
 
 import os
 import json
-from datetime import datetime
-from typing import Optional, Dict, Any, List
-
-import requests
-from fastapi import FastAPI, Depends, HTTPException
-from fastapi.responses import FileResponse
+import base64
+import hmac
+import math
+import asyncio
+import logging
+import threading
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, time as dt_time
+from types import SimpleNamespace
+from typing import Optional, Dict, Any, List, Tuple
+
+from fastapi import FastAPI, Depends, HTTPException, WebSocket, WebSocketDisconnect
+from fastapi import Request, Response
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse
 from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel
-from sqlalchemy.orm import Session
+from sqlalchemy import BigInteger, String, and_, bindparam, case, func, literal, or_, select, update
+from sqlalchemy.orm import Session, contains_eager, object_session
+from starlette.concurrency import run_in_threadpool
 from zoneinfo import ZoneInfo
 
 try:
-    from .db import SessionLocal, engine, Base
-    from .models import User, AppState
+    from .broadcast import BROADCAST_EVENTS, BroadcastRunner, enqueue_broadcast, run_pending
+    from .db import engine, get_db, lift_statement_timeout, run_db, run_in_session, run_on_connection
+    from .db import REPLICA_ENABLED, get_read_db, is_read_only, measure_replica_lag, replica_engine, replica_guard
+    from .db import engine_settings, ping as db_ping, prewarm_pool
+    from .metrics import METRICS_ENABLED, METRICS_TOKEN, RESET_DURATION, RESET_LOCK_BUSY, RESET_RUNS, WS_CONNECTIONS, WS_TAPS
+    from .metrics import DB_REPLICA_LAG, TAP_LIMITED, TAP_LIMITED_REQUESTS
+    from .economy import bulk_level_ups, level_up_reward, level_ups, max_upgrades, upgrade_cost
+    from .metrics import MetricsMiddleware, instrument_engine
+    from .metrics import render as render_metrics
+    from .migrations import check_schema, prepare_schema
+    from .models import User, UserStats, AppState, TaskStatus, WeeklyScore
+    from .ratelimit import TokenBucketLimiter, make_bucket_store
+    from .ranking import LeaderboardSnapshot, Leaderboards, rows_version
+    from .static_assets import StaticAssets, StaticAssetsMiddleware
+    from .tasks import TASKS_FILE, TaskCatalogSource
+    from .tapbuffer import TapBuffer
+    from .telegram_api import TelegramAPIError, TelegramClient, TelegramNetworkError, NOT_MEMBER_STATUSES
+    from .webapp_auth import InitDataError, verify_init_data
 except ImportError:  # running as single-folder (no package)
-    from db import SessionLocal, engine, Base
-    from models import User, AppState
+    from broadcast import BROADCAST_EVENTS, BroadcastRunner, enqueue_broadcast, run_pending
+    from db import engine, get_db, lift_statement_timeout, run_db, run_in_session, run_on_connection
+    from db import REPLICA_ENABLED, get_read_db, is_read_only, measure_replica_lag, replica_engine, replica_guard
+    from db import engine_settings, ping as db_ping, prewarm_pool
+    from metrics import METRICS_ENABLED, METRICS_TOKEN, RESET_DURATION, RESET_LOCK_BUSY, RESET_RUNS, WS_CONNECTIONS, WS_TAPS
+    from metrics import DB_REPLICA_LAG, TAP_LIMITED, TAP_LIMITED_REQUESTS
+    from economy import bulk_level_ups, level_up_reward, level_ups, max_upgrades, upgrade_cost
+    from metrics import MetricsMiddleware, instrument_engine
+    from metrics import render as render_metrics
+    from migrations import check_schema, prepare_schema
+    from models import User, UserStats, AppState, TaskStatus, WeeklyScore
+    from ratelimit import TokenBucketLimiter, make_bucket_store
+    from ranking import LeaderboardSnapshot, Leaderboards, rows_version
+    from static_assets import StaticAssets, StaticAssetsMiddleware
+    from tasks import TASKS_FILE, TaskCatalogSource
+    from tapbuffer import TapBuffer
+    from telegram_api import TelegramAPIError, TelegramClient, TelegramNetworkError, NOT_MEMBER_STATUSES
+    from webapp_auth import InitDataError, verify_init_data
+
+logger = logging.getLogger(__name__)
 
-# -------------------- DB init --------------------
-Base.metadata.create_all(bind=engine)
 
 # -------------------- App --------------------
-app = FastAPI(title="TapToEarnTON API (v2)")
-
-# -------------------- Cache-Control (avoid Telegram Web caching static aggressively) --------------------
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.requests import Request
-
-
-class NoStoreStaticMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
-        response = await call_next(request)
-        path = request.url.path
-        if path.startswith("/static/"):
-            # Telegram Web can cache aggressively; disable for rapid iteration
-            response.headers["Cache-Control"] = "no-store"
-        return response
-
+# Schema on boot: "migrate" creates missing tables and applies pending migrations,
+# "check" only verifies that they are applied (run `python -m backend.migrations` as the
+# release step) and refuses to start otherwise; "auto" = migrate on SQLite, check elsewhere.
+SCHEMA_ON_STARTUP = os.getenv("SCHEMA_ON_STARTUP", "auto")
+
+# ready: startup finished and not shutting down (see /readyz)
+_startup: Dict[str, Any] = {"ready": False, "ms": None}
+
+
+async def _prepare_schema() -> str:
+    mode = SCHEMA_ON_STARTUP
+    if mode == "auto":
+        mode = "migrate" if engine.dialect.name == "sqlite" else "check"
+    if mode == "check":
+        await run_on_connection(check_schema)
+        return "checked"
+    # Missing tables + pending migrations (create_all alone never changes existing tables)
+    applied = await run_on_connection(prepare_schema)
+    return f"migrated {applied}" if applied else "up to date"
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    t0 = time.perf_counter()
+    schema = await _prepare_schema()
+    # Fingerprinting/compressing the webapp and opening pooled connections overlap
+    builds = [prewarm_pool()]
+    if STATIC_FINGERPRINT:
+        builds.append(run_in_threadpool(static_assets.build))
+    warm, *_ = await asyncio.gather(*builds)
+    logger.info("database: %s", await run_on_connection(engine_settings))
+    # Daily/weekly rollovers run here (startup + midnight) instead of on a request path
+    await run_in_session(_scheduled_resets)
+    tasks = [asyncio.create_task(_reset_scheduler())]
+    if RANK_INDEX_ENABLED:
+        await run_in_session(_load_rank_index)
+        tasks.append(asyncio.create_task(_rank_reconciler()))
+    if TAP_WRITE_BEHIND:
+        tasks.append(asyncio.create_task(_tap_flusher()))
+    if TASKS_RELOAD_SEC > 0:
+        tasks.append(asyncio.create_task(_task_catalog_watcher()))
+    if BOT_TOKEN and BROADCAST_POLL_SEC > 0:
+        tasks.append(asyncio.create_task(_broadcast_worker()))
+    if REPLICA_ENABLED:
+        tasks.append(asyncio.create_task(_replica_lag_monitor()))
+    _startup.update(ready=True, ms=round((time.perf_counter() - t0) * 1000, 1))
+    logger.info("startup done in %s ms (schema %s, %d pooled connections opened)", _startup["ms"], schema, warm)
+    try:
+        yield
+    finally:
+        # Fail readiness first so the load balancer stops routing here while we drain
+        _startup["ready"] = False
+        for t in tasks:
+            t.cancel()
+        if TAP_WRITE_BEHIND:
+            await run_in_session(_flush_tap_buffer)
+        await tg_client.aclose()
 
-app.add_middleware(NoStoreStaticMiddleware)
 
+app = FastAPI(title="TapToEarnTON API (v2)", lifespan=lifespan)
 
 APP_TZ = os.getenv("APP_TZ", "Europe/Istanbul")
 
@@ -74,57 +159,204 @@ def _pick_static_dir() -> str:
 static_dir = _pick_static_dir()
 app.mount("/static", StaticFiles(directory=static_dir), name="static")
 
+# Fingerprinted + precompressed assets (see static_assets.py): hashed URLs are cached for a year,
+# index.html is rewritten to use them and revalidated on every open.
+# STATIC_FINGERPRINT=0 serves the files straight from disk instead (edit-and-reload during development).
+STATIC_FINGERPRINT = os.getenv("STATIC_FINGERPRINT", "1") == "1"
+if STATIC_FINGERPRINT:
+    static_assets = StaticAssets(static_dir)  # built in lifespan, off the import path
+    app.add_middleware(StaticAssetsMiddleware, assets=static_assets)
+
+# -------------------- Metrics --------------------
+# Prometheus text format on /metrics (see metrics.py); added last so it wraps everything else.
+if METRICS_ENABLED:
+    instrument_engine(engine)
+    if replica_engine is not engine:
+        instrument_engine(replica_engine, "replica")
+    app.add_middleware(MetricsMiddleware)
+
+
+@app.get("/metrics", include_in_schema=False)
+def metrics(request: Request):
+    if not METRICS_ENABLED:
+        raise HTTPException(404, "Metrics are disabled")
+    if METRICS_TOKEN and not hmac.compare_digest(
+        request.headers.get("authorization", "").encode(), f"Bearer {METRICS_TOKEN}".encode()
+    ):
+        raise HTTPException(401, "Metrics token required", headers={"WWW-Authenticate": "Bearer"})
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+# -------------------- Health --------------------
+# /healthz: liveness (the process answers; no DB access, so a slow DB never gets it restarted).
+# /readyz: readiness (startup done, not shutting down, primary answers within READY_DB_TIMEOUT).
+READY_DB_TIMEOUT = float(os.getenv("READY_DB_TIMEOUT", "2"))
+
+
+@app.get("/healthz", include_in_schema=False)
+async def healthz():
+    return {"status": "ok"}
+
+
+@app.get("/readyz", include_in_schema=False)
+async def readyz():
+    if not _startup["ready"]:
+        return JSONResponse({"status": "not ready"}, status_code=503)
+    try:
+        await asyncio.wait_for(db_ping(), READY_DB_TIMEOUT)
+    except Exception as e:
+        return JSONResponse({"status": "database unavailable", "error": repr(e)}, status_code=503)
+    res: Dict[str, Any] = {"status": "ready", "startup_ms": _startup["ms"]}
+    if REPLICA_ENABLED:
+        res["replica_lag"] = replica_guard.lag
+    return res
+
 
 @app.get("/")
 def serve_index():
     return FileResponse(os.path.join(static_dir, "index.html"))
 
 
-# -------------------- DB Session --------------------
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+# -------------------- Helpers --------------------
+def _maybe_level_up(stats) -> int:
+    """Applies level-ups to the counters (UserStats or a merged view); returns how many levels were gained.
+
+    The TON credit for them (economy.level_up_reward) lives on users and is up to the caller.
+    """
+    up = level_ups(stats.xp, stats.next_level_xp)
+    if up.levels:
+        stats.xp, stats.level, stats.next_level_xp = up.xp, stats.level + up.levels, up.next_level_xp
+    return up.levels
+
+
+def _dialect_insert(db: Session):
+    """Dialect insert() with on_conflict_do_update support, or None for other backends."""
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as upsert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as upsert
+    else:
+        return None
+    return upsert
 
 
-# -------------------- Helpers --------------------
-def _maybe_level_up(user: User) -> int:
-    """Returns how many levels were gained."""
-    gained = 0
-    while user.xp >= user.next_level_xp:
-        user.xp -= user.next_level_xp
-        user.level += 1
-        user.next_level_xp += 1000
-        user.ton_credits = round(user.ton_credits + 0.1, 4)  # +0.1 TON credit per level
-        gained += 1
-    return gained
+def _returning_one(db: Session, stmt):
+    """Executes an ORM UPDATE/INSERT ... RETURNING <entity> and returns the (refreshed) object or None."""
+    return db.scalars(stmt, execution_options={"populate_existing": True}).one_or_none()
 
 
 def get_or_create_user(db: Session, telegram_id: int, name: Optional[str] = None, language: Optional[str] = None) -> User:
+    """INSERT ... ON CONFLICT (telegram_id) DO UPDATE ... RETURNING: one round trip.
+
+    Fills the name only if it is empty and overwrites the language when given. An existing
+    user with nothing to change is not rewritten (the conflict does nothing and the row
+    is read instead), so /api/me and /api/bootstrap cause no write churn.
+    """
+    upsert = _dialect_insert(db)
+    if upsert is None:
+        return _get_or_create_user_orm(db, telegram_id, name, language)
+    stmt = upsert(User).values(
+        telegram_id=telegram_id,
+        name=name or None,
+        language=language or "en",
+        daily_tasks_date=_today(),
+    )
+    changes = []
+    if name:
+        changes.append(User.name.is_(None))
+    if language:
+        changes.append(User.language.is_distinct_from(language))
+    if changes:
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[User.telegram_id],
+            set_={
+                "name": func.coalesce(User.name, stmt.excluded.name),
+                "language": func.coalesce(literal(language or None, String), User.language),
+            },
+            where=or_(*changes),
+        )
+    else:
+        stmt = stmt.on_conflict_do_nothing(index_elements=[User.telegram_id])
+    user = _returning_one(db, stmt.returning(User))
+    if user is None:  # existing user, unchanged (stats are joined in)
+        user = db.query(User).filter(User.telegram_id == telegram_id).one()
+    user = _ensure_stats(db, user)
+    db.commit()
+    return user
+
+
+def _ensure_stats(db: Session, user: User) -> User:
+    """Creates the user_stats row of a just inserted user (loading user.stats is a SELECT)."""
+    if user.stats is not None:
+        return user
+    upsert = _dialect_insert(db)
+    if upsert is None:
+        user.stats = UserStats()
+        db.flush()
+        return user
+    db.execute(upsert(UserStats).values(user_id=user.id).on_conflict_do_nothing(index_elements=[UserStats.user_id]))
+    db.expire(user, ["stats"])
+    return user
+
+
+def _get_or_create_user_orm(db: Session, telegram_id: int, name: Optional[str], language: Optional[str]) -> User:
     user = db.query(User).filter(User.telegram_id == telegram_id).first()
     if not user:
-        user = User(telegram_id=telegram_id, name=name or None)
+        user = User(telegram_id=telegram_id, name=name or None, stats=UserStats())
         if language:
             user.language = language
         user.daily_tasks_date = _today()
         db.add(user)
-        db.commit()
-        db.refresh(user)
     else:
         # update name if provided and empty
         if name and (not user.name):
             user.name = name
         if language and user.language != language:
             user.language = language
-        if user.daily_tasks_date is None:
-            user.daily_tasks_date = _today()
-        db.commit()
-        db.refresh(user)
+    db.commit()
     return user
 
 
+def _find_user(db: Session, telegram_id: int) -> Optional[User]:
+    return db.query(User).filter(User.telegram_id == telegram_id).first()
+
+
+def _user_id_of(telegram_id: int):
+    return select(User.id).where(User.telegram_id == telegram_id).scalar_subquery()
+
+
+def _credit_level_ups(db: Session, user_id: int, ton: float) -> None:
+    stmt = update(User).where(User.id == user_id).values(ton_credits=User.ton_credits + ton).returning(User)
+    _returning_one(db, stmt)
+
+
+def _level_up_atomic(db: Session, stats: UserStats) -> UserStats:
+    """Applies all pending level-ups with one conditional UPDATE (rare: only when xp crossed the threshold).
+
+    The level guard keeps a concurrent request from applying the same level-ups twice; xp is
+    reduced relatively, so taps that landed in between are kept (and re-checked by the loop).
+    """
+    while stats.xp >= stats.next_level_xp:
+        up = level_ups(stats.xp, stats.next_level_xp)
+        stmt = (
+            update(UserStats)
+            .where(UserStats.user_id == stats.user_id, UserStats.level == stats.level, UserStats.xp >= up.xp_spent)
+            .values(
+                xp=UserStats.xp - up.xp_spent,
+                level=UserStats.level + up.levels,
+                next_level_xp=up.next_level_xp,
+            )
+            .returning(UserStats)
+        )
+        leveled = _returning_one(db, stmt)
+        if leveled is None:
+            break
+        _credit_level_ups(db, stats.user_id, up.ton)
+        stats = leveled
+    return stats
+
+
 def _get_state_locked(db: Session) -> AppState:
     q = db.query(AppState).filter(AppState.id == 1)
     # On Postgres this locks row; on sqlite it's ignored (fine for single instance)
@@ -137,56 +369,300 @@ def _get_state_locked(db: Session) -> AppState:
     return state
 
 
-def ensure_resets(db: Session) -> None:
-    """Daily reset (tasks/adwatch) and Weekly reset (leaderboard + reward)."""
-    today = _today()
-    yw = _yearweek(today)
+# Last day / ISO week this worker has seen rolled over. While it matches the
+# clock, requests skip app_state entirely (no row lock, no commit).
+_reset_epoch: Dict[str, Any] = {"day": None, "yearweek": None}
+_reset_lock = threading.Lock()
 
+
+def _run_resets(db: Session, today, yw: int) -> None:
+    """Daily reset (tasks/adwatch) and Weekly reset (leaderboard + reward)."""
+    # Last week's buffered taps must be in weekly_scores before the winner is picked
+    # (commits, so before the app_state row lock; other workers' buffers flush on their own)
+    _flush_tap_buffer(db)
     state = _get_state_locked(db)
 
     # Daily reset (at first request after midnight)
+    # Per-user daily fields are reset lazily (see "Daily fields" below), so this is O(1).
     if state.last_daily_reset != today:
-        # Reset per-user daily fields
-        db.query(User).update(
-            {
-                User.daily_ad_watched: 0,
-                User.daily_tasks_claimed: "[]",
-                User.daily_tasks_date: today,
-            }
-        )
+        if state.last_daily_reset is not None:
+            _queue_event_broadcast(db, "daily_tasks", f"daily_tasks:{today}")
         state.last_daily_reset = today
+        RESET_RUNS.inc("daily")
 
     # Weekly reset (at first request of a new ISO week)
+    # Scores are keyed by yearweek, so the new week already starts from zero;
+    # only last week's winner has to be awarded (index lookup).
     if state.last_weekly_reset_yearweek != yw:
-        # Award last week's winner BEFORE clearing scores
-        winner = db.query(User).order_by(User.weekly_score.desc()).first()
-        if winner and winner.weekly_score > 0:
+        prev_yw = state.last_weekly_reset_yearweek
+        top = None
+        if prev_yw is not None:
+            top = (
+                db.query(WeeklyScore)
+                .filter(WeeklyScore.yearweek == prev_yw)
+                .order_by(WeeklyScore.score.desc())
+                .first()
+            )
+        if top and top.score > 0:
+            winner = db.query(User).filter(User.id == top.user_id).first()
             winner.ton_credits = round(winner.ton_credits + 0.5, 4)  # weekly prize
             state.last_weekly_winner_telegram_id = winner.telegram_id
             state.last_weekly_awarded_at = datetime.utcnow()
+            _queue_event_broadcast(db, "weekly_winner", f"weekly_winner:{prev_yw}", user_id=winner.id)
+        if prev_yw is not None:
+            _queue_event_broadcast(db, "weekly_reset", f"weekly_reset:{yw}")
 
-        # Reset weekly scores
-        db.query(User).update({User.weekly_score: 0})
         state.last_weekly_reset_yearweek = yw
+        RESET_RUNS.inc("weekly")
 
     db.commit()
+    _reset_epoch["day"] = state.last_daily_reset
+    _reset_epoch["yearweek"] = state.last_weekly_reset_yearweek
+
+
+def _queue_event_broadcast(db: Session, kind: str, key: str, user_id: Optional[int] = None) -> None:
+    # Queued in the reset's transaction (the key makes it once per event across workers);
+    # _broadcast_worker sends it.
+    if BOT_TOKEN and kind in BROADCAST_EVENTS:
+        enqueue_broadcast(db, kind, key=key, user_id=user_id)
+
 
+def ensure_resets(db: Session) -> None:
+    # Replica sessions never write; the scheduler and the write paths roll the day over
+    if is_read_only(db):
+        return
+    today = _today()
+    yw = _yearweek(today)
+    if _reset_epoch["day"] == today and _reset_epoch["yearweek"] == yw:
+        return
+
+    # One caller per worker goes to the DB; across workers the app_state row lock
+    # elects a single winner and the others just pick up the new epoch.
+    # Never wait here: with the async engine this runs on the event loop thread.
+    if not _reset_lock.acquire(blocking=False):
+        RESET_LOCK_BUSY.inc()
+        return
+    try:
+        if _reset_epoch["day"] == today and _reset_epoch["yearweek"] == yw:
+            return
+        t0 = time.perf_counter()
+        _run_resets(db, today, yw)
+        RESET_DURATION.observe(time.perf_counter() - t0)
+    finally:
+        _reset_lock.release()
+
+
+# -------------------- Weekly scores --------------------
+# How many ISO weeks of leaderboard history to keep (0 = keep forever)
+WEEKLY_HISTORY_WEEKS = int(os.getenv("WEEKLY_HISTORY_WEEKS", "12"))
+
+
+def _current_yearweek() -> int:
+    return _yearweek(_today())
+
+
+def _weekly_upsert_stmt(db: Session):
+    """INSERT ... ON CONFLICT DO UPDATE score = score + excluded.score (None if the dialect has no upsert)."""
+    upsert = _dialect_insert(db)
+    if upsert is None:
+        return None
+    table = WeeklyScore.__table__
+    stmt = upsert(table)
+    return stmt.on_conflict_do_update(
+        index_elements=[table.c.yearweek, table.c.user_id],
+        set_={"score": table.c.score + stmt.excluded.score},
+    )
+
+
+def _add_weekly_scores(db: Session, rows: List[Dict[str, int]]) -> None:
+    """Bulk variant of _add_weekly_score: rows of {yearweek, user_id, score} (executemany)."""
+    if not rows:
+        return
+    stmt = _weekly_upsert_stmt(db)
+    if stmt is not None:
+        db.execute(stmt, rows)
+        return
+    for r in rows:
+        row = db.get(WeeklyScore, (r["yearweek"], r["user_id"]))
+        if row is None:
+            db.add(WeeklyScore(**r))
+        else:
+            row.score += r["score"]
+
+
+def _add_weekly_score(db: Session, user_id: int, delta: int) -> int:
+    """Adds delta to the user's score for the current ISO week (upsert); returns the new score."""
+    yw = _current_yearweek()
+    if delta <= 0:
+        return _weekly_score(db, user_id, yw)
+    stmt = _weekly_upsert_stmt(db)
+    if stmt is not None:
+        stmt = stmt.values(yearweek=yw, user_id=user_id, score=delta).returning(WeeklyScore.__table__.c.score)
+        return db.execute(stmt).scalar_one()
+
+    row = db.get(WeeklyScore, (yw, user_id))
+    if row is None:
+        row = WeeklyScore(yearweek=yw, user_id=user_id, score=delta)
+        db.add(row)
+    else:
+        row.score += delta
+    return row.score
 
-def _user_payload(user: User) -> Dict[str, Any]:
+
+def _weekly_score(db: Session, user_id: int, yw: Optional[int] = None) -> int:
+    yw = yw if yw is not None else _current_yearweek()
+    score = (
+        db.query(WeeklyScore.score)
+        .filter(WeeklyScore.yearweek == yw, WeeklyScore.user_id == user_id)
+        .scalar()
+    )
+    return score or 0
+
+
+def _weekly_history_cutoff() -> Optional[int]:
+    """Oldest yearweek still kept, or None when history is kept forever."""
+    if WEEKLY_HISTORY_WEEKS <= 0:
+        return None
+    return _yearweek(_today() - timedelta(weeks=WEEKLY_HISTORY_WEEKS))
+
+
+def _prune_weekly_history(db: Session) -> None:
+    cutoff = _weekly_history_cutoff()
+    if cutoff is None:
+        return
+    lift_statement_timeout(db)
+    db.query(WeeklyScore).filter(WeeklyScore.yearweek < cutoff).delete(synchronize_session=False)
+    db.commit()
+
+
+# -------------------- Rank index --------------------
+# In-memory order-statistic indexes answering top-N / your_rank without COUNT scans.
+# Built at startup, updated after every score write of this worker and periodically
+# rebuilt from the DB (which also picks up writes made by other workers).
+RANK_INDEX_ENABLED = os.getenv("RANK_INDEX_ENABLED", "1") == "1"
+RANK_RECONCILE_SEC = int(os.getenv("RANK_RECONCILE_SEC", "300"))
+
+rank_index = Leaderboards()
+
+# Top-10 snapshots per scope: rebuilt after LEADERBOARD_SNAPSHOT_SEC seconds or
+# LEADERBOARD_SNAPSHOT_WRITES score writes, whichever comes first
+LEADERBOARD_SNAPSHOT_SEC = float(os.getenv("LEADERBOARD_SNAPSHOT_SEC", "5"))
+LEADERBOARD_SNAPSHOT_WRITES = int(os.getenv("LEADERBOARD_SNAPSHOT_WRITES", "1000"))
+
+leaderboard_snapshots = {
+    "weekly": LeaderboardSnapshot(LEADERBOARD_SNAPSHOT_SEC, LEADERBOARD_SNAPSHOT_WRITES),
+    "all_time": LeaderboardSnapshot(LEADERBOARD_SNAPSHOT_SEC, LEADERBOARD_SNAPSHOT_WRITES),
+}
+
+
+def _load_rank_index(db: Session) -> None:
+    lift_statement_timeout(db)  # full scans of weekly_scores / user_stats
+    yw = _current_yearweek()
+    weekly = (
+        db.query(WeeklyScore.user_id, WeeklyScore.score)
+        .filter(WeeklyScore.yearweek == yw, WeeklyScore.score > 0)
+        .yield_per(10000)
+    )
+    all_time = db.query(UserStats.user_id, UserStats.total_coins).filter(UserStats.total_coins > 0).yield_per(10000)
+    rank_index.load(yw, weekly, all_time)
+
+
+def _note_score_write(weekly: bool) -> None:
+    leaderboard_snapshots["all_time"].note_write()
+    if weekly:
+        leaderboard_snapshots["weekly"].note_write()
+
+
+def _record_scores(user: User, weekly: Optional[int] = None) -> None:
+    _note_score_write(weekly is not None)
+    if not rank_index.ready:
+        return
+    rank_index.set_all_time(user.id, user.stats.total_coins)
+    if weekly is not None:
+        rank_index.set_weekly(_current_yearweek(), user.id, weekly)
+
+
+# How often the read replica's lag is measured (DATABASE_REPLICA_URL, see db.py)
+REPLICA_LAG_CHECK_SEC = float(os.getenv("REPLICA_LAG_CHECK_SEC", "1"))
+
+
+async def _replica_lag_monitor() -> None:
+    """Feeds replica_guard: reads go to the primary while the replica lags or is unreachable."""
+    while True:
+        try:
+            replica_guard.lag = await measure_replica_lag()
+            DB_REPLICA_LAG.set(value=replica_guard.lag)
+        except Exception:
+            if replica_guard.lag is not None:
+                logger.exception("Replica lag check failed; reading from the primary")
+            replica_guard.lag = None
+            DB_REPLICA_LAG.set(value=-1)
+        await asyncio.sleep(REPLICA_LAG_CHECK_SEC)
+
+
+async def _rank_reconciler() -> None:
+    while True:
+        await asyncio.sleep(RANK_RECONCILE_SEC)
+        try:
+            await run_in_session(_load_rank_index)
+        except Exception:
+            logger.exception("Rank index reconcile failed")
+
+
+def _scheduled_resets(db: Session) -> None:
+    ensure_resets(db)
+    _prune_weekly_history(db)
+
+
+def _seconds_until_next_midnight() -> float:
+    now = datetime.now(ZoneInfo(APP_TZ))
+    midnight = datetime.combine(now.date() + timedelta(days=1), dt_time.min, tzinfo=now.tzinfo)
+    return max((midnight - now).total_seconds(), 0.0)
+
+
+async def _reset_scheduler() -> None:
+    """Runs the rollover right after every midnight in APP_TZ."""
+    while True:
+        await asyncio.sleep(_seconds_until_next_midnight() + 1)
+        try:
+            await run_in_session(_scheduled_resets)
+        except Exception:
+            logger.exception("Scheduled daily/weekly reset failed")
+
+
+# -------------------- Daily fields (lazy reset) --------------------
+# daily_ad_watched / daily_tasks_mask are only valid for daily_tasks_date.
+# Readers treat stale values as zero/empty; writers fold the reset into their UPDATE
+# (CASE on a stale daily_tasks_date, see adwatched / task check).
+def _is_daily_current(user: User) -> bool:
+    return user.daily_tasks_date == _today()
+
+
+def _daily_ad_watched(user: User) -> int:
+    return user.daily_ad_watched if _is_daily_current(user) else 0
+
+
+def _daily_claimed(user: User) -> int:
+    """Bitmask of the tasks claimed today (see tasks.py for the bit of each task)."""
+    return user.daily_tasks_mask if _is_daily_current(user) else 0
+
+
+def _user_payload(user: User, weekly_score: Optional[int] = None) -> Dict[str, Any]:
+    stats = _merged_stats(user, weekly_score)
     return {
         "telegram_id": user.telegram_id,
         "name": user.name,
         "language": user.language,
-        "level": user.level,
-        "xp": user.xp,
-        "next_level_xp": user.next_level_xp,
-        "coins": user.coins,
-        "total_coins": user.total_coins,
-        "tap_power": user.tap_power,
-        "total_taps": user.total_taps,
-        "weekly_score": user.weekly_score,
-        "ton_credits": round(float(user.ton_credits), 4),
-        "daily_ad_watched": user.daily_ad_watched,
+        "level": stats.level,
+        "xp": stats.xp,
+        "next_level_xp": stats.next_level_xp,
+        "coins": stats.coins,
+        "total_coins": stats.total_coins,
+        "tap_power": user.stats.tap_power,
+        "total_taps": stats.total_taps,
+        "weekly_score": stats.weekly_score,
+        "ton_credits": round(float(stats.ton_credits), 4),
+        "daily_ad_watched": _daily_ad_watched(user),
         "sound_enabled": user.sound_enabled,
         "vibration_enabled": user.vibration_enabled,
         "notifications_enabled": user.notifications_enabled,
@@ -197,56 +673,347 @@ def _user_payload(user: User) -> Dict[str, Any]:
 # -------------------- Telegram checks (for real task verification) --------------------
 BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN", "")
 
+# Pooled async client with a short-TTL membership cache (see telegram_api.py)
+tg_client = TelegramClient(BOT_TOKEN)
+
 
-def tg_get_chat_member(chat_id: int | str, user_id: int) -> Dict[str, Any]:
+async def tg_get_chat_member(chat_id: int | str, user_id: int) -> Dict[str, Any]:
     if not BOT_TOKEN:
         raise HTTPException(500, "TELEGRAM_BOT_TOKEN is not set on the server")
-    url = f"https://api.telegram.org/bot{BOT_TOKEN}/getChatMember"
-    r = requests.get(url, params={"chat_id": chat_id, "user_id": user_id}, timeout=8)
-    data = r.json()
-    if not data.get("ok"):
-        raise HTTPException(400, f"Telegram API error: {data}")
-    return data["result"]
+    try:
+        return await tg_client.get_chat_member(chat_id, user_id)
+    except TelegramAPIError as e:
+        raise HTTPException(400, str(e))
+    except TelegramNetworkError as e:
+        raise HTTPException(502, f"Telegram API unreachable: {e}")
+
+
+# -------------------- Broadcasts --------------------
+# Queued broadcasts (reset events, `python -m backend.broadcast --text ...`) are sent by
+# every worker's _broadcast_worker; the lease in the broadcasts row keeps one sender per
+# broadcast and lets another worker resume it if this one dies (see broadcast.py).
+BROADCAST_POLL_SEC = float(os.getenv("BROADCAST_POLL_SEC", "5"))
+
+
+async def _broadcast_worker() -> None:
+    runner = BroadcastRunner(tg_client)
+    while True:
+        try:
+            await run_pending(runner)
+        except Exception:
+            logger.exception("Broadcast run failed")
+        await asyncio.sleep(BROADCAST_POLL_SEC)
 
 
 # -------------------- Config: Daily Tasks --------------------
 # NOTE:
 # - join_chat tasks can be verified via getChatMember (REAL check).
 # - open_link tasks are "soft" checks (click-based). For real check you'd need deep-link start params + bot-side logging.
-QUOTE_PEER_ID = 3253869429
-QUOTE_CHAT_ID = int(f"-100{QUOTE_PEER_ID}")
-
-TASKS: List[Dict[str, Any]] = [
-    {
-        "id": "join_quote_channel",
-        "title_tr": "Quote Masters kanalına katıl",
-        "title_en": "Join Quote Masters channel",
-        "type": "join_chat",
-        "chat_id": QUOTE_CHAT_ID,
-        "url": "https://web.telegram.org/k/#-3253869429",
-        "reward_coins": 250,
-    },
-    {
-        "id": "open_quotemasters_bot",
-        "title_tr": "@QuoteMastersBot'u aç",
-        "title_en": "Open @QuoteMastersBot",
-        "type": "open_link",
-        "url": "https://t.me/QuoteMastersBot",
-        "reward_coins": 150,
-    },
-    {
-        "id": "play_boinkers",
-        "title_tr": "Boinkers oyna (@boinker_bot)",
-        "title_en": "Play Boinkers (@boinker_bot)",
-        "type": "open_link",
-        "url": "https://t.me/boinker_bot",
-        "reward_coins": 150,
-    },
-]
+# The catalog lives in TASKS_FILE (backend/tasks.json) and is re-read within
+# TASKS_RELOAD_SEC of a change, no restart needed (0 = load once).
+TASKS_RELOAD_SEC = float(os.getenv("TASKS_RELOAD_SEC", "5"))
+
+task_source = TaskCatalogSource(TASKS_FILE)
+
+
+async def _task_catalog_watcher() -> None:
+    while True:
+        await asyncio.sleep(TASKS_RELOAD_SEC)
+        task_source.reload_if_changed()
+
 
 AD_WATCH_LIMIT = 10
 AD_WATCH_REWARD_TON = 0.1
 
+# -------------------- Tap batching --------------------
+# The webapp buffers taps and flushes them to /api/tap/batch.
+# TAP_BATCH_MAX caps a single batch, TAP_MAX_PER_SEC caps taps per elapsed second
+# since the previous tap (plausibility check against scripted clients).
+TAP_BATCH_MAX = int(os.getenv("TAP_BATCH_MAX", "200"))
+TAP_MAX_PER_SEC = int(os.getenv("TAP_MAX_PER_SEC", "20"))
+
+# Per telegram_id (in-process): last accepted client sequence number (duplicates/retries
+# are ignored) and last applied tap time (saves reading the user before each batch).
+# LRU-bounded to TAP_STATE_MAX_KEYS users each; an evicted user has been idle longest, its
+# last tap time is read from the DB again and a retry that old is no longer in flight.
+TAP_STATE_MAX_KEYS = int(os.getenv("TAP_STATE_MAX_KEYS", "100000"))
+
+_tap_seq_lock = threading.Lock()
+_last_tap_seq: "OrderedDict[int, int]" = OrderedDict()
+_last_tap_at: "OrderedDict[int, datetime]" = OrderedDict()
+
+
+def _remember(lru: OrderedDict, key: int, value) -> None:
+    """Sets key as most recently used and evicts the oldest entry beyond TAP_STATE_MAX_KEYS (hold _tap_seq_lock)."""
+    lru[key] = value
+    lru.move_to_end(key)
+    if len(lru) > TAP_STATE_MAX_KEYS:
+        lru.popitem(last=False)
+
+
+def _is_duplicate_tap_seq(telegram_id: int, seq: int) -> bool:
+    """Peek without recording (the endpoint's check before charging the tap limiter)."""
+    with _tap_seq_lock:
+        last = _last_tap_seq.get(telegram_id)
+    return last is not None and seq <= last
+
+
+def _accept_tap_seq(telegram_id: int, seq: int) -> Tuple[bool, Optional[int]]:
+    """Claims seq (a concurrent retry of it is a duplicate); returns (accepted, previous seq).
+
+    A claim whose taps are not committed must be given back with _release_tap_seq.
+    """
+    with _tap_seq_lock:
+        last = _last_tap_seq.get(telegram_id)
+        if last is not None and seq <= last:
+            return False, last
+        _remember(_last_tap_seq, telegram_id, seq)
+        return True, last
+
+
+def _release_tap_seq(telegram_id: int, seq: int, previous: Optional[int]) -> None:
+    """Undoes _accept_tap_seq after a failed apply, so the client's retry of seq is applied."""
+    with _tap_seq_lock:
+        if _last_tap_seq.get(telegram_id) != seq:
+            return  # a later batch has been accepted since
+        if previous is None:
+            _last_tap_seq.pop(telegram_id, None)
+        else:
+            _remember(_last_tap_seq, telegram_id, previous)
+
+
+def _note_tap(telegram_id: int, now: datetime) -> None:
+    with _tap_seq_lock:
+        _remember(_last_tap_at, telegram_id, now)
+
+
+def _plausible_tap_count(db: Session, telegram_id: int, count: int, now: datetime) -> int:
+    """Clamps a batched tap count to what a human could have tapped since the last tap."""
+    allowed = min(max(count, 0), TAP_BATCH_MAX)
+    last_tap_at = _last_tap_at.get(telegram_id)
+    if last_tap_at is None:
+        last_tap_at = db.query(UserStats.last_tap_at).filter(UserStats.user_id == _user_id_of(telegram_id)).scalar()
+    if last_tap_at is not None:
+        elapsed = max((now - last_tap_at).total_seconds(), 1.0)
+        allowed = min(allowed, math.ceil(elapsed * TAP_MAX_PER_SEC))
+    return allowed
+
+
+# -------------------- Tap rate limit --------------------
+# Per-user token bucket, checked in the endpoints before any DB work: TAP_RATE_PER_SEC taps
+# per second sustained, bursts of up to TAP_RATE_BURST. /api/tap answers 429 when the bucket
+# is empty; batches and /ws frames are clamped to the granted taps (a batch granted nothing
+# gets 429); duplicate batches are answered before the bucket is charged and granted taps
+# that are not applied are refunded. TAP_LIMIT_BACKEND=local keeps buckets per worker process, =redis shares one
+# budget across workers (REDIS_URL).
+TAP_RATE_PER_SEC = float(os.getenv("TAP_RATE_PER_SEC", str(TAP_MAX_PER_SEC)))
+TAP_RATE_BURST = float(os.getenv("TAP_RATE_BURST", "60"))
+
+tap_limiter = TokenBucketLimiter(
+    TAP_RATE_PER_SEC,
+    TAP_RATE_BURST,
+    make_bucket_store(
+        os.getenv("TAP_LIMIT_BACKEND", "local"),
+        redis_url=os.getenv("REDIS_URL", "redis://localhost:6379/0"),
+        max_keys=int(os.getenv("TAP_LIMIT_MAX_KEYS", "100000")),
+    ),
+)
+
+
+async def _limit_taps(channel: str, telegram_id: int, count: int) -> int:
+    """Returns how many of count taps the user's bucket allows (0..count)."""
+    granted = await tap_limiter.take(str(telegram_id), count)
+    if granted < count:
+        TAP_LIMITED.inc(channel, amount=count - granted)
+        TAP_LIMITED_REQUESTS.inc(channel, "rejected" if granted == 0 else "clamped")
+    return granted
+
+
+async def _refund_taps(telegram_id: int, count: int) -> None:
+    """Gives back tokens of granted taps that were not applied (duplicate batch, plausibility clamp)."""
+    await tap_limiter.refund(str(telegram_id), count)
+
+
+def _too_many_taps() -> HTTPException:
+    return HTTPException(429, "Too many taps", headers={"Retry-After": "1"})
+
+
+# -------------------- Write-behind taps (optional) --------------------
+# With TAP_WRITE_BEHIND=1 taps only go to an in-process per-user buffer that is
+# flushed every TAP_FLUSH_INTERVAL_MS or once TAP_FLUSH_MAX_ENTRIES users are pending,
+# as one executemany UPDATE (+ one weekly upsert). Reads merge unflushed deltas;
+# spending endpoints flush the user first.
+TAP_WRITE_BEHIND = os.getenv("TAP_WRITE_BEHIND", "0") == "1"
+TAP_FLUSH_INTERVAL_MS = int(os.getenv("TAP_FLUSH_INTERVAL_MS", "500"))
+TAP_FLUSH_MAX_ENTRIES = int(os.getenv("TAP_FLUSH_MAX_ENTRIES", "1000"))
+
+tap_buffer = TapBuffer(max_entries=TAP_FLUSH_MAX_ENTRIES)
+
+_stats_t = UserStats.__table__
+_flush_update_stmt = (
+    update(_stats_t)
+    .where(_stats_t.c.user_id == bindparam("uid"))
+    .values(
+        coins=_stats_t.c.coins + bindparam("d_coins"),
+        total_coins=_stats_t.c.total_coins + bindparam("d_coins"),
+        total_taps=_stats_t.c.total_taps + bindparam("d_taps"),
+        xp=_stats_t.c.xp + bindparam("d_xp"),
+        last_tap_at=bindparam("last_tap_at"),
+        updated_at=bindparam("last_tap_at"),
+    )
+)
+_flush_level_up_stmt = (
+    update(_stats_t)
+    .where(_stats_t.c.user_id == bindparam("uid"))
+    .values(
+        xp=_stats_t.c.xp - bindparam("xp_spent"),
+        level=_stats_t.c.level + bindparam("levels"),
+        next_level_xp=bindparam("new_next_level_xp"),
+    )
+)
+_users_t = User.__table__
+_flush_credit_stmt = (
+    update(_users_t).where(_users_t.c.id == bindparam("uid")).values(ton_credits=_users_t.c.ton_credits + bindparam("ton"))
+)
+
+
+def _flush_tap_buffer(db: Session, user_ids: Optional[List[int]] = None) -> int:
+    """Writes pending tap deltas (all, or only user_ids); returns how many users were flushed."""
+    deltas = tap_buffer.take(user_ids)
+    if not deltas:
+        return 0
+    try:
+        db.execute(
+            _flush_update_stmt,
+            [
+                {"uid": uid, "d_coins": d.coins, "d_taps": d.taps, "d_xp": d.xp, "last_tap_at": d.last_tap_at}
+                for uid, d in deltas.items()
+            ],
+        )
+        _add_weekly_scores(
+            db,
+            [
+                {"yearweek": yw, "user_id": uid, "score": score}
+                for uid, d in deltas.items()
+                for yw, score in d.weekly.items()
+                if score > 0
+            ],
+        )
+        # Level-ups are path independent, so applying them after the summed XP is exact;
+        # computed in closed form for all flushed users and written with two executemany UPDATEs
+        leveled = db.execute(
+            select(UserStats.user_id, UserStats.xp, UserStats.next_level_xp)
+            .where(UserStats.user_id.in_(list(deltas)), UserStats.xp >= UserStats.next_level_xp)
+            .with_for_update()
+        ).all()
+        ups = [
+            {"uid": uid, "xp_spent": up.xp_spent, "levels": up.levels, "new_next_level_xp": up.next_level_xp, "ton": up.ton}
+            for uid, up in bulk_level_ups(leveled)
+        ]
+        if ups:
+            db.execute(_flush_level_up_stmt, ups)
+            db.execute(_flush_credit_stmt, ups)
+        db.commit()
+    except Exception:
+        db.rollback()
+        tap_buffer.restore(deltas)
+        raise
+    # Core UPDATEs bypass the identity map: reload these users' rows on next access
+    for uid in deltas:
+        for model in (User, UserStats):
+            obj = db.identity_map.get(db.identity_key(model, uid))
+            if obj is not None:
+                db.expire(obj)
+    return len(deltas)
+
+
+def _flush_pending_for(db: Session, telegram_id: int) -> None:
+    """Force-flush one user's buffered taps before reading/spending their balance."""
+    if not (TAP_WRITE_BEHIND and len(tap_buffer)):
+        return
+    user_id = db.query(User.id).filter(User.telegram_id == telegram_id).scalar()
+    if user_id is not None and tap_buffer.pending(user_id) is not None:
+        _flush_tap_buffer(db, [user_id])
+
+
+def _merged_stats(user: User, weekly_score: Optional[int] = None) -> SimpleNamespace:
+    """User counters with unflushed write-behind deltas applied (incl. level-ups)."""
+    db = object_session(user)
+    yw = _current_yearweek()
+    if weekly_score is None:
+        weekly_score = _weekly_score(db, user.id, yw)
+    s = user.stats
+    stats = SimpleNamespace(
+        level=s.level,
+        xp=s.xp,
+        next_level_xp=s.next_level_xp,
+        coins=s.coins,
+        total_coins=s.total_coins,
+        total_taps=s.total_taps,
+        ton_credits=user.ton_credits,
+        weekly_score=weekly_score,
+    )
+    d = tap_buffer.pending(user.id) if TAP_WRITE_BEHIND else None
+    if d is not None:
+        stats.coins += d.coins
+        stats.total_coins += d.coins
+        stats.total_taps += d.taps
+        stats.xp += d.xp
+        stats.weekly_score += d.weekly.get(yw, 0)
+        stats.ton_credits = round(stats.ton_credits + level_up_reward(_maybe_level_up(stats)), 4)
+    return stats
+
+
+async def _tap_flusher() -> None:
+    while True:
+        await asyncio.sleep(TAP_FLUSH_INTERVAL_MS / 1000.0)
+        if not len(tap_buffer):
+            continue
+        try:
+            await run_in_session(_flush_tap_buffer)
+        except Exception:
+            logger.exception("Tap buffer flush failed")
+
+
+def _buffer_taps(db: Session, user: User, count: int, now: datetime) -> None:
+    _note_tap(user.telegram_id, now)
+    if tap_buffer.add(user.id, user.stats.tap_power * count, count, _current_yearweek(), now):
+        _flush_tap_buffer(db)
+    _note_score_write(weekly=True)
+    if rank_index.ready:
+        stats = _merged_stats(user)
+        rank_index.set_all_time(user.id, stats.total_coins)
+        rank_index.set_weekly(_current_yearweek(), user.id, stats.weekly_score)
+
+
+def _apply_taps(db: Session, telegram_id: int, count: int, now: datetime) -> Tuple[Optional[User], int]:
+    """Applies count taps with one UPDATE user_stats ... RETURNING (+ the weekly upsert).
+
+    Returns (user, new weekly score), or (None, 0) if the user does not exist.
+    """
+    gained = UserStats.tap_power * count
+    stmt = (
+        update(UserStats)
+        .where(UserStats.user_id == _user_id_of(telegram_id))
+        .values(
+            coins=UserStats.coins + gained,
+            total_coins=UserStats.total_coins + gained,
+            total_taps=UserStats.total_taps + count,
+            xp=UserStats.xp + count,
+            last_tap_at=now,
+            updated_at=now,
+        )
+        .returning(UserStats)
+    )
+    stats = _returning_one(db, stmt)
+    if stats is None:
+        return None, 0
+    weekly = _add_weekly_score(db, stats.user_id, stats.tap_power * count)
+    _level_up_atomic(db, stats)
+    _note_tap(telegram_id, now)
+    # Profile half for the payload (the refreshed stats object is reused from the identity map)
+    return db.get(User, stats.user_id), weekly
+
 
 # -------------------- Schemas --------------------
 class MeRequest(BaseModel):
@@ -261,8 +1028,18 @@ class TapRequest(BaseModel):
     language: Optional[str] = None
 
 
+class TapBatchRequest(BaseModel):
+    telegram_id: int
+    count: int
+    seq: int  # client-side monotonically increasing batch number
+    name: Optional[str] = None
+    language: Optional[str] = None
+
+
 class UpgradeRequest(BaseModel):
     telegram_id: int
+    count: int = 1  # tap power levels to buy
+    buy_max: bool = False  # as many as the balance allows (count is ignored)
 
 
 class TaskCheckRequest(BaseModel):
@@ -305,180 +1082,532 @@ def get_config():
         adsgram_reward_block_id=os.getenv("ADSGRAM_REWARD_BLOCK_ID") or "",
     )
 
-@app.post("/api/me")
-def me(payload: MeRequest, db: Session = Depends(get_db)):
+def _me(db: Session, payload: MeRequest):
     ensure_resets(db)
     user = get_or_create_user(db, telegram_id=payload.telegram_id, name=payload.name, language=payload.language)
     return {"user": _user_payload(user)}
 
 
+@app.post("/api/me")
+async def me(payload: MeRequest, db: Session = Depends(get_db)):
+    res = await run_db(db, _me, payload)
+    replica_guard.note_write(payload.telegram_id)
+    return res
+
+
+def _tap_user(db: Session, payload) -> User:
+    """Loads (or creates) the tapping user for write-behind mode."""
+    user = _find_user(db, payload.telegram_id)
+    if user is None:
+        user = get_or_create_user(db, telegram_id=payload.telegram_id, name=payload.name, language=payload.language)
+    return user
+
+
+def _commit_taps(db: Session, payload, count: int, now: datetime) -> Dict[str, Any]:
+    """Applies count taps (creating the user on first tap) and returns the user payload."""
+    user, weekly = _apply_taps(db, payload.telegram_id, count, now)
+    if user is None:
+        get_or_create_user(db, telegram_id=payload.telegram_id, name=payload.name, language=payload.language)
+        user, weekly = _apply_taps(db, payload.telegram_id, count, now)
+    db.commit()
+    _record_scores(user, weekly)
+    return _user_payload(user, weekly)
+
+
+def _apply_tap_count(db: Session, payload, count: int) -> Tuple[int, Dict[str, Any]]:
+    """Applies a client-aggregated tap count (clamped); returns (applied, user payload)."""
+    now = datetime.utcnow()
+    applied = _plausible_tap_count(db, payload.telegram_id, count, now)
+    if applied > 0 and not TAP_WRITE_BEHIND:
+        return applied, _commit_taps(db, payload, applied, now)
+
+    user = _tap_user(db, payload)
+    if applied > 0:
+        _buffer_taps(db, user, applied, now)
+    return applied, _user_payload(user)
+
+
+def _tap(db: Session, payload: TapRequest):
+    ensure_resets(db)
+
+    if TAP_WRITE_BEHIND:
+        user = _tap_user(db, payload)
+        _buffer_taps(db, user, 1, datetime.utcnow())
+        return {"user": _user_payload(user)}
+
+    return {"user": _commit_taps(db, payload, 1, datetime.utcnow())}
+
+
 @app.post("/api/tap")
-def tap(payload: TapRequest, db: Session = Depends(get_db)):
+async def tap(payload: TapRequest, db: Session = Depends(get_db)):
+    if not await _limit_taps("tap", payload.telegram_id, 1):
+        raise _too_many_taps()
+    res = await run_db(db, _tap, payload)
+    replica_guard.note_write(payload.telegram_id)
+    return res
+
+
+def _tap_batch(db: Session, payload: TapBatchRequest, count: int):
     ensure_resets(db)
-    user = get_or_create_user(db, telegram_id=payload.telegram_id, name=payload.name, language=payload.language)
 
-    user.coins += user.tap_power
-    user.total_coins += user.tap_power
-    user.total_taps += 1
-    user.weekly_score += user.tap_power
+    accepted, previous = _accept_tap_seq(payload.telegram_id, payload.seq)
+    if not accepted:
+        # Retry of an already applied batch
+        user = _tap_user(db, payload)
+        return {"applied": 0, "seq": payload.seq, "duplicate": True, "user": _user_payload(user)}
 
-    user.xp += 1
-    user.last_tap_at = datetime.utcnow()
+    try:
+        applied, user_payload = _apply_tap_count(db, payload, count)
+    except BaseException:
+        # Nothing committed (e.g. "database is locked"): the client's resend must not be a duplicate
+        _release_tap_seq(payload.telegram_id, payload.seq, previous)
+        raise
+    return {"applied": applied, "seq": payload.seq, "user": user_payload}
+
+
+@app.post("/api/tap/batch")
+async def tap_batch(payload: TapBatchRequest, db: Session = Depends(get_db)):
+    """Applies a client-side buffered batch of taps in one transaction."""
+    count = min(max(payload.count, 0), TAP_BATCH_MAX)
+    if _is_duplicate_tap_seq(payload.telegram_id, payload.seq):
+        # Retry of an applied batch: answered without using the user's tap budget
+        return await run_db(db, _tap_batch, payload, 0)
+    granted = await _limit_taps("batch", payload.telegram_id, count)
+    if count > 0 and granted == 0:
+        raise _too_many_taps()
+    try:
+        res = await run_db(db, _tap_batch, payload, granted)
+    except BaseException:
+        await _refund_taps(payload.telegram_id, granted)
+        raise
+    await _refund_taps(payload.telegram_id, granted - res["applied"])
+    replica_guard.note_write(payload.telegram_id)
+    return res
+
+
+UPGRADE_MAX_COUNT = 1000  # per request
+
+
+def _buy_tap_power(db: Session, telegram_id: int, count: int) -> Optional[UserStats]:
+    # Cost: 500, 1000, 1500 ... per level (based on current tap_power), count levels summed in
+    # closed form; check and spend in one statement
+    cost = upgrade_cost(UserStats.tap_power, count)
+    stmt = (
+        update(UserStats)
+        .where(UserStats.user_id == _user_id_of(telegram_id), UserStats.coins >= cost)
+        .values(coins=UserStats.coins - cost, tap_power=UserStats.tap_power + count)
+        .returning(UserStats)
+    )
+    return _returning_one(db, stmt)
 
-    _maybe_level_up(user)
 
+def _upgrade_tap_power(db: Session, payload: UpgradeRequest):
+    if not payload.buy_max and not 1 <= payload.count <= UPGRADE_MAX_COUNT:
+        raise HTTPException(400, f"count must be between 1 and {UPGRADE_MAX_COUNT}")
+    ensure_resets(db)
+    _flush_pending_for(db, payload.telegram_id)
+
+    stats, count = None, payload.count
+    # buy_max: the count is sized from the balance read here; a concurrent spend can make
+    # the UPDATE miss, then it is sized again
+    for _ in range(3 if payload.buy_max else 1):
+        if payload.buy_max:
+            row = db.query(UserStats.tap_power, UserStats.coins).filter(UserStats.user_id == _user_id_of(payload.telegram_id)).first()
+            count = min(max_upgrades(row.tap_power, row.coins), UPGRADE_MAX_COUNT) if row is not None else 0
+            if count == 0:
+                break
+        stats = _buy_tap_power(db, payload.telegram_id, count)
+        if stats is not None:
+            break
+    if stats is None:
+        if _find_user(db, payload.telegram_id) is None:
+            raise HTTPException(404, "User not found")
+        raise HTTPException(400, "Not enough coins")
+
+    user = db.get(User, stats.user_id)
     db.commit()
-    db.refresh(user)
-    return {"user": _user_payload(user)}
+    return {"user": _user_payload(user), "upgraded": count, "upgrade_cost": upgrade_cost(stats.tap_power)}
 
 
 @app.post("/api/upgrade_tap_power")
-def upgrade_tap_power(payload: UpgradeRequest, db: Session = Depends(get_db)):
-    ensure_resets(db)
-    user = db.query(User).filter(User.telegram_id == payload.telegram_id).first()
-    if not user:
-        raise HTTPException(404, "User not found")
+async def upgrade_tap_power(payload: UpgradeRequest, db: Session = Depends(get_db)):
+    res = await run_db(db, _upgrade_tap_power, payload)
+    replica_guard.note_write(payload.telegram_id)
+    return res
 
-    # Cost: 500, 1000, 1500 ... (based on current tap_power)
-    cost = 500 * user.tap_power
-    if user.coins < cost:
-        raise HTTPException(400, "Not enough coins")
 
-    user.coins -= cost
-    user.tap_power += 1
+# -------------------- Leaderboard --------------------
+# Boards are ordered by (score DESC, id ASC) and only list positive scores (like the rank
+# index). Deeper pages use keyset pagination: the cursor carries the last row's
+# (score, id, rank, position), so every page is one index seek and ranks continue from it.
+LEADERBOARD_TOP = 10
+LEADERBOARD_MAX_LIMIT = int(os.getenv("LEADERBOARD_MAX_LIMIT", "100"))
+LEADERBOARD_MAX_RADIUS = int(os.getenv("LEADERBOARD_MAX_RADIUS", "50"))
 
-    db.commit()
-    db.refresh(user)
-    return {"user": _user_payload(user), "upgrade_cost": 500 * user.tap_power}
+# (score, id, rank, position) of a listed row
+BoardKey = Tuple[int, int, int, int]
 
 
-@app.get("/api/leaderboard")
-def leaderboard(scope: str = "weekly", telegram_id: Optional[int] = None, db: Session = Depends(get_db)):
+def _encode_cursor(key: BoardKey) -> str:
+    return base64.urlsafe_b64encode(":".join(map(str, key)).encode()).decode().rstrip("=")
+
+
+def _decode_cursor(cursor: str) -> BoardKey:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        score, uid, rank, pos = (int(x) for x in raw.split(":"))
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(400, "Invalid cursor")
+    return score, uid, rank, pos
+
+
+def _board(scope: str, yw: Optional[int]) -> SimpleNamespace:
+    if scope == "weekly":
+        # ix_weekly_scores_yearweek_score_user (yearweek, score DESC, user_id)
+        return SimpleNamespace(
+            table=WeeklyScore,
+            score=WeeklyScore.score,
+            id=WeeklyScore.user_id,
+            where=(WeeklyScore.yearweek == yw,),
+            index=rank_index.weekly if rank_index.ready and rank_index.weekly_yearweek == yw else None,
+        )
+    # ix_user_stats_total_coins_user (total_coins DESC, user_id)
+    return SimpleNamespace(
+        table=UserStats,
+        score=UserStats.total_coins,
+        id=UserStats.user_id,
+        where=(),
+        index=rank_index.all_time if rank_index.ready else None,
+    )
+
+
+# Keyset conditions. Mixed ASC/DESC rules out a row-value comparison, so the redundant
+# bounds keep them index ranges; each has exactly one lower bound (also the "score > 0"
+# of listed rows), otherwise SQLite may seek on the weaker one.
+def _listed(board: SimpleNamespace):
+    return board.score > 0
+
+
+def _after(board: SimpleNamespace, score: int, uid: int):
+    return and_(board.score <= score, _listed(board), or_(board.score < score, and_(board.score == score, board.id > uid)))
+
+
+def _before(board: SimpleNamespace, score: int, uid: int):
+    return and_(board.score >= max(score, 1), or_(board.score > score, and_(board.score == score, board.id < uid)))
+
+
+def _board_entries(db: Session, board: SimpleNamespace, *criteria, limit: int, reverse: bool = False) -> List[Tuple[User, int]]:
+    q = db.query(User, board.score).join(board.table, board.id == User.id)
+    if board.table is UserStats:
+        q = q.options(contains_eager(User.stats))
+    order = (board.score, board.id.desc()) if reverse else (board.score.desc(), board.id)
+    return q.filter(*board.where, *criteria).order_by(*order).limit(limit).all()
+
+
+def _board_count(db: Session, board: SimpleNamespace, *criteria) -> int:
+    return db.query(func.count()).select_from(board.table).filter(*board.where, *criteria).scalar()
+
+
+def _rank_of_score(db: Session, board: SimpleNamespace, score: int) -> int:
+    if board.index is not None:
+        return board.index.rank_of_score(score)
+    return _board_count(db, board, board.score > max(score, 0)) + 1
+
+
+def _position(db: Session, board: SimpleNamespace, score: int, uid: int) -> int:
+    if board.index is not None:
+        pos = board.index.position(uid) if score > 0 else len(board.index) + 1
+        if pos is not None:
+            return pos
+    return _board_count(db, board, _before(board, score, uid)) + 1
+
+
+def _ranked_rows(entries: List[Tuple[User, int]], prev: Optional[BoardKey] = None) -> Tuple[List[Dict[str, Any]], Optional[BoardKey]]:
+    """Rows with competition ranks (ties share a rank), continuing after prev; returns (rows, last key)."""
+    score, uid, rank, pos = prev or (None, 0, 0, 0)
+    rows = []
+    for u, s in entries:
+        pos += 1
+        if s != score:
+            rank = pos
+        score, uid = s, u.id
+        rows.append({"name": (u.name or f"User {u.telegram_id}"), "score": s, "level": u.stats.level, "rank": rank})
+    return rows, ((score, uid, rank, pos) if entries else None)
+
+
+def _flush_for_board_read(db: Session) -> None:
+    """Writes buffered taps before leaderboard rows are read from SQL (the rank index already has them).
+
+    A replica session cannot flush; its pages trail by up to TAP_FLUSH_INTERVAL_MS plus the replica lag.
+    """
+    if TAP_WRITE_BEHIND and len(tap_buffer) and not is_read_only(db):
+        _flush_tap_buffer(db)
+
+
+def _page(db: Session, scope: str, yw: Optional[int], limit: int, after: Optional[BoardKey] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """One page of limit rows after the cursor key (from the top without one) + the next cursor."""
+    board = _board(scope, yw)
+    if after is None and board.index is not None:
+        top = board.index.top(limit + 1)
+        users = {u.id: u for u in db.query(User).filter(User.id.in_([uid for uid, _ in top]))}
+        entries = [(users[uid], score) for uid, score in top if uid in users]
+    else:
+        _flush_for_board_read(db)
+        criteria = _listed(board) if after is None else _after(board, after[0], after[1])
+        entries = _board_entries(db, board, criteria, limit=limit + 1)
+    rows, last = _ranked_rows(entries[:limit], after)
+    return rows, (_encode_cursor(last) if len(entries) > limit else None)
+
+
+def _around_me(db: Session, scope: str, yw: Optional[int], me: User, radius: int) -> Tuple[List[Dict[str, Any]], Optional[str], int]:
+    """Up to radius rows above and below the caller (who is listed even with a zero score)."""
+    _flush_for_board_read(db)
+    board = _board(scope, yw)
+    my_score = _weekly_score(db, me.id, yw) if scope == "weekly" else me.stats.total_coins
+    above = _board_entries(db, board, _before(board, my_score, me.id), limit=radius, reverse=True)[::-1]
+    below = _board_entries(db, board, _after(board, my_score, me.id), limit=radius + 1)
+    entries = above + [(me, my_score)] + below[:radius]
+
+    first, first_score = entries[0]
+    prev = (first_score, 0, _rank_of_score(db, board, first_score), _position(db, board, first_score, first.id) - 1)
+    rows, last = _ranked_rows(entries, prev)
+    mine = rows[len(above)]
+    mine["me"] = True
+    return rows, (_encode_cursor(last) if len(below) > radius else None), mine["rank"]
+
+
+def _your_rank(db: Session, scope: str, yw: Optional[int], telegram_id: Optional[int], me: Optional[User]) -> Optional[int]:
+    if telegram_id is None:
+        return None
+    me_id = me.id if me is not None else db.query(User.id).filter(User.telegram_id == telegram_id).scalar()
+    if me_id is None:
+        return None
+
+    board = _board(scope, yw)
+    if board.index is not None:
+        return board.index.rank(me_id)
+    if scope == "weekly":
+        my_score = _weekly_score(db, me_id, yw)
+    else:
+        my_score = me.stats.total_coins if me is not None else db.query(UserStats.total_coins).filter(UserStats.user_id == me_id).scalar()
+    return _rank_of_score(db, board, my_score)
+
+
+def _leaderboard(
+    db: Session,
+    scope: str,
+    telegram_id: Optional[int],
+    yearweek: Optional[int],
+    me: Optional[User] = None,
+    limit: int = LEADERBOARD_TOP,
+    cursor: Optional[str] = None,
+    window: Optional[str] = None,
+    radius: int = 5,
+):
+    """me: the already loaded user for telegram_id (saves reloading it).
+
+    cursor: next_cursor of a previous page; window="around_me": radius rows above and
+    below telegram_id instead of the top.
+    """
     ensure_resets(db)
 
     scope = (scope or "weekly").lower()
     if scope not in ("weekly", "all_time"):
         raise HTTPException(400, "scope must be weekly or all_time")
+    if not 1 <= limit <= LEADERBOARD_MAX_LIMIT:
+        raise HTTPException(400, f"limit must be between 1 and {LEADERBOARD_MAX_LIMIT}")
+    if window not in (None, "around_me"):
+        raise HTTPException(400, "window must be around_me")
+
+    yw = None
+    if scope == "weekly":
+        # yearweek (e.g. 202501) selects a past week; defaults to the current one
+        yw = yearweek if yearweek is not None else _current_yearweek()
+        cutoff = _weekly_history_cutoff()
+        if cutoff is not None and yw < cutoff:
+            raise HTTPException(404, "Weekly history not available for that week")
 
+    res: Dict[str, Any] = {"scope": scope}
     if scope == "weekly":
-        top = db.query(User).order_by(User.weekly_score.desc()).limit(10).all()
-        rows = [{"name": (u.name or f"User {u.telegram_id}"), "score": u.weekly_score, "level": u.level} for u in top]
-        your_rank = None
-        if telegram_id is not None:
-            me_u = db.query(User).filter(User.telegram_id == telegram_id).first()
-            if me_u:
-                higher = db.query(User).filter(User.weekly_score > me_u.weekly_score).count()
-                your_rank = higher + 1
-        return {"scope": "weekly", "leaderboard": rows, "your_rank": your_rank}
-
-    # all_time
-    top = db.query(User).order_by(User.total_coins.desc()).limit(10).all()
-    rows = [{"name": (u.name or f"User {u.telegram_id}"), "score": u.total_coins, "level": u.level} for u in top]
-    your_rank = None
-    if telegram_id is not None:
-        me_u = db.query(User).filter(User.telegram_id == telegram_id).first()
-        if me_u:
-            higher = db.query(User).filter(User.total_coins > me_u.total_coins).count()
-            your_rank = higher + 1
-    return {"scope": "all_time", "leaderboard": rows, "your_rank": your_rank}
+        res["yearweek"] = yw
+
+    if window == "around_me":
+        if telegram_id is None or cursor is not None:
+            raise HTTPException(400, "window=around_me needs telegram_id and takes no cursor")
+        if not 1 <= radius <= LEADERBOARD_MAX_RADIUS:
+            raise HTTPException(400, f"radius must be between 1 and {LEADERBOARD_MAX_RADIUS}")
+        me_u = me or db.query(User).filter(User.telegram_id == telegram_id).first()
+        if not me_u:
+            raise HTTPException(404, "User not found")
+        rows, next_cursor, your_rank = _around_me(db, scope, yw, me_u, radius)
+        res.update(window=window, leaderboard=rows, your_rank=your_rank, next_cursor=next_cursor, version=rows_version(rows))
+        return res
+
+    snapshot = leaderboard_snapshots[scope]
+    if cursor is not None:
+        rows, next_cursor = _page(db, scope, yw, limit, _decode_cursor(cursor))
+        version = rows_version(rows)
+    elif limit == LEADERBOARD_TOP and (scope == "all_time" or yw == _current_yearweek()):
+        # Top rows of the current week / all_time come from a short-lived snapshot
+        if not snapshot.fresh(yw):
+            snapshot.store(yw, *_page(db, scope, yw, limit))
+        rows, next_cursor, version = snapshot.rows, snapshot.cursor, snapshot.version
+    else:
+        rows, next_cursor = _page(db, scope, yw, limit)
+        version = rows_version(rows)
 
+    res.update(leaderboard=rows, your_rank=_your_rank(db, scope, yw, telegram_id, me), next_cursor=next_cursor, version=version)
+    return res
 
-@app.get("/api/tasks")
-def tasks(telegram_id: int, db: Session = Depends(get_db)):
+
+@app.get("/api/leaderboard")
+async def leaderboard(
+    request: Request,
+    scope: str = "weekly",
+    telegram_id: Optional[int] = None,
+    yearweek: Optional[int] = None,
+    limit: int = LEADERBOARD_TOP,
+    cursor: Optional[str] = None,
+    window: Optional[str] = None,
+    radius: int = 5,
+    db: Session = Depends(get_read_db),
+):
+    res = await run_db(db, _leaderboard, scope, telegram_id, yearweek, None, limit, cursor, window, radius)
+    # Weak validator from the rows version + the caller's rank: unchanged boards revalidate with a 304
+    etag = f'W/"{res["version"]}-{res.get("yearweek") or 0}-{res["your_rank"] or 0}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(res, headers=headers)
+
+
+def _tasks(db: Session, telegram_id: int):
     ensure_resets(db)
     user = db.query(User).filter(User.telegram_id == telegram_id).first()
     if not user:
         raise HTTPException(404, "User not found")
+    return _tasks_payload(user)
 
-    try:
-        claimed = set(json.loads(user.daily_tasks_claimed or "[]"))
-    except Exception:
-        claimed = set()
-
-    task_rows = []
-    for t in TASKS:
-        task_rows.append(
-            {
-                "id": t["id"],
-                "title_tr": t["title_tr"],
-                "title_en": t["title_en"],
-                "type": t["type"],
-                "url": t["url"],
-                "reward_coins": t["reward_coins"],
-                "claimed": t["id"] in claimed,
-            }
-        )
 
+def _tasks_payload(user: User) -> Dict[str, Any]:
     return {
-        "tasks": task_rows,
+        "tasks": task_source.catalog.listing(user.language, _daily_claimed(user)),
         "ad_watch": {
-            "watched": user.daily_ad_watched,
+            "watched": _daily_ad_watched(user),
             "limit": AD_WATCH_LIMIT,
             "reward_ton": AD_WATCH_REWARD_TON,
         },
     }
 
 
-@app.post("/api/task/check")
-def task_check(payload: TaskCheckRequest, db: Session = Depends(get_db)):
+@app.get("/api/tasks")
+async def tasks(telegram_id: int, db: Session = Depends(get_read_db)):
+    return await run_db(db, _tasks, telegram_id)
+
+
+def _task_check(db: Session, payload: TaskCheckRequest, is_member: Optional[bool]):
+    """Returns the response, or None when a join_chat task still needs its membership check."""
     ensure_resets(db)
-    user = db.query(User).filter(User.telegram_id == payload.telegram_id).first()
+    _flush_pending_for(db, payload.telegram_id)
+    user = _find_user(db, payload.telegram_id)
     if not user:
         raise HTTPException(404, "User not found")
 
-    task = next((t for t in TASKS if t["id"] == payload.task_id), None)
+    task = task_source.catalog.get(payload.task_id)
     if not task:
         raise HTTPException(404, "Task not found")
 
-    try:
-        claimed = set(json.loads(user.daily_tasks_claimed or "[]"))
-    except Exception:
-        claimed = set()
-
-    if payload.task_id in claimed:
+    if _daily_claimed(user) & task.mask:
         return {"success": False, "message": "Already claimed today", "user": _user_payload(user)}
 
-    # REAL check for join_chat
-    if task["type"] == "join_chat":
-        member = tg_get_chat_member(task["chat_id"], user.telegram_id)
-        status = member.get("status")
-        if status in ("left", "kicked"):
+    # REAL check for join_chat (done by the caller, outside of the DB work)
+    if task.type == "join_chat":
+        if is_member is None:
+            return None
+        if not is_member:
             return {"success": False, "message": "Not a member yet. Join first, then Check.", "user": _user_payload(user)}
 
     # SOFT check for open_link
-    if task["type"] == "open_link":
+    if task.type == "open_link":
         # Require at least 8 seconds after opening (client sends open_age_sec)
         if payload.open_age_sec is None or payload.open_age_sec < 8:
             return {"success": False, "message": "Open the link and come back after a few seconds, then Check.", "user": _user_payload(user)}
 
-    # Reward
-    reward = int(task.get("reward_coins", 0))
-    user.coins += reward
-    user.total_coins += reward
-
-    claimed.add(payload.task_id)
-    user.daily_tasks_claimed = json.dumps(sorted(list(claimed)))
-
+    # Reward: the claim sets the task's bit only while it is clear (stale day = empty mask),
+    # so a concurrent claim cannot pay twice
+    reward = task.reward_coins
+    today = _today()
+    bit = literal(task.mask, BigInteger)
+    stale = or_(User.daily_tasks_date.is_(None), User.daily_tasks_date != today)
+    stmt = (
+        update(User)
+        .where(User.id == user.id, or_(stale, User.daily_tasks_mask.op("&")(bit) == 0))
+        .values(
+            daily_ad_watched=case((stale, 0), else_=User.daily_ad_watched),
+            daily_tasks_mask=case((stale, bit), else_=User.daily_tasks_mask.op("|")(bit)),
+            daily_tasks_date=today,
+        )
+        .returning(User)
+    )
+    updated = _returning_one(db, stmt)
+    if updated is None:
+        db.rollback()
+        return {"success": False, "message": "Already claimed today", "user": _user_payload(_find_user(db, payload.telegram_id))}
+
+    # Same transaction as the claim above, so the reward is paid exactly once
+    _returning_one(
+        db,
+        update(UserStats)
+        .where(UserStats.user_id == user.id)
+        .values(coins=UserStats.coins + reward, total_coins=UserStats.total_coins + reward)
+        .returning(UserStats),
+    )
+    db.add(TaskStatus(user_id=user.id, task_id=task.id, status="claimed"))
     db.commit()
-    db.refresh(user)
-    return {"success": True, "reward_coins": reward, "user": _user_payload(user)}
+    _record_scores(updated)
+    return {"success": True, "reward_coins": reward, "user": _user_payload(updated)}
 
 
-@app.post("/api/adwatched")
-def ad_watched(payload: AdWatchedRequest, db: Session = Depends(get_db)):
+@app.post("/api/task/check")
+async def task_check(payload: TaskCheckRequest, db: Session = Depends(get_db)):
+    res = await run_db(db, _task_check, payload, None)
+    if res is None:
+        task = task_source.catalog.get(payload.task_id)
+        if task is None:  # removed by a catalog reload in between
+            raise HTTPException(404, "Task not found")
+        member = await tg_get_chat_member(task.chat_id, payload.telegram_id)
+        is_member = member.get("status") not in NOT_MEMBER_STATUSES
+        res = await run_db(db, _task_check, payload, is_member)
+    replica_guard.note_write(payload.telegram_id)
+    return res
+
+
+def _ad_watched(db: Session, payload: AdWatchedRequest):
     ensure_resets(db)
-    user = db.query(User).filter(User.telegram_id == payload.telegram_id).first()
-    if not user:
-        raise HTTPException(404, "User not found")
+    _flush_pending_for(db, payload.telegram_id)
 
-    if user.daily_ad_watched >= AD_WATCH_LIMIT:
+    # Limit check, lazy daily reset and reward in one conditional UPDATE
+    today = _today()
+    stale = or_(User.daily_tasks_date.is_(None), User.daily_tasks_date != today)
+    stmt = (
+        update(User)
+        .where(User.telegram_id == payload.telegram_id, or_(stale, User.daily_ad_watched < AD_WATCH_LIMIT))
+        .values(
+            daily_ad_watched=case((stale, 1), else_=User.daily_ad_watched + 1),
+            daily_tasks_mask=case((stale, 0), else_=User.daily_tasks_mask),
+            daily_tasks_date=today,
+            ton_credits=User.ton_credits + AD_WATCH_REWARD_TON,
+        )
+        .returning(User)
+    )
+    user = _returning_one(db, stmt)
+    if user is None:
+        user = _find_user(db, payload.telegram_id)
+        if not user:
+            raise HTTPException(404, "User not found")
         return {"success": False, "message": "Daily ad limit reached", "user": _user_payload(user)}
 
-    user.daily_ad_watched += 1
-    user.ton_credits = round(user.ton_credits + AD_WATCH_REWARD_TON, 4)
-
     db.commit()
-    db.refresh(user)
     return {
         "success": True,
         "watched": user.daily_ad_watched,
@@ -487,22 +1616,172 @@ def ad_watched(payload: AdWatchedRequest, db: Session = Depends(get_db)):
     }
 
 
-@app.post("/api/settings")
-def update_settings(payload: SettingsRequest, db: Session = Depends(get_db)):
+@app.post("/api/adwatched")
+async def ad_watched(payload: AdWatchedRequest, db: Session = Depends(get_db)):
+    res = await run_db(db, _ad_watched, payload)
+    replica_guard.note_write(payload.telegram_id)
+    return res
+
+
+def _update_settings(db: Session, payload: SettingsRequest):
     ensure_resets(db)
-    user = get_or_create_user(db, telegram_id=payload.telegram_id)
 
+    values: Dict[str, Any] = {}
     if payload.language is not None:
-        user.language = payload.language
+        values["language"] = payload.language
     if payload.sound_enabled is not None:
-        user.sound_enabled = payload.sound_enabled
+        values["sound_enabled"] = payload.sound_enabled
     if payload.vibration_enabled is not None:
-        user.vibration_enabled = payload.vibration_enabled
+        values["vibration_enabled"] = payload.vibration_enabled
     if payload.notifications_enabled is not None:
-        user.notifications_enabled = payload.notifications_enabled
+        values["notifications_enabled"] = payload.notifications_enabled
     if payload.wallet_address is not None:
-        user.wallet_address = payload.wallet_address.strip() or None
+        values["wallet_address"] = payload.wallet_address.strip() or None
+
+    user = None
+    if values:
+        stmt = update(User).where(User.telegram_id == payload.telegram_id).values(**values).returning(User)
+        user = _returning_one(db, stmt)
+    if user is None:
+        user = get_or_create_user(db, telegram_id=payload.telegram_id)
+        if values:
+            user = _returning_one(db, update(User).where(User.id == user.id).values(**values).returning(User))
 
     db.commit()
-    db.refresh(user)
     return {"success": True, "user": _user_payload(user)}
+
+
+@app.post("/api/settings")
+async def update_settings(payload: SettingsRequest, db: Session = Depends(get_db)):
+    res = await run_db(db, _update_settings, payload)
+    replica_guard.note_write(payload.telegram_id)
+    return res
+
+
+def _bootstrap(db: Session, payload: MeRequest):
+    ensure_resets(db)
+    user = get_or_create_user(db, telegram_id=payload.telegram_id, name=payload.name, language=payload.language)
+    return {
+        "config": get_config(),
+        "user": _user_payload(user),
+        **_tasks_payload(user),
+        "leaderboard": _leaderboard(db, "weekly", user.telegram_id, None, me=user),
+    }
+
+
+@app.post("/api/bootstrap")
+async def bootstrap(payload: MeRequest, db: Session = Depends(get_db)):
+    """Everything the web app needs at launch (config, user, tasks, weekly leaderboard) in one round trip."""
+    res = await run_db(db, _bootstrap, payload)
+    replica_guard.note_write(payload.telegram_id)
+    return res
+
+
+# -------------------- WebSocket tap channel --------------------
+# One authenticated socket per open web app: the client sends compact frames ("t" or "t<count>"),
+# the server aggregates them per connection for WS_FLUSH_MS, applies them in one DB write and
+# pushes only the changed fields of the user state. Idle sockets hold no task or DB session.
+WS_FLUSH_MS = int(os.getenv("WS_FLUSH_MS", "250"))
+WS_INIT_DATA_MAX_AGE = int(os.getenv("WS_INIT_DATA_MAX_AGE", "86400"))
+
+# compact key -> _user_payload field
+WS_FIELDS = {
+    "c": "coins",
+    "tc": "total_coins",
+    "x": "xp",
+    "nx": "next_level_xp",
+    "l": "level",
+    "w": "weekly_score",
+    "n": "total_taps",
+    "tp": "tap_power",
+    "ton": "ton_credits",
+}
+
+
+def _ws_taps(db: Session, ident: SimpleNamespace, count: int) -> Tuple[int, Dict[str, Any]]:
+    ensure_resets(db)
+    return _apply_tap_count(db, ident, count)
+
+
+class _TapConnection:
+    def __init__(self, websocket: WebSocket, ident: SimpleNamespace):
+        self.websocket = websocket
+        self.ident = ident
+        self.pending = 0
+        self.dropped = 0  # received taps refused by the tap limiter since the last flush
+        self.processed = 0  # taps received and applied (or clamped), echoed as "k"
+        self.sent: Dict[str, Any] = {}
+        self.flush_task: Optional[asyncio.Task] = None
+        self.lock = asyncio.Lock()
+
+    def add(self, count: int, granted: int) -> None:
+        self.pending += granted
+        self.dropped += count - granted
+        WS_TAPS.inc(amount=count)
+        if self.flush_task is None:
+            self.flush_task = asyncio.create_task(self._delayed_flush())
+
+    async def _delayed_flush(self) -> None:
+        await asyncio.sleep(WS_FLUSH_MS / 1000.0)
+        self.flush_task = None
+        await self.flush()
+
+    async def flush(self, push: bool = True) -> None:
+        async with self.lock:
+            count, self.pending = self.pending, 0
+            dropped, self.dropped = self.dropped, 0
+            # Nothing granted since the last push: only acknowledge, without touching the DB
+            payload = None
+            if count or not self.sent:
+                applied, payload = await run_in_session(_ws_taps, self.ident, count)
+                # granted taps clamped away by the plausibility check go back to the bucket
+                await _refund_taps(self.ident.telegram_id, count - applied)
+            if count:
+                replica_guard.note_write(self.ident.telegram_id)
+            self.processed += count + dropped
+            if not push:
+                return
+            delta = {}
+            for key, field in (WS_FIELDS.items() if payload else ()):
+                value = payload[field]
+                if self.sent.get(key) != value:
+                    delta[key] = self.sent[key] = value
+            delta["k"] = self.processed
+            try:
+                await self.websocket.send_text(json.dumps(delta, separators=(",", ":")))
+            except Exception:  # client went away mid-flush; the taps are already applied
+                logger.debug("ws push to %s failed", self.ident.telegram_id, exc_info=True)
+
+
+@app.websocket("/ws")
+async def tap_socket(websocket: WebSocket, init_data: str = ""):
+    try:
+        tg_user = verify_init_data(init_data, BOT_TOKEN, WS_INIT_DATA_MAX_AGE)
+    except InitDataError as e:
+        await websocket.close(code=4401, reason=str(e))
+        return
+    await websocket.accept()
+
+    ident = SimpleNamespace(telegram_id=int(tg_user["id"]), name=tg_user.get("first_name"), language=None)
+    conn = _TapConnection(websocket, ident)
+    WS_CONNECTIONS.inc()
+    try:
+        await conn.flush()  # full state snapshot
+        while True:
+            frame = await websocket.receive_text()
+            if not frame.startswith("t"):
+                continue
+            try:
+                count = int(frame[1:] or 1)
+            except ValueError:
+                continue
+            if 0 < count <= TAP_BATCH_MAX:
+                conn.add(count, await _limit_taps("ws", ident.telegram_id, count))
+    except WebSocketDisconnect:
+        pass
+    finally:
+        WS_CONNECTIONS.dec()
+        if conn.flush_task is not None:
+            conn.flush_task.cancel()  # still sleeping (cleared before a flush starts)
+        if conn.pending:
+            await conn.flush(push=False)
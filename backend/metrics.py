@@ -0,0 +1,262 @@
+from __future__ import annotations
+
+import contextvars
+import os
+import threading
+import time
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Minimal Prometheus-compatible metrics (text exposition format 0.0.4), no extra dependency.
+# Opt-in: /metrics is served on the app's public port. METRICS_TOKEN, when set, is required
+# as "Authorization: Bearer <token>" (scrape config: authorization.credentials).
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "0") == "1"
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 4, 5, 8, 13, 21, 34)
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Tuple[str, ...], values: LabelValues, extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _num(v: float) -> str:
+    if v == float("inf"):
+        return "+Inf"
+    return repr(float(v)) if isinstance(v, float) and not v.is_integer() else str(int(v))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, doc: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.doc = doc
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.doc}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, doc: str, labelnames: Iterable[str] = ()):
+        super().__init__(name, doc, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return self.header() + [f"{self.name}{_labels(self.labelnames, k)} {_num(v)}" for k, v in items]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, *labels: str, amount: float = 1) -> None:
+        self.inc(*labels, amount=-amount)
+
+    def set(self, *labels: str, value: float) -> None:
+        with self._lock:
+            self._values[labels] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, doc: str, labelnames: Iterable[str] = (), buckets: Iterable[float] = LATENCY_BUCKETS):
+        super().__init__(name, doc, labelnames)
+        self.buckets = tuple(buckets)
+        # labels -> [per-bucket counts (+Inf last), sum]
+        self._values: Dict[LabelValues, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                entry = self._values[labels] = ([0] * (len(self.buckets) + 1), [0.0])
+            entry[0][i] += 1
+            entry[1][0] += value
+
+    def count(self, *labels: str) -> int:
+        entry = self._values.get(labels)
+        return sum(entry[0]) if entry else 0
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = [(k, list(counts), s[0]) for k, (counts, s) in self._values.items()]
+        out = self.header()
+        for k, counts, total in items:
+            cumulative = 0
+            for bound, c in zip(self.buckets + (float("inf"),), counts):
+                cumulative += c
+                le = 'le="%s"' % _num(bound)
+                out.append(f"{self.name}_bucket{_labels(self.labelnames, k, le)} {cumulative}")
+            out.append(f"{self.name}_sum{_labels(self.labelnames, k)} {_num(total)}")
+            out.append(f"{self.name}_count{_labels(self.labelnames, k)} {cumulative}")
+        return out
+
+
+# -------------------- Registry --------------------
+HTTP_REQUESTS = Counter("http_requests_total", "HTTP requests by route, method and status.", ("route", "method", "status"))
+HTTP_LATENCY = Histogram("http_request_duration_seconds", "HTTP request latency by route.", ("route", "method"))
+HTTP_IN_FLIGHT = Gauge("http_requests_in_flight", "HTTP requests currently being served.")
+
+DB_STATEMENTS = Counter("db_statements_total", "SQL statements executed.")
+DB_STATEMENT_SECONDS = Counter("db_statement_seconds_total", "Time spent executing SQL statements.")
+DB_STATEMENTS_PER_REQUEST = Histogram(
+    "db_statements_per_request", "SQL statements per HTTP request.", ("route",), buckets=COUNT_BUCKETS
+)
+DB_TIME_PER_REQUEST = Histogram("db_time_per_request_seconds", "SQL execution time per HTTP request.", ("route",))
+DB_POOL_IN_USE = Gauge(
+    "db_pool_connections_in_use", "Pooled DB connections checked out (at pool size + overflow, callers wait).", ("engine",)
+)
+DB_POOL_CHECKOUTS = Counter("db_pool_checkouts_total", "Connections handed out by the pool.", ("engine",))
+DB_POOL_CONNECTS = Counter("db_pool_connects_total", "New DB connections opened by the pool.", ("engine",))
+DB_READ_SESSIONS = Counter(
+    "db_read_sessions_total", "Read-only endpoint sessions by database (replica, primary) and reason.", ("target", "reason")
+)
+DB_REPLICA_LAG = Gauge("db_replica_lag_seconds", "Last measured read replica lag (-1 = unreachable).")
+
+TELEGRAM_LATENCY = Histogram("telegram_api_duration_seconds", "Bot API call latency.", ("method", "outcome"))
+
+WS_CONNECTIONS = Gauge("ws_connections", "Open /ws tap sockets.")
+WS_TAPS = Counter("ws_taps_total", "Taps received over /ws.")
+
+TAP_LIMITED = Counter("tap_limited_total", "Taps dropped by the per-user tap limiter.", ("channel",))
+TAP_LIMITED_REQUESTS = Counter(
+    "tap_limited_requests_total", "Tap requests/frames rejected or clamped by the per-user tap limiter.", ("channel", "action")
+)
+TAP_LIMITER_ERRORS = Counter("tap_limiter_errors_total", "Shared tap limiter backend failures (taps were allowed).")
+
+BROADCAST_MESSAGES = Counter("broadcast_messages_total", "Broadcast messages by kind and outcome (sent, failed, blocked).", ("kind", "outcome"))
+
+RESET_RUNS = Counter("resets_total", "Daily/weekly reset executions.", ("kind",))
+RESET_DURATION = Histogram("reset_duration_seconds", "Time the reset lock was held for a reset run.")
+RESET_LOCK_BUSY = Counter("reset_lock_busy_total", "ensure_resets calls that found another reset in progress.")
+
+REGISTRY: List[_Metric] = [
+    HTTP_REQUESTS, HTTP_LATENCY, HTTP_IN_FLIGHT,
+    DB_STATEMENTS, DB_STATEMENT_SECONDS, DB_STATEMENTS_PER_REQUEST, DB_TIME_PER_REQUEST,
+    DB_POOL_IN_USE, DB_POOL_CHECKOUTS, DB_POOL_CONNECTS,
+    DB_READ_SESSIONS, DB_REPLICA_LAG,
+    TELEGRAM_LATENCY,
+    WS_CONNECTIONS, WS_TAPS,
+    TAP_LIMITED, TAP_LIMITED_REQUESTS, TAP_LIMITER_ERRORS,
+    BROADCAST_MESSAGES,
+    RESET_RUNS, RESET_DURATION, RESET_LOCK_BUSY,
+]
+
+
+def register(metric: _Metric) -> _Metric:
+    REGISTRY.append(metric)
+    return metric
+
+
+def render() -> str:
+    lines: List[str] = []
+    for m in REGISTRY:
+        lines.extend(m.render())
+    return "\n".join(lines) + "\n"
+
+
+# -------------------- SQLAlchemy hooks --------------------
+# Per-request [statements, seconds]; a mutable cell so threadpool/greenlet context copies update it too
+_request_db: contextvars.ContextVar[Optional[list]] = contextvars.ContextVar("request_db", default=None)
+
+
+def instrument_engine(engine, name: str = "primary") -> None:
+    """Counts statements and their time (cursor events) and pool usage (pool events)."""
+    from sqlalchemy import event
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info["metrics_t0"] = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info.pop("metrics_t0", time.perf_counter())
+        DB_STATEMENTS.inc()
+        DB_STATEMENT_SECONDS.inc(amount=elapsed)
+        cell = _request_db.get()
+        if cell is not None:
+            cell[0] += 1
+            cell[1] += elapsed
+
+    # The pool has no "before checkout" event, so the wait itself is not observable;
+    # connections in use reaching pool size + overflow is the saturation signal
+    @event.listens_for(engine, "connect")
+    def _connect(dbapi_conn, record):
+        DB_POOL_CONNECTS.inc(name)
+
+    @event.listens_for(engine, "checkout")
+    def _checkout(dbapi_conn, record, proxy):
+        DB_POOL_CHECKOUTS.inc(name)
+        DB_POOL_IN_USE.inc(name)
+
+    @event.listens_for(engine, "checkin")
+    def _checkin(dbapi_conn, record):
+        DB_POOL_IN_USE.dec(name)
+
+    @event.listens_for(engine, "detach")
+    def _detach(dbapi_conn, record):  # leaves the pool while checked out, never checked in
+        DB_POOL_IN_USE.dec(name)
+
+
+# -------------------- ASGI middleware --------------------
+class MetricsMiddleware:
+    """Pure ASGI middleware: per-route latency/status, in-flight gauge, DB work per request."""
+
+    def __init__(self, app, skip_paths: Iterable[str] = ("/metrics",)):
+        self.app = app
+        self.skip_paths = set(skip_paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.skip_paths:
+            return await self.app(scope, receive, send)
+
+        status = ["500"]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = str(message["status"])
+            await send(message)
+
+        cell = [0, 0.0]
+        token = _request_db.set(cell)
+        HTTP_IN_FLIGHT.inc()
+        t0 = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - t0
+            HTTP_IN_FLIGHT.dec()
+            _request_db.reset(token)
+            route = scope.get("route")
+            # Templated path keeps label cardinality bounded; static files and 404s share one label
+            label = route.path if route is not None and hasattr(route, "path") else "other"
+            method = scope["method"]
+            HTTP_REQUESTS.inc(label, method, status[0])
+            HTTP_LATENCY.observe(elapsed, label, method)
+            DB_STATEMENTS_PER_REQUEST.observe(cell[0], label)
+            DB_TIME_PER_REQUEST.observe(cell[1], label)
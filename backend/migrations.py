@@ -0,0 +1,271 @@
+"""Schema migrations for existing deployments.
+
+create_all() only creates missing tables; it never adds columns or indexes to tables
+that already exist. Each migration below runs once per database, in version order,
+inside one transaction, and is recorded in schema_version. A new database is created
+at the current schema and stamped with every version instead (see prepare_schema).
+
+    python -m backend.migrations            # apply pending migrations (DATABASE_URL)
+    python -m backend.migrations --status   # show applied / pending
+
+Run it as the deploy's release step; with SCHEMA_ON_STARTUP=check the app only verifies
+the applied versions on boot and refuses to start while migrations are pending.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import logging
+from datetime import datetime
+from typing import Callable, List, Tuple
+
+from sqlalchemy import inspect, select, text
+from sqlalchemy.engine import Connection
+
+try:
+    from .db import Base, lift_statement_timeout
+    from .models import SchemaVersion, User
+    from .tasks import load_catalog
+except ImportError:  # running as single-folder (no package)
+    from db import Base, lift_statement_timeout
+    from models import SchemaVersion, User
+    from tasks import load_catalog
+
+logger = logging.getLogger(__name__)
+
+class SchemaNotReady(RuntimeError):
+    pass
+
+
+Migration = Tuple[int, str, Callable[[Connection], None]]
+MIGRATIONS: List[Migration] = []
+
+
+def migration(version: int, description: str):
+    def register(fn: Callable[[Connection], None]):
+        MIGRATIONS.append((version, description, fn))
+        MIGRATIONS.sort(key=lambda m: m[0])
+        return fn
+
+    return register
+
+
+# Plain DDL (not the model Index objects): a migration must keep meaning the same
+# thing after models.py changes. IF [NOT] EXISTS works on SQLite and Postgres.
+def _create_index(conn: Connection, name: str, table: str, columns: str) -> None:
+    conn.execute(text(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({columns})"))
+
+
+def _drop_index(conn: Connection, name: str) -> None:
+    conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+
+
+def _columns(conn: Connection, table: str) -> List[str]:
+    return [c["name"] for c in inspect(conn).get_columns(table)]
+
+
+# -------------------- Migrations --------------------
+@migration(1, "leaderboard score indexes")
+def _leaderboard_indexes(conn: Connection) -> None:
+    # Postgres: plain CREATE INDEX locks writes on the table while it builds; on a large
+    # users table run `CREATE INDEX CONCURRENTLY` by hand first, this then becomes a no-op.
+    if "total_coins" in _columns(conn, "users"):  # moved to user_stats by migration 3
+        _create_index(conn, "ix_users_total_coins_id", "users", "total_coins DESC, id")
+    _create_index(conn, "ix_weekly_scores_yearweek_score", "weekly_scores", "yearweek, score DESC")
+
+
+@migration(2, "weekly leaderboard keyset index")
+def _weekly_keyset_index(conn: Connection) -> None:
+    # (yearweek, score DESC, user_id) serves keyset pages and around-me seeks; it also
+    # covers every query of the old (yearweek, score DESC) index, which is dropped
+    _create_index(conn, "ix_weekly_scores_yearweek_score_user", "weekly_scores", "yearweek, score DESC, user_id")
+    _drop_index(conn, "ix_weekly_scores_yearweek_score")
+
+
+# Tap counters moved from users to user_stats
+_STATS_COLUMNS = ("level", "xp", "next_level_xp", "coins", "total_coins", "tap_power", "total_taps", "last_tap_at")
+
+
+@migration(3, "hot counters in user_stats")
+def _user_stats(conn: Connection) -> None:
+    conn.execute(text(
+        "CREATE TABLE IF NOT EXISTS user_stats ("
+        " user_id INTEGER NOT NULL PRIMARY KEY REFERENCES users (id),"
+        " level INTEGER NOT NULL DEFAULT 1,"
+        " xp INTEGER NOT NULL DEFAULT 0,"
+        " next_level_xp INTEGER NOT NULL DEFAULT 1000,"
+        " coins INTEGER NOT NULL DEFAULT 0,"
+        " total_coins INTEGER NOT NULL DEFAULT 0,"
+        " tap_power INTEGER NOT NULL DEFAULT 1,"
+        " total_taps INTEGER NOT NULL DEFAULT 0,"
+        " last_tap_at TIMESTAMP,"
+        " updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP)"
+    ))
+    columns = ", ".join(_STATS_COLUMNS)
+    conn.execute(text(
+        f"INSERT INTO user_stats (user_id, {columns}, updated_at)"
+        f" SELECT id, {columns}, updated_at FROM users u"
+        " WHERE NOT EXISTS (SELECT 1 FROM user_stats s WHERE s.user_id = u.id)"
+    ))
+    _create_index(conn, "ix_user_stats_total_coins_user", "user_stats", "total_coins DESC, user_id")
+    # Dropping the columns keeps users rows narrow and lets new rows omit them (they were
+    # NOT NULL without a server default). Postgres only marks them dropped; SQLite (3.35+)
+    # rewrites the table once.
+    _drop_index(conn, "ix_users_total_coins_id")
+    existing = set(_columns(conn, "users"))
+    for column in _STATS_COLUMNS:
+        if column in existing:
+            conn.execute(text(f"ALTER TABLE users DROP COLUMN {column}"))
+
+
+@migration(4, "task claims as a bitmask")
+def _task_claims_mask(conn: Connection) -> None:
+    if "daily_tasks_mask" not in _columns(conn, "users"):
+        conn.execute(text("ALTER TABLE users ADD COLUMN daily_tasks_mask BIGINT NOT NULL DEFAULT 0"))
+    if "daily_tasks_claimed" not in _columns(conn, "users"):
+        return
+    # Only rows that claimed something on their daily_tasks_date carry a JSON list
+    catalog = load_catalog()
+    rows = conn.execute(text(
+        "SELECT id, daily_tasks_claimed FROM users"
+        " WHERE daily_tasks_claimed IS NOT NULL AND daily_tasks_claimed <> '[]'"
+    )).all()
+    masks = []
+    for user_id, claimed in rows:
+        try:
+            masks.append({"id": user_id, "mask": catalog.mask_of(json.loads(claimed))})
+        except (TypeError, ValueError):
+            continue
+    if masks:
+        conn.execute(text("UPDATE users SET daily_tasks_mask = :mask WHERE id = :id"), masks)
+    conn.execute(text("ALTER TABLE users DROP COLUMN daily_tasks_claimed"))
+
+
+@migration(5, "broadcast recipients index")
+def _broadcast_recipients_index(conn: Connection) -> None:
+    # The broadcasts table itself is new: create_all adds it
+    _create_index(conn, "ix_users_notifications_id", "users", "notifications_enabled, id")
+
+
+@migration(6, "legacy weekly scores into weekly_scores")
+def _legacy_weekly_scores(conn: Connection) -> None:
+    # users.weekly_score holds the scores of the week the last reset started. It used to be
+    # copied on every boot that found weekly_scores empty, which is also the state after a
+    # quiet week and history pruning: that revived stale scores. Copy once, drop the column.
+    if "weekly_score" not in _columns(conn, "users"):
+        return
+    if conn.execute(text("SELECT 1 FROM weekly_scores LIMIT 1")).first() is None:
+        yw = conn.execute(text("SELECT last_weekly_reset_yearweek FROM app_state WHERE id = 1")).scalar()
+        if yw is None:
+            iso = datetime.utcnow().date().isocalendar()
+            yw = int(iso.year) * 100 + int(iso.week)
+        conn.execute(
+            text(
+                "INSERT INTO weekly_scores (yearweek, user_id, score)"
+                " SELECT :yw, id, weekly_score FROM users WHERE weekly_score > 0"
+            ),
+            {"yw": yw},
+        )
+    conn.execute(text("ALTER TABLE users DROP COLUMN weekly_score"))
+
+
+# -------------------- Runner --------------------
+def applied_versions(conn: Connection) -> List[int]:
+    SchemaVersion.__table__.create(conn, checkfirst=True)
+    return list(conn.execute(select(SchemaVersion.version).order_by(SchemaVersion.version)).scalars())
+
+
+def migrate(conn: Connection) -> List[int]:
+    """Applies pending migrations on conn (sync Connection; use run_sync for async engines)."""
+    done = set(applied_versions(conn))
+    applied = []
+    for version, description, fn in MIGRATIONS:
+        if version in done:
+            continue
+        logger.info("applying migration %s: %s", version, description)
+        fn(conn)
+        conn.execute(
+            SchemaVersion.__table__.insert().values(
+                version=version, description=description, applied_at=datetime.utcnow()
+            )
+        )
+        applied.append(version)
+    return applied
+
+
+def pending_versions(conn: Connection) -> List[int]:
+    """Versions not applied yet, without creating anything (every version for a new database)."""
+    if not inspect(conn).has_table(SchemaVersion.__tablename__):
+        return [m[0] for m in MIGRATIONS]
+    done = set(conn.execute(select(SchemaVersion.version)).scalars())
+    return [version for version, _description, _fn in MIGRATIONS if version not in done]
+
+
+def check_schema(conn: Connection) -> None:
+    """Raises SchemaNotReady unless every migration is applied (SCHEMA_ON_STARTUP=check)."""
+    pending = pending_versions(conn)
+    if pending:
+        raise SchemaNotReady(f"schema migrations {pending} are pending; run `python -m backend.migrations` first")
+
+
+def stamp(conn: Connection) -> None:
+    """Marks every migration as applied (for a database created at the current schema)."""
+    done = set(applied_versions(conn))
+    for version, description, _fn in MIGRATIONS:
+        if version not in done:
+            conn.execute(
+                SchemaVersion.__table__.insert().values(
+                    version=version, description=description, applied_at=datetime.utcnow()
+                )
+            )
+
+
+def prepare_schema(conn: Connection) -> List[int]:
+    """Creates missing tables and applies pending migrations; returns the applied versions.
+
+    Without a users table the database is new: create_all builds the current schema
+    and it is stamped, the migrations only exist to upgrade older databases.
+    """
+    # Backfills / CREATE INDEX on a big table outlast the per-statement timeout meant for requests
+    lift_statement_timeout(conn)
+    fresh = not inspect(conn).has_table(User.__tablename__)
+    Base.metadata.create_all(conn)
+    if fresh:
+        stamp(conn)
+        return []
+    return migrate(conn)
+
+
+def migrate_engine(engine) -> List[int]:
+    with engine.begin() as conn:
+        return prepare_schema(conn)
+
+
+def _status(conn: Connection) -> List[Tuple[int, str, bool]]:
+    done = set(applied_versions(conn))
+    return [(version, description, version in done) for version, description, _fn in MIGRATIONS]
+
+
+def main() -> None:
+    # The app's own engine: an async DATABASE_URL (asyncpg) needs no sync driver here
+    try:
+        from .db import run_on_connection
+    except ImportError:
+        from db import run_on_connection
+
+    ap = argparse.ArgumentParser(description="Apply schema migrations to DATABASE_URL.")
+    ap.add_argument("--status", action="store_true", help="only list applied and pending migrations")
+    args = ap.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    if args.status:
+        for version, description, applied in asyncio.run(run_on_connection(_status)):
+            print(f"{version:>4} {'applied' if applied else 'pending':<8} {description}")
+        return
+    applied = asyncio.run(run_on_connection(prepare_schema))
+    print(f"applied: {applied}" if applied else "schema is up to date")
+
+
+if __name__ == "__main__":
+    main()
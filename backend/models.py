@@ -1,7 +1,7 @@
 from __future__ import annotations
 
 from datetime import datetime, date
-from sqlalchemy import Column, Integer, String, Float, Date, DateTime, ForeignKey, Boolean, Text
+from sqlalchemy import BigInteger, Column, Integer, String, Text, Float, Date, DateTime, ForeignKey, Boolean, Index
 from sqlalchemy.orm import relationship
 
 try:
@@ -21,28 +21,17 @@ class User(Base):
     name = Column(String, nullable=True)
     language = Column(String, default="en", nullable=False)
 
-    # Progress
-    level = Column(Integer, default=1, nullable=False)
-    xp = Column(Integer, default=0, nullable=False)
-    next_level_xp = Column(Integer, default=1000, nullable=False)
-
-    # Economy
-    coins = Column(Integer, default=0, nullable=False)
-    total_coins = Column(Integer, default=0, nullable=False)
+    # Counters written by taps live in user_stats (narrow row, see UserStats)
+    stats = relationship("UserStats", uselist=False, lazy="joined", back_populates="user", cascade="all, delete-orphan")
 
-    # Tapping
-    tap_power = Column(Integer, default=1, nullable=False)
-    total_taps = Column(Integer, default=0, nullable=False)
-
-    # Weekly leaderboard
-    weekly_score = Column(Integer, default=0, nullable=False)
+    # Weekly scores live in weekly_scores (migration 6 moved and dropped users.weekly_score)
 
     # TON credits (ONLY: level-up, ad-watch, weekly reward)
     ton_credits = Column(Float, default=0.0, nullable=False)
 
     # Daily limits
     daily_ad_watched = Column(Integer, default=0, nullable=False)  # 0..10
-    daily_tasks_claimed = Column(Text, default="[]", nullable=False)  # JSON list of task ids claimed today
+    daily_tasks_mask = Column(BigInteger, default=0, nullable=False)  # bit i: task with catalog bit i claimed today
     daily_tasks_date = Column(Date, nullable=True)
 
     # Settings
@@ -54,17 +43,48 @@ class User(Base):
     wallet_address = Column(String, nullable=True)
 
     # Meta
-    last_tap_at = Column(DateTime, nullable=True)
     last_chest_date = Column(Date, nullable=True)
 
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
 
-    # Legacy relation (optional usage)
+    # Task claim history
     tasks = relationship("TaskStatus", back_populates="user")
 
 
+class UserStats(Base):
+    """Hot per-user counters: everything a tap reads or writes.
+
+    Kept apart from the wide users row so a tap rewrites only this narrow row
+    (less tuple bloat and WAL on Postgres); users keeps profile, settings and daily state.
+    """
+
+    __tablename__ = "user_stats"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+
+    # Progress
+    level = Column(Integer, default=1, nullable=False)
+    xp = Column(Integer, default=0, nullable=False)
+    next_level_xp = Column(Integer, default=1000, nullable=False)
+
+    # Economy
+    coins = Column(Integer, default=0, nullable=False)
+    total_coins = Column(Integer, default=0, nullable=False)
+
+    # Tapping
+    tap_power = Column(Integer, default=1, nullable=False)
+    total_taps = Column(Integer, default=0, nullable=False)
+    last_tap_at = Column(DateTime, nullable=True)
+
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+
+    user = relationship("User", back_populates="stats")
+
+
 class TaskStatus(Base):
+    """Task claim history: one "claimed" row per successful claim (today's state is daily_tasks_mask)."""
+
     __tablename__ = "task_status"
 
     id = Column(Integer, primary_key=True, index=True)
@@ -76,6 +96,27 @@ class TaskStatus(Base):
     user = relationship("User", back_populates="tasks")
 
 
+class WeeklyScore(Base):
+    """Weekly leaderboard scores, keyed by ISO week (year*100 + week).
+
+    A new week simply starts writing under a new yearweek key, so past weeks stay queryable.
+    """
+
+    __tablename__ = "weekly_scores"
+
+    yearweek = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    score = Column(Integer, default=0, nullable=False)
+
+
+# weekly leaderboard: WHERE yearweek = ? ORDER BY score DESC, user_id (keyset pages)
+Index("ix_weekly_scores_yearweek_score_user", WeeklyScore.yearweek, WeeklyScore.score.desc(), WeeklyScore.user_id)
+# all_time leaderboard: ORDER BY total_coins DESC, user_id
+Index("ix_user_stats_total_coins_user", UserStats.total_coins.desc(), UserStats.user_id)
+# broadcast recipients: WHERE notifications_enabled AND id > ? ORDER BY id (keyset chunks)
+Index("ix_users_notifications_id", User.notifications_enabled, User.id)
+
+
 class AppState(Base):
     """Singleton table to avoid double daily/weekly resets."""
 
@@ -90,3 +131,41 @@ class AppState(Base):
     last_weekly_awarded_at = Column(DateTime, nullable=True)
 
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+
+
+class Broadcast(Base):
+    """A message to every opted-in user (or to one user), sent by broadcast.py.
+
+    Recipients are walked in users.id order; last_user_id is the checkpoint a crashed
+    run resumes from. The lease (owner, lease_until) keeps two workers off the same run.
+    """
+
+    __tablename__ = "broadcasts"
+
+    id = Column(Integer, primary_key=True)
+    kind = Column(String(50), nullable=False)  # weekly_reset, weekly_winner, daily_tasks, custom
+    key = Column(String(100), unique=True, nullable=True)  # dedupe key of event broadcasts, e.g. weekly_reset:202642
+    text = Column(Text, nullable=False)  # JSON {locale: text}, "en" is the fallback
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=True)  # only this user (if opted in)
+
+    status = Column(String(20), default="pending", nullable=False)  # pending | running | done
+    last_user_id = Column(Integer, default=0, nullable=False)
+    sent = Column(Integer, default=0, nullable=False)
+    failed = Column(Integer, default=0, nullable=False)
+    blocked = Column(Integer, default=0, nullable=False)  # bot blocked by the user: opted out
+
+    owner = Column(String(64), nullable=True)
+    lease_until = Column(DateTime, nullable=True)
+
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    finished_at = Column(DateTime, nullable=True)
+
+
+class SchemaVersion(Base):
+    """Applied schema migrations (see migrations.py)."""
+
+    __tablename__ = "schema_version"
+
+    version = Column(Integer, primary_key=True, autoincrement=False)
+    description = Column(String(200), nullable=False)
+    applied_at = Column(DateTime, default=datetime.utcnow, nullable=False)
@@ -0,0 +1,233 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import threading
+import time
+from bisect import bisect_left, insort
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# Keys are single ints ordered like (score DESC, user_id ASC): (-score << 32) + user_id.
+# user ids are assumed to fit in 32 bits.
+_ID_BITS = 32
+_ID_MASK = (1 << _ID_BITS) - 1
+
+
+def _key(user_id: int, score: int) -> int:
+    return (-score << _ID_BITS) + user_id
+
+
+def _unkey(key: int) -> Tuple[int, int]:
+    user_id = key & _ID_MASK
+    return user_id, -((key - user_id) >> _ID_BITS)
+
+
+class RankIndex:
+    """Order-statistic index over one leaderboard scope.
+
+    Sorted buckets of keys plus a Fenwick tree over bucket sizes, so inserts,
+    removals and rank-of-score queries are O(log n) (plus a bucket-sized memmove).
+    Only positive scores are stored; a user without an entry has score 0.
+    """
+
+    LOAD = 1000
+
+    def __init__(self, items: Iterable[Tuple[int, int]] = ()):
+        self._lock = threading.Lock()
+        self._scores: Dict[int, int] = {}
+        self._lists: List[List[int]] = []
+        self._maxes: List[int] = []
+        self._tree: List[int] = [0]
+        self._load(items)
+
+    # ---- internal ----
+    def _load(self, items: Iterable[Tuple[int, int]]) -> None:
+        self._scores = {uid: score for uid, score in items if score > 0}
+        keys = sorted(_key(uid, score) for uid, score in self._scores.items())
+        self._lists = [keys[i:i + self.LOAD] for i in range(0, len(keys), self.LOAD)]
+        self._maxes = [lst[-1] for lst in self._lists]
+        self._rebuild_tree()
+
+    def _rebuild_tree(self) -> None:
+        n = len(self._lists)
+        tree = [0] * (n + 1)
+        for i, lst in enumerate(self._lists, 1):
+            tree[i] += len(lst)
+            j = i + (i & -i)
+            if j <= n:
+                tree[j] += tree[i]
+        self._tree = tree
+
+    def _tree_add(self, i: int, delta: int) -> None:
+        i += 1
+        n = len(self._tree)
+        while i < n:
+            self._tree[i] += delta
+            i += i & -i
+
+    def _prefix(self, i: int) -> int:
+        """Number of keys in buckets [0, i)."""
+        total = 0
+        while i > 0:
+            total += self._tree[i]
+            i -= i & -i
+        return total
+
+    def _insert(self, key: int) -> None:
+        if not self._lists:
+            self._lists = [[key]]
+            self._maxes = [key]
+            self._rebuild_tree()
+            return
+        i = bisect_left(self._maxes, key)
+        if i == len(self._maxes):
+            i -= 1
+            self._lists[i].append(key)
+            self._maxes[i] = key
+        else:
+            insort(self._lists[i], key)
+        self._tree_add(i, 1)
+
+        lst = self._lists[i]
+        if len(lst) > 2 * self.LOAD:
+            self._lists[i:i + 1] = [lst[:self.LOAD], lst[self.LOAD:]]
+            self._maxes[i:i + 1] = [self._lists[i][-1], self._lists[i + 1][-1]]
+            self._rebuild_tree()
+
+    def _remove(self, key: int) -> None:
+        i = bisect_left(self._maxes, key)
+        lst = self._lists[i]
+        del lst[bisect_left(lst, key)]
+        if lst:
+            self._maxes[i] = lst[-1]
+            self._tree_add(i, -1)
+        else:
+            del self._lists[i]
+            del self._maxes[i]
+            self._rebuild_tree()
+
+    def _count_before(self, key: int) -> int:
+        i = bisect_left(self._maxes, key)
+        if i == len(self._maxes):
+            return len(self._scores)
+        return self._prefix(i) + bisect_left(self._lists[i], key)
+
+    # ---- public ----
+    def __len__(self) -> int:
+        return len(self._scores)
+
+    def reset(self, items: Iterable[Tuple[int, int]] = ()) -> None:
+        with self._lock:
+            self._load(items)
+
+    def set(self, user_id: int, score: int) -> None:
+        with self._lock:
+            old = self._scores.get(user_id)
+            if old == score or (old is None and score <= 0):
+                return
+            if old is not None:
+                self._remove(_key(user_id, old))
+                del self._scores[user_id]
+            if score > 0:
+                self._scores[user_id] = score
+                self._insert(_key(user_id, score))
+
+    def score(self, user_id: int) -> int:
+        return self._scores.get(user_id, 0)
+
+    def rank_of_score(self, score: int) -> int:
+        """1 + number of entries with a strictly higher score (same as COUNT(*) WHERE score > s)."""
+        with self._lock:
+            return self._count_before(_key(0, score)) + 1
+
+    def rank(self, user_id: int) -> int:
+        return self.rank_of_score(self.score(user_id))
+
+    def position(self, user_id: int) -> Optional[int]:
+        """1-based position in (score DESC, user_id ASC) order; None without an entry."""
+        with self._lock:
+            score = self._scores.get(user_id)
+            if score is None:
+                return None
+            return self._count_before(_key(user_id, score)) + 1
+
+    def top(self, n: int) -> List[Tuple[int, int]]:
+        """[(user_id, score), ...] for the n highest scores."""
+        out: List[Tuple[int, int]] = []
+        with self._lock:
+            for lst in self._lists:
+                for key in lst:
+                    if len(out) >= n:
+                        return out
+                    out.append(_unkey(key))
+        return out
+
+
+class Leaderboards:
+    """Rank indexes for the weekly (current ISO week) and all_time scopes."""
+
+    def __init__(self):
+        self.weekly = RankIndex()
+        self.weekly_yearweek: Optional[int] = None
+        self.all_time = RankIndex()
+        self.ready = False
+
+    def load(self, yearweek: int, weekly: Iterable[Tuple[int, int]], all_time: Iterable[Tuple[int, int]]) -> None:
+        self.weekly.reset(weekly)
+        self.weekly_yearweek = yearweek
+        self.all_time.reset(all_time)
+        self.ready = True
+
+    def set_weekly(self, yearweek: int, user_id: int, score: int) -> None:
+        if self.weekly_yearweek is None or yearweek > self.weekly_yearweek:
+            # first write of a new week
+            self.weekly.reset()
+            self.weekly_yearweek = yearweek
+        elif yearweek < self.weekly_yearweek:
+            return
+        self.weekly.set(user_id, score)
+
+    def set_all_time(self, user_id: int, score: int) -> None:
+        self.all_time.set(user_id, score)
+
+
+def rows_version(rows: List[Dict[str, Any]]) -> str:
+    """Content-derived version of leaderboard rows (identical on every worker)."""
+    return hashlib.sha1(json.dumps(rows, sort_keys=True, separators=(",", ":")).encode()).hexdigest()[:16]
+
+
+class LeaderboardSnapshot:
+    """Cached top-N rows of one leaderboard scope.
+
+    Rebuilt on read once it is older than `ttl` seconds or `max_writes` score changes
+    were recorded since it was built.
+    """
+
+    def __init__(self, ttl: float, max_writes: int):
+        self.ttl = ttl
+        self.max_writes = max_writes
+        self.key: Any = None
+        self.rows: List[Dict[str, Any]] = []
+        self.cursor: Optional[str] = None  # next page after rows
+        self.version = ""
+        self.built_at: Optional[float] = None
+        self.writes = 0
+
+    def note_write(self) -> None:
+        self.writes += 1
+
+    def fresh(self, key: Any) -> bool:
+        return (
+            self.built_at is not None
+            and self.key == key
+            and time.monotonic() - self.built_at < self.ttl
+            and self.writes < self.max_writes
+        )
+
+    def store(self, key: Any, rows: List[Dict[str, Any]], cursor: Optional[str] = None) -> None:
+        self.writes = 0
+        self.key = key
+        self.rows = rows
+        self.cursor = cursor
+        self.version = rows_version(rows)
+        self.built_at = time.monotonic()
@@ -0,0 +1,135 @@
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Tuple
+
+try:  # optional: pip install redis (only for the shared "redis" backend)
+    import redis.asyncio as aioredis
+except ImportError:  # pragma: no cover
+    aioredis = None
+
+try:
+    from .metrics import TAP_LIMITER_ERRORS
+except ImportError:  # running as single-folder (no package)
+    from metrics import TAP_LIMITER_ERRORS
+
+logger = logging.getLogger(__name__)
+
+
+class LocalBucketStore:
+    """In-process token buckets (LRU-bounded). Every worker process enforces its own budget,
+    so with N workers a user gets up to N times the configured rate."""
+
+    def __init__(self, max_keys: int = 100_000, clock: Callable[[], float] = time.monotonic):
+        self.max_keys = max_keys
+        self.clock = clock  # seconds, monotonic (a fake clock in tests)
+        self._lock = threading.Lock()
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()  # key -> (tokens, monotonic ts)
+
+    async def take(self, key: str, n: int, rate: float, burst: float) -> int:
+        now = self.clock()
+        with self._lock:
+            tokens, ts = self._buckets.pop(key, (burst, now))
+            tokens = min(burst, tokens + (now - ts) * rate)
+            granted = min(n, int(tokens))
+            self._buckets[key] = (tokens - granted, now)
+            if len(self._buckets) > self.max_keys:
+                # Least recently used bucket; after that long it would be (nearly) full anyway
+                self._buckets.popitem(last=False)
+        return granted
+
+    async def refund(self, key: str, n: int, rate: float, burst: float) -> None:
+        with self._lock:
+            entry = self._buckets.get(key)
+            if entry is not None:  # an evicted bucket starts full again anyway
+                self._buckets[key] = (min(burst, entry[0] + n), entry[1])
+
+
+# Refill + take in one round trip. The clock is the Redis server's, so workers with
+# skewed clocks still share one consistent bucket; idle buckets expire once full.
+_TAKE_SCRIPT = """
+local rate, burst, n = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local b = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(b[1]) or burst
+local ts = tonumber(b[2]) or now
+tokens = math.min(burst, tokens + math.max(now - ts, 0) * rate)
+local granted = math.min(n, math.floor(tokens))
+redis.call('HSET', KEYS[1], 'tokens', tokens - granted, 'ts', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil(burst / rate * 1000) + 1000)
+return granted
+"""
+
+# Gives tokens back (capped at burst); an expired bucket is full anyway
+_REFUND_SCRIPT = """
+local burst, n = tonumber(ARGV[1]), tonumber(ARGV[2])
+local tokens = tonumber(redis.call('HGET', KEYS[1], 'tokens'))
+if tokens then
+  redis.call('HSET', KEYS[1], 'tokens', math.min(burst, tokens + n))
+end
+return 0
+"""
+
+
+class RedisBucketStore:
+    """Token buckets in Redis, shared by all workers (one global budget per user).
+
+    If Redis is unreachable the taps are let through (counted in tap_limiter_errors_total):
+    the limiter protects the database, it must not take tapping down with it.
+    """
+
+    def __init__(self, url: str, prefix: str = "taplimit:"):
+        if aioredis is None:
+            raise RuntimeError("the redis tap limiter backend needs `pip install redis`")
+        self.prefix = prefix
+        self._redis = aioredis.from_url(url)
+        self._take = self._redis.register_script(_TAKE_SCRIPT)
+        self._refund = self._redis.register_script(_REFUND_SCRIPT)
+
+    async def take(self, key: str, n: int, rate: float, burst: float) -> int:
+        try:
+            return int(await self._take(keys=[self.prefix + key], args=[rate, burst, n]))
+        except Exception as e:
+            TAP_LIMITER_ERRORS.inc()
+            logger.warning("tap limiter backend failed, allowing taps: %s", e)
+            return n
+
+    async def refund(self, key: str, n: int, rate: float, burst: float) -> None:
+        try:
+            await self._refund(keys=[self.prefix + key], args=[burst, n])
+        except Exception as e:
+            TAP_LIMITER_ERRORS.inc()
+            logger.warning("tap limiter refund failed: %s", e)
+
+
+def make_bucket_store(backend: str, redis_url: str = "", max_keys: int = 100_000):
+    if backend == "local":
+        return LocalBucketStore(max_keys=max_keys)
+    if backend == "redis":
+        return RedisBucketStore(redis_url)
+    raise ValueError(f"unknown tap limiter backend {backend!r} (local or redis)")
+
+
+class TokenBucketLimiter:
+    """Per-key token bucket: `rate` tokens/second sustained, up to `burst` at once (rate <= 0 = off)."""
+
+    def __init__(self, rate: float, burst: float, store):
+        self.rate = rate
+        self.burst = max(burst, 1.0)
+        self.store = store
+
+    async def take(self, key: str, n: int = 1) -> int:
+        """Takes up to n tokens from key's bucket; returns how many were granted (0..n)."""
+        if self.rate <= 0 or n <= 0:
+            return max(n, 0)
+        return await self.store.take(key, n, self.rate, self.burst)
+
+    async def refund(self, key: str, n: int) -> None:
+        """Returns n tokens taken for work that was not done (e.g. taps not applied)."""
+        if self.rate <= 0 or n <= 0:
+            return
+        await self.store.refund(key, n, self.rate, self.burst)
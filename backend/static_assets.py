@@ -0,0 +1,170 @@
+from __future__ import annotations
+
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+try:  # optional: pip install brotli
+    import brotli
+except ImportError:  # pragma: no cover
+    brotli = None
+
+# Hashed assets never change under the same URL
+IMMUTABLE = "public, max-age=31536000, immutable"
+# index.html and unhashed URLs: cacheable, but revalidated (cheap 304) on every open
+REVALIDATE = "no-cache"
+
+# Files that keep a stable URL only (referenced from outside index.html)
+UNHASHED = {"index.html", "tonconnect-manifest.json"}
+
+# Only web assets are served: in single-folder mode static_dir is the backend directory
+# (Python sources, a SQLite .db, ...). Names in UNHASHED are served whatever their extension.
+SERVED_EXTENSIONS = {
+    ".html", ".js", ".mjs", ".css", ".svg", ".png", ".jpg", ".jpeg", ".gif", ".webp", ".ico",
+    ".woff", ".woff2", ".webmanifest",
+}
+SKIPPED_DIRS = {"__pycache__", "node_modules"}
+
+COMPRESSIBLE = ("text/", "application/javascript", "application/json", "image/svg+xml")
+MIN_COMPRESS_BYTES = 512
+
+
+@dataclass
+class Asset:
+    body: bytes
+    content_type: str
+    etag: str
+    cache_control: str
+    variants: Dict[str, bytes] = field(default_factory=dict)  # content-encoding -> body
+
+    def pick(self, accept_encoding: str) -> Tuple[Optional[str], bytes]:
+        accepted = {e.split(";", 1)[0].strip() for e in accept_encoding.lower().split(",")}
+        for enc in ("br", "gzip"):
+            if enc in accepted and enc in self.variants:
+                return enc, self.variants[enc]
+        return None, self.body
+
+
+def _served(name: str) -> bool:
+    return name in UNHASHED or os.path.splitext(name)[1].lower() in SERVED_EXTENSIONS
+
+
+def _hashed_name(rel: str, digest: str) -> str:
+    root, ext = os.path.splitext(rel)
+    return f"{root}.{digest[:10]}{ext}"
+
+
+def _make_asset(body: bytes, rel: str, cache_control: str) -> Asset:
+    content_type = mimetypes.guess_type(rel)[0] or "application/octet-stream"
+    if content_type.startswith("text/") or content_type in ("application/javascript", "application/json"):
+        content_type += "; charset=utf-8"
+    asset = Asset(
+        body=body,
+        content_type=content_type,
+        etag=hashlib.sha256(body).hexdigest()[:20],
+        cache_control=cache_control,
+    )
+    if content_type.startswith(COMPRESSIBLE) and len(body) >= MIN_COMPRESS_BYTES:
+        asset.variants["gzip"] = gzip.compress(body, compresslevel=9, mtime=0)
+        if brotli is not None:
+            asset.variants["br"] = brotli.compress(body, quality=11)
+    return asset
+
+
+class StaticAssets:
+    """Fingerprinted, precompressed in-memory copy of the webapp directory.
+
+    Every file is available under /static/<name>.<hash>.<ext> (immutable) and
+    under its original name (revalidated); index.html is rewritten to point at
+    the hashed URLs.
+    """
+
+    def __init__(self, static_dir: str, prefix: str = "/static"):
+        self.static_dir = static_dir
+        self.prefix = prefix
+        self.routes: Dict[str, Asset] = {}
+        self.hashed: Dict[str, str] = {}  # original rel path -> hashed rel path
+
+    def build(self) -> "StaticAssets":
+        files: List[str] = []
+        for root, dirs, names in os.walk(self.static_dir):
+            dirs[:] = [d for d in dirs if not d.startswith(".") and d not in SKIPPED_DIRS]  # pruned in place
+            for name in names:
+                if name.startswith(".") or not _served(name):
+                    continue
+                files.append(os.path.relpath(os.path.join(root, name), self.static_dir).replace(os.sep, "/"))
+
+        for rel in sorted(files):
+            if rel == "index.html":
+                continue
+            with open(os.path.join(self.static_dir, rel), "rb") as f:
+                body = f.read()
+            self.routes[f"{self.prefix}/{rel}"] = _make_asset(body, rel, REVALIDATE)
+            if rel not in UNHASHED:
+                hashed = _hashed_name(rel, hashlib.sha256(body).hexdigest())
+                self.hashed[rel] = hashed
+                self.routes[f"{self.prefix}/{hashed}"] = _make_asset(body, rel, IMMUTABLE)
+
+        index_path = os.path.join(self.static_dir, "index.html")
+        if os.path.isfile(index_path):
+            with open(index_path, "rb") as f:
+                index = self.rewrite_index(f.read().decode("utf-8")).encode("utf-8")
+            asset = _make_asset(index, "index.html", REVALIDATE)
+            self.routes["/"] = asset
+            self.routes[f"{self.prefix}/index.html"] = asset
+        return self
+
+    def rewrite_index(self, html: str) -> str:
+        """Points /static/<file>[?v=...] references at the hashed file names."""
+        pattern = re.compile(re.escape(self.prefix) + r"/([^\"'?#\s]+)(\?[^\"'#\s]*)?")
+
+        def sub(m: re.Match) -> str:
+            hashed = self.hashed.get(m.group(1))
+            return f"{self.prefix}/{hashed}" if hashed else m.group(0)
+
+        return pattern.sub(sub, html)
+
+
+class StaticAssetsMiddleware:
+    """Pure ASGI middleware serving StaticAssets with ETag/304 and Content-Encoding.
+
+    Paths it does not know (or non GET/HEAD requests) go to the wrapped app.
+    """
+
+    def __init__(self, app, assets: StaticAssets):
+        self.app = app
+        self.assets = assets
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] not in ("GET", "HEAD"):
+            return await self.app(scope, receive, send)
+        asset = self.assets.routes.get(scope["path"])
+        if asset is None:
+            return await self.app(scope, receive, send)
+
+        req_headers = dict(scope["headers"])
+        encoding, body = asset.pick(req_headers.get(b"accept-encoding", b"").decode("latin-1"))
+        etag = f'"{asset.etag}-{encoding}"' if encoding else f'"{asset.etag}"'
+        headers = [
+            (b"cache-control", asset.cache_control.encode()),
+            (b"etag", etag.encode()),
+        ]
+        if asset.variants:
+            headers.append((b"vary", b"Accept-Encoding"))
+
+        if_none_match = req_headers.get(b"if-none-match", b"").decode("latin-1")
+        if if_none_match and (if_none_match.strip() == "*" or etag in (t.strip() for t in if_none_match.split(","))):
+            await send({"type": "http.response.start", "status": 304, "headers": headers})
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        headers.append((b"content-type", asset.content_type.encode()))
+        headers.append((b"content-length", str(len(body)).encode()))
+        if encoding:
+            headers.append((b"content-encoding", encoding.encode()))
+        await send({"type": "http.response.start", "status": 200, "headers": headers})
+        await send({"type": "http.response.body", "body": b"" if scope["method"] == "HEAD" else body})
@@ -0,0 +1,77 @@
+from __future__ import annotations
+
+import threading
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, Iterable, Optional
+
+
+@dataclass
+class TapDelta:
+    """Unflushed tap increments of one user."""
+
+    coins: int = 0  # added to coins and total_coins
+    taps: int = 0
+    xp: int = 0
+    weekly: Dict[int, int] = field(default_factory=dict)  # yearweek -> score delta
+    last_tap_at: Optional[datetime] = None
+
+    def merge(self, other: "TapDelta") -> None:
+        self.coins += other.coins
+        self.taps += other.taps
+        self.xp += other.xp
+        for yw, score in other.weekly.items():
+            self.weekly[yw] = self.weekly.get(yw, 0) + score
+        if other.last_tap_at and (self.last_tap_at is None or other.last_tap_at > self.last_tap_at):
+            self.last_tap_at = other.last_tap_at
+
+
+class TapBuffer:
+    """In-process per-user tap accumulator for write-behind mode.
+
+    Request threads add() deltas; a flusher take()s them and writes them in bulk.
+    """
+
+    def __init__(self, max_entries: int = 1000):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._pending: Dict[int, TapDelta] = {}
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def add(self, user_id: int, coins: int, taps: int, yearweek: int, now: datetime) -> bool:
+        """Buffers taps; returns True when the buffer is full and should be flushed."""
+        with self._lock:
+            d = self._pending.get(user_id)
+            if d is None:
+                d = self._pending[user_id] = TapDelta()
+            d.coins += coins
+            d.taps += taps
+            d.xp += taps
+            d.weekly[yearweek] = d.weekly.get(yearweek, 0) + coins
+            d.last_tap_at = now
+            return len(self._pending) >= self.max_entries
+
+    def pending(self, user_id: int) -> Optional[TapDelta]:
+        with self._lock:
+            return self._pending.get(user_id)
+
+    def take(self, user_ids: Optional[Iterable[int]] = None) -> Dict[int, TapDelta]:
+        """Removes and returns pending deltas (all of them, or only for user_ids)."""
+        with self._lock:
+            if user_ids is None:
+                taken, self._pending = self._pending, {}
+                return taken
+            return {uid: self._pending.pop(uid) for uid in user_ids if uid in self._pending}
+
+    def restore(self, deltas: Dict[int, TapDelta]) -> None:
+        """Puts back deltas whose flush failed."""
+        with self._lock:
+            for uid, d in deltas.items():
+                cur = self._pending.get(uid)
+                if cur is None:
+                    self._pending[uid] = d
+                else:
+                    d.merge(cur)
+                    self._pending[uid] = d
@@ -0,0 +1,138 @@
+from __future__ import annotations
+
+import json
+import logging
+import os
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Daily task catalog (JSON). Every task has a fixed "bit": its claim is bit `bit` of
+# users.daily_tasks_mask, so reordering or removing tasks never shifts other claims.
+# Never give a new task the bit of a removed one on the same day.
+TASKS_FILE = os.getenv("TASKS_FILE", os.path.join(os.path.dirname(__file__), "tasks.json"))
+
+TASK_TYPES = ("join_chat", "open_link")
+MAX_BIT = 62  # daily_tasks_mask is a signed BIGINT
+DEFAULT_LOCALE = "en"
+
+
+@dataclass(frozen=True)
+class Task:
+    id: str
+    bit: int
+    type: str
+    url: str
+    reward_coins: int
+    titles: Dict[str, str] = field(default_factory=dict)
+    chat_id: Optional[int] = None  # join_chat only
+
+    @property
+    def mask(self) -> int:
+        return 1 << self.bit
+
+
+class TaskCatalog:
+    """Immutable task set: lookup by id and API rows prebuilt per locale."""
+
+    def __init__(self, tasks: Iterable[Task]):
+        self.tasks: List[Task] = list(tasks)
+        self.by_id: Dict[str, Task] = {t.id: t for t in self.tasks}
+        locales = sorted({loc for t in self.tasks for loc in t.titles} | {DEFAULT_LOCALE})
+        # locale -> [(mask, row without "claimed")]
+        self.rows: Dict[str, List[Tuple[int, Dict[str, Any]]]] = {
+            loc: [(t.mask, self._row(t, loc)) for t in self.tasks] for loc in locales
+        }
+
+    @staticmethod
+    def _row(task: Task, locale: str) -> Dict[str, Any]:
+        row: Dict[str, Any] = {
+            "id": task.id,
+            "title": task.titles.get(locale) or task.titles[DEFAULT_LOCALE],
+        }
+        for loc, title in sorted(task.titles.items()):
+            row[f"title_{loc}"] = title
+        row.update(type=task.type, url=task.url, reward_coins=task.reward_coins)
+        return row
+
+    def get(self, task_id: str) -> Optional[Task]:
+        return self.by_id.get(task_id)
+
+    def listing(self, locale: Optional[str], claimed_mask: int) -> List[Dict[str, Any]]:
+        rows = self.rows.get(locale or DEFAULT_LOCALE) or self.rows[DEFAULT_LOCALE]
+        return [dict(row, claimed=bool(claimed_mask & mask)) for mask, row in rows]
+
+    def mask_of(self, task_ids: Iterable[str]) -> int:
+        mask = 0
+        for task_id in task_ids:
+            task = self.by_id.get(task_id)
+            if task is not None:
+                mask |= task.mask
+        return mask
+
+
+def parse_catalog(data: Dict[str, Any]) -> TaskCatalog:
+    """Validates the catalog file contents; raises ValueError on a bad entry."""
+    tasks: List[Task] = []
+    ids, bits = set(), set()
+    for i, raw in enumerate(data.get("tasks") or []):
+        try:
+            task = Task(
+                id=str(raw["id"]),
+                bit=int(raw["bit"]),
+                type=str(raw["type"]),
+                url=str(raw.get("url") or ""),
+                reward_coins=int(raw.get("reward_coins", 0)),
+                titles={str(k): str(v) for k, v in (raw.get("title") or {}).items()},
+                chat_id=int(raw["chat_id"]) if raw.get("chat_id") is not None else None,
+            )
+        except (KeyError, TypeError, ValueError) as e:
+            raise ValueError(f"task #{i}: {e!r}")
+        if task.type not in TASK_TYPES:
+            raise ValueError(f"task {task.id}: type must be one of {TASK_TYPES}")
+        if task.type == "join_chat" and task.chat_id is None:
+            raise ValueError(f"task {task.id}: join_chat needs chat_id")
+        if not 0 <= task.bit <= MAX_BIT:
+            raise ValueError(f"task {task.id}: bit must be between 0 and {MAX_BIT}")
+        if DEFAULT_LOCALE not in task.titles:
+            raise ValueError(f"task {task.id}: needs a {DEFAULT_LOCALE!r} title")
+        if task.id in ids or task.bit in bits:
+            raise ValueError(f"task {task.id}: duplicate id or bit {task.bit}")
+        ids.add(task.id)
+        bits.add(task.bit)
+        tasks.append(task)
+    return TaskCatalog(tasks)
+
+
+def load_catalog(path: str = TASKS_FILE) -> TaskCatalog:
+    with open(path, "r", encoding="utf-8") as f:
+        return parse_catalog(json.load(f))
+
+
+class TaskCatalogSource:
+    """The catalog file plus hot reload: reload_if_changed() swaps in a new catalog when the
+    file's mtime changes. An invalid file is logged and the previous catalog stays active."""
+
+    def __init__(self, path: str = TASKS_FILE):
+        self.path = path
+        self.mtime = os.stat(path).st_mtime_ns
+        self.catalog = load_catalog(path)
+
+    def reload_if_changed(self) -> bool:
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except OSError as e:
+            logger.error("task catalog %s unreadable: %s", self.path, e)
+            return False
+        if mtime == self.mtime:
+            return False
+        self.mtime = mtime
+        try:
+            catalog = load_catalog(self.path)
+        except (OSError, ValueError) as e:
+            logger.error("task catalog %s not reloaded: %s", self.path, e)
+            return False
+        self.catalog = catalog
+        logger.info("task catalog reloaded: %d tasks", len(catalog.tasks))
+        return True
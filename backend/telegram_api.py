@@ -0,0 +1,171 @@
+from __future__ import annotations
+
+import asyncio
+import os
+import time
+from typing import TYPE_CHECKING, Any, Dict, Optional, Tuple
+
+if TYPE_CHECKING:
+    import httpx
+
+try:
+    from .metrics import TELEGRAM_LATENCY
+except ImportError:  # running as single-folder (no package)
+    from metrics import TELEGRAM_LATENCY
+
+# Pluggable so tests / benchmarks can point at a local stub Bot API server.
+TELEGRAM_API_BASE = os.getenv("TELEGRAM_API_BASE", "https://api.telegram.org").rstrip("/")
+
+# getChatMember results are cached per (chat_id, user_id); "not a member" for a shorter time
+# so a user who just joined is not kept waiting.
+TG_MEMBER_CACHE_TTL = float(os.getenv("TG_MEMBER_CACHE_TTL", "60"))
+TG_MEMBER_NEGATIVE_TTL = float(os.getenv("TG_MEMBER_NEGATIVE_TTL", "10"))
+TG_MEMBER_CACHE_MAX = int(os.getenv("TG_MEMBER_CACHE_MAX", "100000"))
+
+# Per bot token: max concurrent requests and requests/second (Telegram allows ~30/s per bot)
+TG_MAX_CONCURRENCY = int(os.getenv("TG_MAX_CONCURRENCY", "20"))
+TG_MAX_RPS = float(os.getenv("TG_MAX_RPS", "25"))
+TG_TIMEOUT = float(os.getenv("TG_TIMEOUT", "8"))
+
+NOT_MEMBER_STATUSES = ("left", "kicked")
+
+
+class TelegramAPIError(Exception):
+    def __init__(self, data: Dict[str, Any]):
+        super().__init__(f"Telegram API error: {data}")
+        self.data = data
+
+
+class TelegramNetworkError(Exception):
+    """The Bot API could not be reached (the httpx error is the __cause__), or a proxy in
+    front of it answered with something that is not a Bot API reply (e.g. an HTML 502)."""
+
+
+class RateLimiter:
+    """Async limiter spacing calls to at most `rate` per second (0 = unlimited)."""
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._next = 0.0
+        self._resume_at = 0.0
+        self._lock = asyncio.Lock()
+
+    def pause(self, seconds: float) -> None:
+        """Holds every caller for `seconds` (a 429's retry_after applies to the whole bot)."""
+        self._resume_at = max(self._resume_at, time.monotonic() + seconds)
+
+    async def wait(self) -> None:
+        if not self.interval and self._resume_at <= time.monotonic():
+            return
+        async with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next, self._resume_at)
+            self._next = start + self.interval
+        if start > now:
+            await asyncio.sleep(start - now)
+
+
+class _TokenLimits:
+    def __init__(self):
+        self.concurrency = asyncio.Semaphore(TG_MAX_CONCURRENCY)
+        self.rate = RateLimiter(TG_MAX_RPS)
+
+
+_limits: Dict[str, _TokenLimits] = {}
+
+
+def _limits_for(token: str) -> _TokenLimits:
+    lim = _limits.get(token)
+    if lim is None:
+        lim = _limits[token] = _TokenLimits()
+    return lim
+
+
+class TelegramClient:
+    """Pooled async Bot API client (one keep-alive connection pool per process)."""
+
+    def __init__(self, token: str, base_url: str = TELEGRAM_API_BASE, timeout: float = TG_TIMEOUT):
+        self.token = token
+        self.base_url = base_url
+        self.timeout = timeout
+        self._client: Optional[httpx.AsyncClient] = None
+        self._member_cache: Dict[Tuple[Any, int], Tuple[float, Dict[str, Any]]] = {}
+        self._inflight: Dict[Tuple[Any, int], asyncio.Future] = {}
+
+    def _http(self) -> httpx.AsyncClient:
+        if self._client is None:
+            # Imported on first use: most workers rarely call the Bot API, keep it off the cold start
+            import httpx
+
+            self._client = httpx.AsyncClient(
+                base_url=f"{self.base_url}/bot{self.token}",
+                timeout=self.timeout,
+                limits=httpx.Limits(max_connections=TG_MAX_CONCURRENCY, max_keepalive_connections=TG_MAX_CONCURRENCY),
+            )
+        return self._client
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def call(self, method: str, retries: int = 3, **params) -> Any:
+        """Calls a Bot API method; on 429 pauses all calls for retry_after and retries.
+
+        Raises TelegramAPIError for API errors, TelegramNetworkError when the API is unreachable.
+        """
+        import httpx  # loaded by _http() on the first call
+
+        lim = _limits_for(self.token)
+        for attempt in range(retries + 1):
+            await lim.rate.wait()
+            async with lim.concurrency:
+                t0 = time.perf_counter()
+                try:
+                    r = await self._http().post(f"/{method}", json=params)
+                except httpx.HTTPError as e:
+                    TELEGRAM_LATENCY.observe(time.perf_counter() - t0, method, "network_error")
+                    raise TelegramNetworkError(repr(e)) from e
+            try:
+                data = r.json()
+            except ValueError as e:  # JSONDecodeError / UnicodeDecodeError: e.g. a proxy's HTML 502
+                TELEGRAM_LATENCY.observe(time.perf_counter() - t0, method, "bad_response")
+                raise TelegramNetworkError(f"HTTP {r.status_code}: not a Bot API reply") from e
+            TELEGRAM_LATENCY.observe(time.perf_counter() - t0, method, "ok" if data.get("ok") else str(data.get("error_code")))
+            if data.get("ok"):
+                return data["result"]
+            retry_after = (data.get("parameters") or {}).get("retry_after")
+            if data.get("error_code") == 429 and retry_after is not None and attempt < retries:
+                lim.rate.pause(float(retry_after))
+                continue
+            raise TelegramAPIError(data)
+
+    async def get_chat_member(self, chat_id: Any, user_id: int) -> Dict[str, Any]:
+        key = (chat_id, user_id)
+        hit = self._member_cache.get(key)
+        if hit is not None and hit[0] > time.monotonic():
+            return hit[1]
+
+        # Concurrent checks of the same user share one request
+        fut = self._inflight.get(key)
+        if fut is not None:
+            return await asyncio.shield(fut)
+        fut = asyncio.get_running_loop().create_future()
+        self._inflight[key] = fut
+        try:
+            member = await self.call("getChatMember", chat_id=chat_id, user_id=user_id)
+            ttl = TG_MEMBER_NEGATIVE_TTL if member.get("status") in NOT_MEMBER_STATUSES else TG_MEMBER_CACHE_TTL
+            if len(self._member_cache) >= TG_MEMBER_CACHE_MAX:
+                self._member_cache.clear()
+            self._member_cache[key] = (time.monotonic() + ttl, member)
+            fut.set_result(member)
+            return member
+        except asyncio.CancelledError:
+            fut.cancel()
+            raise
+        except Exception as e:
+            fut.set_exception(e)
+            fut.exception()  # mark retrieved when nobody else is waiting
+            raise
+        finally:
+            del self._inflight[key]
@@ -0,0 +1,56 @@
+from __future__ import annotations
+
+import hashlib
+import hmac
+import json
+import time
+from typing import Any, Dict
+from urllib.parse import parse_qsl
+
+
+class InitDataError(ValueError):
+    pass
+
+
+def verify_init_data(init_data: str, bot_token: str, max_age: float = 86400) -> Dict[str, Any]:
+    """Validates Telegram WebApp initData and returns its `user` object.
+
+    https://core.telegram.org/bots/webapps#validating-data-received-via-the-mini-app
+    """
+    if not bot_token:
+        raise InitDataError("TELEGRAM_BOT_TOKEN is not set on the server")
+    data = dict(parse_qsl(init_data or "", keep_blank_values=True))
+    received = data.pop("hash", "")
+    if not received:
+        raise InitDataError("initData hash missing")
+
+    check_string = "\n".join(f"{k}={v}" for k, v in sorted(data.items()))
+    secret = hmac.new(b"WebAppData", bot_token.encode(), hashlib.sha256).digest()
+    expected = hmac.new(secret, check_string.encode(), hashlib.sha256).hexdigest()
+    if not hmac.compare_digest(expected, received):
+        raise InitDataError("initData signature mismatch")
+
+    try:
+        auth_date = int(data.get("auth_date", "0"))
+    except ValueError:
+        raise InitDataError("initData auth_date invalid")
+    if max_age and time.time() - auth_date > max_age:
+        raise InitDataError("initData expired")
+
+    try:
+        user = json.loads(data.get("user", ""))
+    except ValueError:
+        raise InitDataError("initData user missing")
+    if not isinstance(user, dict) or "id" not in user:
+        raise InitDataError("initData user missing")
+    return user
+
+
+def sign_init_data(fields: Dict[str, str], bot_token: str) -> str:
+    """Builds a signed initData string (for tests, benchmarks and the local stub)."""
+    from urllib.parse import urlencode
+
+    check_string = "\n".join(f"{k}={v}" for k, v in sorted(fields.items()))
+    secret = hmac.new(b"WebAppData", bot_token.encode(), hashlib.sha256).digest()
+    digest = hmac.new(secret, check_string.encode(), hashlib.sha256).hexdigest()
+    return urlencode({**fields, "hash": digest})
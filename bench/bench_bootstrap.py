@@ -0,0 +1,66 @@
+"""Benchmark: web app time-to-interactive, four serial calls vs /api/bootstrap.
+
+Usage:
+    python bench/bench_bootstrap.py [--rtt 150] [--runs 50] [--db sqlite:///./bench_bootstrap.db]
+
+Runs the launch sequence in-process (httpx ASGITransport) and adds --rtt ms of simulated
+network round trip per request (mobile network inside Telegram is typically 100-300 ms):
+    before: /api/config -> /api/me -> /api/tasks -> /api/leaderboard
+    after:  /api/bootstrap
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+
+async def run(rtt: float, runs: int) -> None:
+    sys.path.insert(0, ROOT)
+    import httpx
+    from backend.main import app
+
+    async def call(client, method, path, **kw):
+        await asyncio.sleep(rtt)
+        r = await client.request(method, path, **kw)
+        r.raise_for_status()
+        return r.json()
+
+    async def before(client, tid):
+        await call(client, "GET", "/api/config")
+        await call(client, "POST", "/api/me", json={"telegram_id": tid, "name": "bench"})
+        await call(client, "GET", "/api/tasks", params={"telegram_id": tid})
+        await call(client, "GET", "/api/leaderboard", params={"scope": "weekly", "telegram_id": tid})
+
+    async def after(client, tid):
+        await call(client, "POST", "/api/bootstrap", json={"telegram_id": tid, "name": "bench"})
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for name, flow in (("before (4 serial calls)", before), ("after (/api/bootstrap)", after)):
+            samples = []
+            for i in range(runs):
+                t0 = time.perf_counter()
+                await flow(client, 700_000_000 + i)
+                samples.append((time.perf_counter() - t0) * 1000)
+            print(f"{name:<26} TTI mean={statistics.mean(samples):7.1f} ms  p50={statistics.median(samples):7.1f} ms")
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rtt", type=float, default=150, help="simulated round trip per request, ms")
+    ap.add_argument("--runs", type=int, default=50)
+    ap.add_argument("--db", default="sqlite:///./bench_bootstrap.db")
+    args = ap.parse_args()
+    os.environ.setdefault("DATABASE_URL", args.db)
+    print(f"rtt={args.rtt:.0f} ms, {args.runs} launches each")
+    asyncio.run(run(args.rtt / 1000.0, args.runs))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+"""Benchmark: bot/bot.py update throughput and reply latency, polling vs webhook.
+
+Usage:
+    python bench/bench_bot.py --updates 2000 [--latency-ms 50] [--rate 0]
+
+Runs the stub Bot API (stub_telegram.py) in-process, starts bot/bot.py against it in each
+mode, delivers --updates "/start" messages from distinct users (all at once, or --rate per
+second) and reports updates/sec and the latency from delivery to the bot's sendMessage
+reply. Polling updates are queued for getUpdates; webhook updates are POSTed to the bot's
+server over up to --connections parallel connections (like Telegram's max_connections)
+with the secret token. Needs `pip install "python-telegram-bot[webhooks]" uvicorn httpx`.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import signal
+import statistics
+import subprocess
+import sys
+import time
+from typing import Dict, List
+
+import httpx
+import uvicorn
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+SECRET = "bench-secret"
+
+# (name, BOT_MODE, BOT_CONCURRENT_UPDATES; None = --concurrency)
+MODES = [
+    ("polling, sequential (before)", "polling", 1),
+    ("polling, concurrent", "polling", None),
+    ("webhook, concurrent", "webhook", None),
+]
+
+
+def make_update(i: int) -> Dict:
+    chat_id = 1_000_000 + i
+    return {
+        "update_id": i + 1,
+        "message": {
+            "message_id": i + 1,
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"},
+            "from": {"id": chat_id, "is_bot": False, "first_name": "bench"},
+            "text": "/start",
+            "entities": [{"type": "bot_command", "offset": 0, "length": 6}],
+        },
+    }
+
+
+async def wait_until(check, timeout: float, what: str) -> None:
+    deadline = time.monotonic() + timeout
+    while not check():
+        if time.monotonic() > deadline:
+            raise RuntimeError(f"timed out waiting for {what}")
+        await asyncio.sleep(0.05)
+
+
+async def run_mode(stub, mode: str, concurrency: int, args) -> Dict[str, float]:
+    stub.reset()
+    env = dict(
+        os.environ,
+        BOT_TOKEN="123:bench",
+        TELEGRAM_API_BASE=f"http://127.0.0.1:{args.stub_port}",
+        BOT_MODE=mode,
+        BOT_CONCURRENT_UPDATES=str(concurrency),
+        WEBHOOK_URL=f"http://127.0.0.1:{args.webhook_port}",
+        WEBHOOK_SECRET=SECRET,
+        WEBHOOK_LISTEN="127.0.0.1",
+        WEBHOOK_MAX_CONNECTIONS=str(args.connections),
+        PORT=str(args.webhook_port),
+    )
+    out = None if args.verbose else subprocess.DEVNULL
+    proc = subprocess.Popen([sys.executable, os.path.join(ROOT, "bot", "bot.py")], env=env, stdout=out, stderr=out)
+    try:
+        webhook_url = f"http://127.0.0.1:{args.webhook_port}/telegram"
+        async with httpx.AsyncClient(limits=httpx.Limits(max_connections=args.connections)) as client:
+            if mode == "webhook":
+                await wait_until(lambda: stub.webhook, 30, "setWebhook")
+                for _ in range(100):  # server socket comes up right after setWebhook
+                    try:
+                        r = await client.post(webhook_url, json={"update_id": 0}, headers={"X-Telegram-Bot-Api-Secret-Token": "wrong"})
+                        break
+                    except httpx.TransportError:
+                        await asyncio.sleep(0.05)
+                assert r.status_code == 403, f"wrong secret token accepted ({r.status_code})"
+                assert stub.webhook.get("allowed_updates") == ["message"], stub.webhook
+            else:
+                await wait_until(lambda: stub.calls["methods"].get("getUpdates"), 30, "getUpdates")
+
+            updates = [make_update(i) for i in range(args.updates)]
+            sent: Dict[int, float] = {}
+            gate = asyncio.Semaphore(args.connections)
+
+            async def deliver(update: Dict) -> None:
+                async with gate:
+                    sent[update["message"]["chat"]["id"]] = time.time()
+                    r = await client.post(webhook_url, json=update, headers={"X-Telegram-Bot-Api-Secret-Token": SECRET})
+                    r.raise_for_status()
+
+            t0 = time.time()
+            posts: List[asyncio.Task] = []
+            for i, update in enumerate(updates):
+                if args.rate:
+                    await asyncio.sleep(max(t0 + i / args.rate - time.time(), 0))
+                if mode == "webhook":
+                    posts.append(asyncio.create_task(deliver(update)))
+                else:
+                    sent[update["message"]["chat"]["id"]] = time.time()
+                    stub.push_updates([update])
+            await asyncio.gather(*posts)
+            await wait_until(lambda: len(stub.replies) >= args.updates, args.timeout, "replies")
+    finally:
+        proc.send_signal(signal.SIGINT)
+        try:
+            proc.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+    latencies = sorted((stub.replies[chat] - t) * 1000.0 for chat, t in sent.items())
+    elapsed = max(stub.replies.values()) - t0
+    return {
+        "updates_per_s": args.updates / elapsed,
+        "p50": statistics.median(latencies),
+        "p95": latencies[int(len(latencies) * 0.95) - 1],
+        "p99": latencies[int(len(latencies) * 0.99) - 1],
+        "api_calls": stub.calls["total"],
+    }
+
+
+async def main_async(args) -> None:
+    os.environ["STUB_TG_LATENCY_MS"] = str(args.latency_ms)
+    import stub_telegram as stub
+
+    server = uvicorn.Server(uvicorn.Config(stub.app, port=args.stub_port, log_level="warning"))
+    serve = asyncio.create_task(server.serve())
+    await wait_until(lambda: server.started, 10, "stub Bot API")
+
+    results = []
+    try:
+        for name, mode, concurrency in MODES:
+            results.append((name, await run_mode(stub, mode, concurrency or args.concurrency, args)))
+    finally:
+        server.should_exit = True
+        await serve
+
+    rate = f"{args.rate}/s" if args.rate else "burst"
+    print(f"\n== {args.updates} updates ({rate}), stub Bot API latency {args.latency_ms} ms, concurrency {args.concurrency} ==")
+    print(f"{'mode':<32}{'updates/s':>11}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'API calls':>11}")
+    for name, r in results:
+        print(f"{name:<32}{r['updates_per_s']:>11.1f}{r['p50']:>10.1f}{r['p95']:>10.1f}{r['p99']:>10.1f}{r['api_calls']:>11}")
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--updates", type=int, default=2000)
+    ap.add_argument("--rate", type=float, default=0, help="updates per second (0 = all at once)")
+    ap.add_argument("--latency-ms", type=float, default=50, help="stub Bot API delay per call")
+    ap.add_argument("--concurrency", type=int, default=64, help="BOT_CONCURRENT_UPDATES of the concurrent modes")
+    ap.add_argument("--connections", type=int, default=40, help="parallel webhook deliveries")
+    ap.add_argument("--stub-port", type=int, default=8781)
+    ap.add_argument("--webhook-port", type=int, default=8782)
+    ap.add_argument("--timeout", type=float, default=300)
+    ap.add_argument("--verbose", action="store_true", help="show the bot's log output")
+    asyncio.run(main_async(ap.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""Benchmark: broadcast engine (backend/broadcast.py) against the stub Bot API.
+
+Usage:
+    python bench/bench_broadcast.py --users 2000 [--rps 20] [--flood-rps 30] [--crash-after 500]
+
+Seeds a scratch SQLite DB (bench/seed.py; every --opt-out-every-th user has notifications
+off), runs the stub Bot API (stub_telegram.py) in-process with Telegram-like limits (429 +
+retry_after above --flood-rps messages/s, 403 for every --blocked-every-th chat) and sends
+one broadcast per scenario:
+
+  unthrottled     no client-side rate limit, only 429 retry_after backs it off
+  throttled       BroadcastRunner at --rps
+  crash + resume  throttled, cancelled after --crash-after deliveries, resumed by a new runner
+
+and reports messages/sec, 429s seen, blocked users and duplicate deliveries.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+from typing import Dict
+
+import uvicorn
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+sys.path.insert(0, os.path.abspath(os.path.join(HERE, "..")))
+
+
+async def wait_until(check, timeout: float, what: str) -> None:
+    deadline = time.monotonic() + timeout
+    while not check():
+        if time.monotonic() > deadline:
+            raise RuntimeError(f"timed out waiting for {what}")
+        await asyncio.sleep(0.01)
+
+
+def configure(args) -> None:
+    # Read at import time by the backend modules and the stub
+    os.environ.update(
+        DATABASE_URL=args.db,
+        TELEGRAM_API_BASE=f"http://127.0.0.1:{args.stub_port}",
+        TG_MAX_RPS="0",  # the scenarios set the broadcast rate themselves
+        STUB_TG_LATENCY_MS=str(args.latency_ms),
+        STUB_TG_FLOOD_RPS=str(args.flood_rps),
+        STUB_TG_BLOCKED_EVERY=str(args.blocked_every),
+        BROADCAST_CHUNK=str(args.chunk),
+    )
+
+
+async def main_async(args) -> None:
+    configure(args)
+    import stub_telegram as stub
+    from seed import seed
+    from sqlalchemy import update
+
+    from backend.broadcast import BroadcastRunner, enqueue_broadcast
+    from backend.db import SessionLocal, engine
+    from backend.models import Broadcast, User
+    from backend.telegram_api import TelegramClient
+
+    seed(engine, args.users)
+
+    def reset_opt_ins(db) -> int:
+        db.execute(update(User).values(notifications_enabled=User.id % args.opt_out_every != 0))
+        db.commit()
+        return db.query(User).filter(User.notifications_enabled.is_(True)).count()
+
+    def queue(db) -> int:
+        bc = enqueue_broadcast(db, "custom", text={"en": "bench", "tr": "bench"})
+        db.commit()
+        return bc.id
+
+    server = uvicorn.Server(uvicorn.Config(stub.app, port=args.stub_port, log_level="warning"))
+    serve = asyncio.create_task(server.serve())
+    await wait_until(lambda: server.started, 10, "stub Bot API")
+    client = TelegramClient("123:bench")
+
+    async def scenario(rps: float, crash_after: int = 0) -> Dict[str, float]:
+        stub.reset()
+        with SessionLocal() as db:
+            recipients = reset_opt_ins(db)
+            broadcast_id = queue(db)
+        t0 = time.perf_counter()
+        run = asyncio.create_task(BroadcastRunner(client, rps=rps).run(broadcast_id))
+        if crash_after:
+            await wait_until(lambda: sum(stub.sends.values()) >= crash_after or run.done(), args.timeout, "crash point")
+            run.cancel()
+            try:
+                await run
+            except asyncio.CancelledError:
+                pass
+            # a new worker (new lease owner) picks the broadcast up from its checkpoint
+            run = asyncio.create_task(BroadcastRunner(client, rps=rps).run(broadcast_id))
+        totals = await asyncio.wait_for(run, args.timeout)
+        elapsed = time.perf_counter() - t0
+        with SessionLocal() as db:
+            bc = db.get(Broadcast, broadcast_id)
+            assert bc.status == "done", bc.status
+        return {
+            "recipients": recipients,
+            "sent": totals["sent"],
+            "blocked": totals["blocked"],
+            "failed": totals["failed"],
+            "duplicates": sum(n - 1 for n in stub.sends.values()),
+            "429s": stub.errors.get(429, 0),
+            "msgs_per_s": totals["sent"] / elapsed,
+            "seconds": elapsed,
+        }
+
+    results = []
+    try:
+        results.append(("unthrottled", await scenario(0)))
+        results.append((f"throttled {args.rps:g}/s", await scenario(args.rps)))
+        results.append((f"crash@{args.crash_after} + resume", await scenario(args.rps, args.crash_after)))
+    finally:
+        await client.aclose()
+        server.should_exit = True
+        await serve
+
+    print(
+        f"\n== {args.users} users (1/{args.opt_out_every} opted out, 1/{args.blocked_every} blocked),"
+        f" stub limit {args.flood_rps}/s, latency {args.latency_ms} ms, chunk {args.chunk} =="
+    )
+    cols = ("recipients", "sent", "blocked", "failed", "duplicates", "429s", "seconds", "msgs_per_s")
+    print(f"{'scenario':<24}" + "".join(f"{c:>12}" for c in cols))
+    for name, r in results:
+        print(f"{name:<24}" + "".join(f"{r[c]:>12.1f}" if isinstance(r[c], float) else f"{r[c]:>12}" for c in cols))
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--users", type=int, default=2000)
+    ap.add_argument("--db", default="sqlite:///./bench_broadcast.db")
+    ap.add_argument("--rps", type=float, default=20, help="BroadcastRunner rate of the throttled scenarios")
+    ap.add_argument("--flood-rps", type=int, default=30, help="stub answers 429 above this many messages/s")
+    ap.add_argument("--blocked-every", type=int, default=37)
+    ap.add_argument("--opt-out-every", type=int, default=10)
+    ap.add_argument("--crash-after", type=int, default=500, help="deliveries before the crash scenario cancels its run")
+    ap.add_argument("--chunk", type=int, default=100)
+    ap.add_argument("--latency-ms", type=float, default=50)
+    ap.add_argument("--stub-port", type=int, default=8783)
+    ap.add_argument("--timeout", type=float, default=600)
+    asyncio.run(main_async(ap.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""Benchmark: closed-form economy (backend/economy.py) vs the per-level loops it replaced.
+
+Usage:
+    python bench/bench_economy.py [--repeat 2000]
+
+Times level_ups / max_upgrades against the loops for a few XP jumps and balances.
+Correctness against the loops is covered by tests/test_economy.py.
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from backend.economy import LEVEL_XP_STEP, UPGRADE_COST_STEP, level_ups, max_upgrades  # noqa: E402
+
+
+def loop_level_ups(xp: int, next_level_xp: int):
+    """The former _maybe_level_up loop."""
+    levels = 0
+    while xp >= next_level_xp:
+        xp -= next_level_xp
+        next_level_xp += LEVEL_XP_STEP
+        levels += 1
+    return levels, xp, next_level_xp
+
+
+def loop_upgrades(tap_power: int, coins: int):
+    """One /api/upgrade_tap_power call per level until the balance runs out."""
+    n = spent = 0
+    while coins - spent >= UPGRADE_COST_STEP * (tap_power + n):
+        spent += UPGRADE_COST_STEP * (tap_power + n)
+        n += 1
+    return n, spent
+
+
+def timed(fn, repeat: int) -> float:
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - t0) / repeat * 1e6
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--repeat", type=int, default=2000)
+    args = ap.parse_args()
+
+    print(f"{'operation':<40}{'loop us':>12}{'closed us':>12}")
+    for xp in (1_500, 100_000, 10_000_000):
+        loop_us = timed(lambda: loop_level_ups(xp, 1000), args.repeat)
+        closed_us = timed(lambda: level_ups(xp, 1000), args.repeat)
+        print(f"{f'level-ups for {xp:,} xp from level 1':<40}{loop_us:>12.2f}{closed_us:>12.2f}")
+    for coins in (10_000, 10_000_000):
+        loop_us = timed(lambda: loop_upgrades(1, coins), args.repeat)
+        closed_us = timed(lambda: max_upgrades(1, coins), args.repeat)
+        print(f"{f'buy max with {coins:,} coins':<40}{loop_us:>12.2f}{closed_us:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
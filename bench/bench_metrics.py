@@ -0,0 +1,70 @@
+"""Benchmark: per-request overhead of the /metrics instrumentation.
+
+Usage:
+    python bench/bench_metrics.py [--requests 5000] [--db sqlite:///./bench_metrics.db]
+
+Runs the same in-process request loops (httpx ASGITransport, no network) in two child
+processes, with METRICS_ENABLED=0 and =1, and prints the mean time per request for
+/api/config (no DB: middleware cost) and /api/tap (+ SQL hooks).
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+
+async def _child(requests: int) -> None:
+    sys.path.insert(0, ROOT)
+    import httpx
+    from backend.main import app
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for i in range(200):  # warm-up
+            await client.post("/api/tap", json={"telegram_id": 1 + i % 50})
+            await client.get("/api/config")
+        out = []
+        for name, call in (
+            ("config", lambda i: client.get("/api/config")),
+            ("tap", lambda i: client.post("/api/tap", json={"telegram_id": 1 + i % 50})),
+        ):
+            t0 = time.perf_counter()
+            for i in range(requests):
+                await call(i)
+            out.append(f"{(time.perf_counter() - t0) / requests * 1e6:.1f}")
+    print(" ".join(out))
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--requests", type=int, default=5000)
+    ap.add_argument("--db", default="sqlite:///./bench_metrics.db")
+    ap.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = ap.parse_args()
+    if args.child:
+        asyncio.run(_child(args.requests))
+        return
+
+    results = {}
+    for enabled in ("0", "1"):
+        env = dict(os.environ, DATABASE_URL=args.db, METRICS_ENABLED=enabled)
+        out = subprocess.run(
+            [sys.executable, __file__, "--child", "--requests", str(args.requests)],
+            cwd=ROOT, env=env, capture_output=True, text=True, check=True,
+        )
+        results[enabled] = [float(x) for x in out.stdout.strip().splitlines()[-1].split()]
+    print(f"{args.requests} requests per endpoint ({args.db}), us/request")
+    print(f"{'endpoint':<14}{'off':>10}{'on':>10}{'delta':>10}")
+    for i, name in enumerate(("/api/config", "/api/tap")):
+        off, on = results["0"][i], results["1"][i]
+        print(f"{name:<14}{off:>10.1f}{on:>10.1f}{on - off:>+10.1f}  ({(on - off) / off * 100:+.1f}%)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""Benchmark: your_rank via COUNT(*) vs the in-memory RankIndex.
+
+Usage:
+    python bench/bench_rank_index.py --sizes 100000,1000000 [--db sqlite:///./bench_rank.db]
+
+Seeds N users (random total_coins and current-week scores) into a scratch database,
+then times rank-of-user lookups through both paths.
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from sqlalchemy import create_engine, func, insert, select  # noqa: E402
+
+from backend.db import Base  # noqa: E402
+from backend.models import User, UserStats, WeeklyScore  # noqa: E402
+from backend.ranking import RankIndex  # noqa: E402
+
+YEARWEEK = 202601
+
+
+def seed(engine, n: int) -> None:
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    rnd = random.Random(42)
+    chunk = 50000
+    with engine.begin() as conn:
+        for start in range(1, n + 1, chunk):
+            ids = range(start, min(start + chunk, n + 1))
+            conn.execute(
+                insert(User),
+                [{"id": i, "telegram_id": 10_000_000 + i} for i in ids],
+            )
+            conn.execute(
+                insert(UserStats),
+                [{"user_id": i, "total_coins": rnd.randint(0, 1_000_000)} for i in ids],
+            )
+            conn.execute(
+                insert(WeeklyScore),
+                [{"yearweek": YEARWEEK, "user_id": i, "score": rnd.randint(1, 50_000)} for i in ids],
+            )
+
+
+def timed(fn, samples):
+    t0 = time.perf_counter()
+    for s in samples:
+        fn(s)
+    return (time.perf_counter() - t0) / len(samples) * 1000.0
+
+
+def run(db_url: str, n: int, lookups: int) -> None:
+    engine = create_engine(db_url)
+    t0 = time.perf_counter()
+    seed(engine, n)
+    seed_s = time.perf_counter() - t0
+
+    rnd = random.Random(7)
+    sample_ids = [rnd.randint(1, n) for _ in range(lookups)]
+
+    with engine.connect() as conn:
+        coins = dict(conn.execute(select(UserStats.user_id, UserStats.total_coins)).all())
+        weekly = dict(
+            conn.execute(select(WeeklyScore.user_id, WeeklyScore.score).where(WeeklyScore.yearweek == YEARWEEK)).all()
+        )
+
+        count_all_time = timed(
+            lambda uid: conn.execute(select(func.count()).where(UserStats.total_coins > coins[uid])).scalar(), sample_ids
+        )
+        count_weekly = timed(
+            lambda uid: conn.execute(
+                select(func.count())
+                .select_from(WeeklyScore)
+                .where(WeeklyScore.yearweek == YEARWEEK, WeeklyScore.score > weekly[uid])
+            ).scalar(),
+            sample_ids,
+        )
+
+    t0 = time.perf_counter()
+    idx_all_time = RankIndex(coins.items())
+    idx_weekly = RankIndex(weekly.items())
+    build_ms = (time.perf_counter() - t0) * 1000.0
+
+    rank_all_time = timed(idx_all_time.rank, sample_ids)
+    rank_weekly = timed(idx_weekly.rank, sample_ids)
+    update_ms = timed(lambda uid: idx_all_time.set(uid, coins[uid] + 1), sample_ids)
+
+    print(f"\n== {n:,} users ({db_url}) seeded in {seed_s:.1f}s ==")
+    print(f"{'path':<34}{'ms/op':>12}")
+    print(f"{'COUNT all_time (users)':<34}{count_all_time:>12.3f}")
+    print(f"{'COUNT weekly (weekly_scores)':<34}{count_weekly:>12.3f}")
+    print(f"{'RankIndex.rank all_time':<34}{rank_all_time:>12.4f}")
+    print(f"{'RankIndex.rank weekly':<34}{rank_weekly:>12.4f}")
+    print(f"{'RankIndex.set (update)':<34}{update_ms:>12.4f}")
+    print(f"{'RankIndex build (both scopes)':<34}{build_ms:>12.1f}")
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", default="100000,1000000")
+    ap.add_argument("--db", default="sqlite:///./bench_rank.db")
+    ap.add_argument("--lookups", type=int, default=200)
+    args = ap.parse_args()
+    for n in [int(x) for x in args.sizes.split(",") if x]:
+        run(args.db, n, args.lookups)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""Benchmark: cold start, import time and time to the first successful /api/tap.
+
+Usage:
+    python bench/bench_startup.py [--runs 5] [--users 100000] [--app-dir .]
+    git worktree add /tmp/before <commit> && python bench/bench_startup.py --app-dir /tmp/before
+
+For each run it measures, in fresh processes:
+  import      `import backend.main` (median of --runs)
+  first tap   `uvicorn backend.main:app` spawned -> first 200 from POST /api/tap
+  first /healthz, where the tree has it
+against a new (empty) SQLite database and against one seeded with --users (bench/seed.py).
+--app-dir runs another checkout (e.g. the commit before a change) with the same DB and env.
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+from typing import Dict, List, Optional
+
+import httpx
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.abspath(os.path.join(HERE, ".."))
+
+
+def import_ms(app_dir: str, env: Dict[str, str]) -> float:
+    code = "import time; t = time.perf_counter(); import backend.main; print((time.perf_counter() - t) * 1000)"
+    out = subprocess.run([sys.executable, "-c", code], cwd=app_dir, env=env, check=True, capture_output=True, text=True)
+    return float(out.stdout.strip().splitlines()[-1])
+
+
+def first_success(client: httpx.Client, request, deadline: float) -> Optional[float]:
+    while time.perf_counter() < deadline:
+        try:
+            if request(client).status_code == 200:
+                return time.perf_counter()
+        except httpx.TransportError:
+            pass
+        time.sleep(0.005)
+    return None
+
+
+def cold_start(app_dir: str, env: Dict[str, str], port: int, timeout: float) -> Dict[str, Optional[float]]:
+    cmd = [sys.executable, "-m", "uvicorn", "backend.main:app", "--port", str(port), "--log-level", "warning"]
+    t0 = time.perf_counter()
+    proc = subprocess.Popen(cmd, cwd=app_dir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=5) as client:
+            deadline = t0 + timeout
+            tap = first_success(client, lambda c: c.post("/api/tap", json={"telegram_id": 1, "name": "bench"}), deadline)
+            health = client.get("/healthz").status_code == 200 if tap else False
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+    return {"first_tap_ms": (tap - t0) * 1000 if tap else None, "healthz": health}
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--runs", type=int, default=5)
+    ap.add_argument("--users", type=int, default=100_000)
+    ap.add_argument("--app-dir", default=ROOT, help="checkout to start (default: this one)")
+    ap.add_argument("--db", default=os.path.join(ROOT, "bench_startup.db"))
+    ap.add_argument("--port", type=int, default=8791)
+    ap.add_argument("--timeout", type=float, default=60)
+    args = ap.parse_args()
+    app_dir = os.path.abspath(args.app_dir)
+
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{args.db}", PYTHONPATH=app_dir, TAP_RATE_PER_SEC="0")
+    imports = [import_ms(app_dir, env) for _ in range(args.runs)]
+    print(f"{app_dir}: import backend.main  median {statistics.median(imports):.0f} ms  (min {min(imports):.0f})")
+
+    sys.path.insert(0, HERE)
+    sys.path.insert(0, ROOT)
+    from seed import seed
+    from sqlalchemy import create_engine
+
+    for label, users in (("empty database", 0), (f"{args.users:,} users", args.users)):
+        samples: List[float] = []
+        healthz = False
+        for _ in range(args.runs):
+            if os.path.exists(args.db):
+                os.remove(args.db)
+            if users:
+                seed(create_engine(env["DATABASE_URL"]), users)
+            r = cold_start(app_dir, env, args.port, args.timeout)
+            if r["first_tap_ms"] is None:
+                sys.exit(f"{label}: no successful /api/tap within {args.timeout}s")
+            samples.append(r["first_tap_ms"])
+            healthz = r["healthz"]
+        print(
+            f"{label:<18} spawn -> first /api/tap  median {statistics.median(samples):6.0f} ms"
+            f"  (min {min(samples):.0f}, max {max(samples):.0f})  /healthz: {'yes' if healthz else 'no'}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+"""backend.main:app plus a per-request SQL statement counter, for the load generator.
+
+Every response gets an `x-db-statements` header with the number of statements the
+request executed (engine before_cursor_execute). Benchmark-only: not used in production.
+
+    python -m uvicorn bench.instrumented_app:app
+"""
+from __future__ import annotations
+
+import contextvars
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from sqlalchemy import event  # noqa: E402
+
+from backend.db import engine  # noqa: E402
+from backend.main import app as backend_app  # noqa: E402
+
+# A mutable cell, so increments made in threadpool/greenlet copies of the context are seen here
+_counter: contextvars.ContextVar[list] = contextvars.ContextVar("db_statements")
+
+
+@event.listens_for(engine, "before_cursor_execute")
+def _count(conn, cursor, statement, parameters, context, executemany):
+    cell = _counter.get(None)
+    if cell is not None:
+        cell[0] += 1
+
+
+async def app(scope, receive, send):
+    if scope["type"] != "http":
+        return await backend_app(scope, receive, send)
+    cell = [0]
+    _counter.set(cell)
+
+    async def send_wrapper(message):
+        if message["type"] == "http.response.start":
+            message = dict(message)
+            message["headers"] = list(message.get("headers", [])) + [(b"x-db-statements", str(cell[0]).encode())]
+        await send(message)
+
+    await backend_app(scope, receive, send_wrapper)
@@ -0,0 +1,158 @@
+"""Stub Telegram Bot API for benchmarks and local tests.
+
+Answers getChatMember with status "member" (after an optional artificial delay) and
+sendMessage with a fake message; every other method returns ok with an empty result.
+For the bot (bench/bench_bot.py) it also answers getMe, serves getUpdates (long polling)
+from updates queued with push_updates() or POST /updates, and logs the arrival time of
+every sendMessage per chat_id in `replies`.
+For broadcasts (bench/bench_broadcast.py) it counts deliveries per chat in `sends`, answers
+sendMessage with 429 + retry_after above STUB_TG_FLOOD_RPS messages per second (0 = never)
+and with 403 "bot was blocked" for every chat_id divisible by STUB_TG_BLOCKED_EVERY (0 = none).
+
+    python -m uvicorn bench.stub_telegram:app --port 8081
+    TELEGRAM_API_BASE=http://127.0.0.1:8081 TELEGRAM_BOT_TOKEN=bench uvicorn backend.main:app
+
+STUB_TG_LATENCY_MS adds a fixed delay per call (default 50, roughly a real round trip).
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import time
+from typing import Any, Dict, List
+from urllib.parse import parse_qsl
+
+from starlette.applications import Starlette
+from starlette.requests import ClientDisconnect, Request
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route
+
+LATENCY = float(os.getenv("STUB_TG_LATENCY_MS", "50")) / 1000.0
+FLOOD_RPS = int(os.getenv("STUB_TG_FLOOD_RPS", "0"))
+RETRY_AFTER = int(os.getenv("STUB_TG_RETRY_AFTER", "1"))
+BLOCKED_EVERY = int(os.getenv("STUB_TG_BLOCKED_EVERY", "0"))
+
+calls: Dict[str, Any] = {"total": 0, "methods": {}}
+pending_updates: List[Dict[str, Any]] = []
+updates_added = asyncio.Event()
+replies: Dict[int, float] = {}  # chat_id -> time.time() of the last sendMessage
+webhook: Dict[str, Any] = {}  # last setWebhook parameters
+sends: Dict[int, int] = {}  # chat_id -> delivered sendMessage count
+errors: Dict[int, int] = {}  # error_code -> count
+_window: Dict[str, float] = {"second": 0, "count": 0}
+
+
+def reset() -> None:
+    calls.update(total=0, methods={})
+    pending_updates.clear()
+    replies.clear()
+    webhook.clear()
+    sends.clear()
+    errors.clear()
+    _window.update(second=0, count=0)
+
+
+def _error(code: int, description: str, **parameters) -> JSONResponse:
+    errors[code] = errors.get(code, 0) + 1
+    body: Dict[str, Any] = {"ok": False, "error_code": code, "description": description}
+    if parameters:
+        body["parameters"] = parameters
+    return JSONResponse(body, status_code=code)
+
+
+def _flooded() -> bool:
+    second = int(time.monotonic())
+    if _window["second"] != second:
+        _window.update(second=second, count=0)
+    _window["count"] += 1
+    return _window["count"] > FLOOD_RPS
+
+
+def push_updates(updates: List[Dict[str, Any]]) -> None:
+    pending_updates.extend(updates)
+    updates_added.set()
+
+
+async def _params(request: Request) -> Dict[str, Any]:
+    body = await request.body()
+    if not body:
+        return {}
+    if request.headers.get("content-type", "").startswith("application/json"):
+        return json.loads(body)
+    # python-telegram-bot posts form fields with JSON-encoded values
+    params: Dict[str, Any] = {}
+    for key, value in parse_qsl(body.decode()):
+        try:
+            params[key] = json.loads(value)
+        except ValueError:
+            params[key] = value
+    return params
+
+
+async def _get_updates(params: Dict[str, Any]) -> List[Dict[str, Any]]:
+    offset = int(params.get("offset") or 0)
+    limit = int(params.get("limit") or 100)
+    # Updates below offset are confirmed by the bot
+    pending_updates[:] = [u for u in pending_updates if u["update_id"] >= offset]
+    deadline = time.monotonic() + float(params.get("timeout") or 0)
+    while not pending_updates:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        updates_added.clear()
+        try:
+            await asyncio.wait_for(updates_added.wait(), remaining)
+        except asyncio.TimeoutError:
+            break
+    return pending_updates[:limit]
+
+
+async def bot_method(request: Request):
+    calls["total"] += 1
+    method = request.path_params["method"]
+    calls["methods"][method] = calls["methods"].get(method, 0) + 1
+    if LATENCY:
+        await asyncio.sleep(LATENCY)
+    try:
+        params = await _params(request)
+    except ClientDisconnect:  # bot stopped while the call was delayed
+        return Response(status_code=499)
+    if method == "getChatMember":
+        result = {"status": "member", "user": {"id": params.get("user_id"), "is_bot": False, "first_name": "bench"}}
+    elif method == "sendMessage":
+        chat_id = int(params.get("chat_id") or 0)
+        if FLOOD_RPS and _flooded():
+            return _error(429, f"Too Many Requests: retry after {RETRY_AFTER}", retry_after=RETRY_AFTER)
+        if BLOCKED_EVERY and chat_id % BLOCKED_EVERY == 0:
+            return _error(403, "Forbidden: bot was blocked by the user")
+        replies[chat_id] = time.time()
+        sends[chat_id] = sends.get(chat_id, 0) + 1
+        result = {"message_id": calls["total"], "date": int(time.time()), "chat": {"id": chat_id, "type": "private"}}
+    elif method == "getMe":
+        result = {"id": 1, "is_bot": True, "first_name": "Stub", "username": "stub_bot"}
+    elif method == "getUpdates":
+        result = await _get_updates(params)
+    else:
+        if method == "setWebhook":
+            webhook.update(params)
+        result = True
+    return JSONResponse({"ok": True, "result": result})
+
+
+async def post_updates(request: Request):
+    push_updates(await request.json())
+    return JSONResponse({"queued": len(pending_updates)})
+
+
+async def stats(request: Request):
+    return JSONResponse({**calls, "replies": len(replies), "errors": errors})
+
+
+app = Starlette(
+    routes=[
+        Route("/bot{token}/{method}", bot_method, methods=["POST"]),
+        Route("/updates", post_updates, methods=["POST"]),
+        Route("/stats", stats),
+    ]
+)
@@ -27,6 +27,25 @@ WEBAPP_URL = os.getenv(
     "https://taptoearnton-production.up.railway.app/",
 )
 
+# Çalışma modu: "polling" (varsayılan) ya da "webhook".
+# Webhook modunda Telegram güncellemeleri WEBHOOK_URL'e POST eder; gömülü async HTTP sunucusu
+# (PORT üzerinde) X-Telegram-Bot-Api-Secret-Token başlığını WEBHOOK_SECRET ile doğrular.
+BOT_MODE = os.getenv("BOT_MODE", "polling")
+WEBHOOK_URL = os.getenv("WEBHOOK_URL", "")  # public base URL, e.g. https://bot.example.com
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "telegram")
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "")
+WEBHOOK_LISTEN = os.getenv("WEBHOOK_LISTEN", "0.0.0.0")
+PORT = int(os.getenv("PORT", "8443"))
+# Telegram'ın aynı anda açacağı webhook bağlantısı (1-100)
+WEBHOOK_MAX_CONNECTIONS = int(os.getenv("WEBHOOK_MAX_CONNECTIONS", "40"))
+# Aynı anda işlenen güncelleme sayısı (her iki modda); 1 = sırayla
+BOT_CONCURRENT_UPDATES = int(os.getenv("BOT_CONCURRENT_UPDATES", "64"))
+# Bot API adresi (testler / bench için yerel sahte sunucuya yönlendirilebilir)
+TELEGRAM_API_BASE = os.getenv("TELEGRAM_API_BASE", "https://api.telegram.org").rstrip("/")
+
+# Handler'lar yalnızca mesajları (komutlar + metin) işliyor; diğer güncelleme tiplerine abone olma
+ALLOWED_UPDATES = [Update.MESSAGE]
+
 if not BOT_TOKEN:
     raise RuntimeError(
         "BOT_TOKEN environment variable set edilmemiş. "
@@ -90,16 +109,43 @@ async def text_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) -> No
 # ---------------------------------------------------------------------
 # main
 # ---------------------------------------------------------------------
-def main() -> None:
-    application = ApplicationBuilder().token(BOT_TOKEN).build()
+def build_application():
+    application = (
+        ApplicationBuilder()
+        .token(BOT_TOKEN)
+        .base_url(f"{TELEGRAM_API_BASE}/bot")
+        .concurrent_updates(BOT_CONCURRENT_UPDATES)
+        .build()
+    )
 
     application.add_handler(CommandHandler("start", start))
     application.add_handler(CommandHandler("help", help_cmd))
     application.add_handler(CommandHandler("play", play))
     application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, text_handler))
+    return application
+
 
-    logger.info("Bot is starting...")
-    application.run_polling(allowed_updates=Update.ALL_TYPES)
+def main() -> None:
+    application = build_application()
+
+    if BOT_MODE == "webhook":
+        if not WEBHOOK_URL or not WEBHOOK_SECRET:
+            raise RuntimeError("webhook modu için WEBHOOK_URL ve WEBHOOK_SECRET gerekli")
+        logger.info("Bot is starting (webhook on :%s/%s)...", PORT, WEBHOOK_PATH)
+        application.run_webhook(
+            listen=WEBHOOK_LISTEN,
+            port=PORT,
+            url_path=WEBHOOK_PATH,
+            webhook_url=f"{WEBHOOK_URL.rstrip('/')}/{WEBHOOK_PATH}",
+            secret_token=WEBHOOK_SECRET,
+            allowed_updates=ALLOWED_UPDATES,
+            max_connections=WEBHOOK_MAX_CONNECTIONS,
+        )
+    elif BOT_MODE == "polling":
+        logger.info("Bot is starting (polling)...")
+        application.run_polling(allowed_updates=ALLOWED_UPDATES)
+    else:
+        raise RuntimeError(f"BOT_MODE polling ya da webhook olmalı (şu an: {BOT_MODE!r})")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,23 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+# backend reads its settings at import time, so they go in before the first import
+_DB_DIR = tempfile.mkdtemp(prefix="tapgame-tests-")
+os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(_DB_DIR, "test.db")
+os.environ["TAP_RATE_PER_SEC"] = "0"  # no limiter: the tests tap as fast as they like
+os.environ["STATIC_FINGERPRINT"] = "0"
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+
+@pytest.fixture(scope="session")
+def client():
+    from fastapi.testclient import TestClient
+
+    from backend.main import app
+
+    with TestClient(app) as c:
+        yield c
@@ -0,0 +1,95 @@
+"""backend/economy.py's closed forms against the per-level loops they replaced, on random states."""
+import random
+
+import pytest
+
+from backend.economy import (
+    LEVEL_XP_STEP, UPGRADE_COST_STEP, bulk_level_ups, level_up_reward, level_ups, max_upgrades, series_count,
+    upgrade_cost,
+)
+
+CASES = 2000
+
+
+def loop_level_ups(xp: int, next_level_xp: int):
+    """The former _maybe_level_up loop."""
+    levels = 0
+    while xp >= next_level_xp:
+        xp -= next_level_xp
+        next_level_xp += LEVEL_XP_STEP
+        levels += 1
+    return levels, xp, next_level_xp
+
+
+def loop_upgrades(tap_power: int, coins: int):
+    """One /api/upgrade_tap_power call per level until the balance runs out."""
+    n = spent = 0
+    while coins - spent >= UPGRADE_COST_STEP * (tap_power + n):
+        spent += UPGRADE_COST_STEP * (tap_power + n)
+        n += 1
+    return n, spent
+
+
+def loop_upgrade_cost(tap_power: int, count: int) -> int:
+    return sum(UPGRADE_COST_STEP * (tap_power + i) for i in range(count))
+
+
+def _level_state(rnd: random.Random):
+    level = rnd.randint(1, 500)
+    next_level_xp = LEVEL_XP_STEP * level
+    gained = rnd.choice((rnd.randint(0, 3 * next_level_xp), rnd.randint(0, 10**8)))
+    xp = rnd.randint(0, next_level_xp - 1)  # below the threshold before the xp came in
+    return level, xp + gained, next_level_xp
+
+
+def test_level_ups_match_loop():
+    rnd = random.Random(20)
+    for _ in range(CASES):
+        level, xp, next_level_xp = _level_state(rnd)
+        up = level_ups(xp, next_level_xp)
+        levels, left, nxt = loop_level_ups(xp, next_level_xp)
+        assert (up.levels, up.xp, up.next_level_xp) == (levels, left, nxt), (level, xp, next_level_xp)
+        assert up.xp_spent == xp - left
+        assert up.ton == level_up_reward(levels)
+
+
+def test_bulk_level_ups_match_loop():
+    rnd = random.Random(21)
+    rows = [(uid, *_level_state(rnd)[1:]) for uid in range(CASES)]
+    got = dict(bulk_level_ups(rows))
+    for uid, xp, next_level_xp in rows:
+        levels, left, nxt = loop_level_ups(xp, next_level_xp)
+        if levels == 0:
+            assert uid not in got
+        else:
+            assert (got[uid].levels, got[uid].xp, got[uid].next_level_xp) == (levels, left, nxt)
+
+
+def test_upgrades_match_loop():
+    rnd = random.Random(22)
+    for _ in range(CASES):
+        tap_power = rnd.randint(1, 2000)
+        coins = rnd.choice((rnd.randint(0, 5 * UPGRADE_COST_STEP * tap_power), rnd.randint(0, 10**10)))
+        count = rnd.randint(0, 50)
+        n = max_upgrades(tap_power, coins)
+        expected_n, expected_spent = loop_upgrades(tap_power, coins)
+        assert n == expected_n, (tap_power, coins)
+        assert upgrade_cost(tap_power, n) == expected_spent
+        assert upgrade_cost(tap_power, count) == loop_upgrade_cost(tap_power, count), (tap_power, count)
+
+
+@pytest.mark.parametrize(
+    "first, step, budget",
+    [(1000, 1000, 999), (1000, 1000, 1000), (1000, 1000, 2999), (1000, 1000, 3000), (500, 500, 10**12), (7, 0, 50)],
+)
+def test_series_count_edges(first, step, budget):
+    n, spent = 0, 0
+    while spent + first + step * n <= budget:
+        spent += first + step * n
+        n += 1
+    assert series_count(first, step, budget) == n
+
+
+def test_series_count_rejects_bad_series():
+    with pytest.raises(ValueError):
+        series_count(0, 1, 10)
@@ -0,0 +1,118 @@
+"""Leaderboard pages (keyset cursor) and the around_me window against a brute-force ranking."""
+import itertools
+from datetime import timedelta
+
+import pytest
+from sqlalchemy import text
+
+from backend import main
+from backend.db import engine
+
+_ids = itertools.count(5001)
+
+
+def _competition_ranks(entries):
+    """[(name, score)] in board order -> [(name, score, rank)], ties sharing the higher rank."""
+    out, rank = [], 0
+    for pos, (name, score) in enumerate(entries, 1):
+        if not out or score != out[-1][1]:
+            rank = pos
+        out.append((name, score, rank))
+    return out
+
+
+def _all_pages(client, limit, **params):
+    rows, cursor = [], None
+    while True:
+        page = client.get("/api/leaderboard", params={"limit": limit, **params, **({"cursor": cursor} if cursor else {})})
+        assert page.status_code == 200
+        body = page.json()
+        rows += [(r["name"], r["score"], r["rank"]) for r in body["leaderboard"]]
+        cursor = body["next_cursor"]
+        if cursor is None:
+            return rows
+
+
+@pytest.fixture(scope="module")
+def past_week(client):
+    """A past week with known scores and ties (its own board: no other test taps there)."""
+    yw = main._yearweek(main._today() - timedelta(weeks=3))
+    scores = [50, 40, 40, 40, 40, 30, 20, 20, 10, 10, 10]
+    users = {}
+    for score in scores:
+        tid = next(_ids)
+        assert client.post("/api/me", json={"telegram_id": tid, "name": f"LB {tid}"}).status_code == 200
+        users[f"LB {tid}"] = score
+    with engine.begin() as conn:
+        ids = dict(conn.execute(text("SELECT name, id FROM users WHERE name LIKE 'LB %'")).all())
+        conn.execute(
+            text("INSERT INTO weekly_scores (yearweek, user_id, score) VALUES (:yw, :uid, :score)"),
+            [{"yw": yw, "uid": ids[name], "score": score} for name, score in users.items()],
+        )
+    entries = sorted(users.items(), key=lambda e: (-e[1], ids[e[0]]))
+    return yw, _competition_ranks(entries)
+
+
+@pytest.mark.parametrize("limit", [1, 2, 3, 4, 5, 100])
+def test_ties_keep_their_rank_across_page_boundaries(client, past_week, limit):
+    yw, expected = past_week
+    assert _all_pages(client, limit, yearweek=yw) == expected
+    # the 40s straddle the boundary of 2- and 3-row pages and all share rank 2
+    assert [rank for _n, s, rank in expected if s == 40] == [2, 2, 2, 2]
+
+
+def test_around_me_for_a_zero_score_caller(client, past_week):
+    yw, expected = past_week
+    tid = next(_ids)
+    assert client.post("/api/me", json={"telegram_id": tid, "name": "Nobody"}).status_code == 200
+    r = client.get("/api/leaderboard", params={"telegram_id": tid, "window": "around_me", "radius": 3, "yearweek": yw})
+    body = r.json()
+    rows = [(row["name"], row["score"], row["rank"]) for row in body["leaderboard"]]
+    assert rows[:-1] == expected[-3:]  # the three lowest listed scores, with their board ranks
+    assert rows[-1] == ("Nobody", 0, len(expected) + 1)
+    assert body["leaderboard"][-1]["me"] is True
+    assert body["your_rank"] == len(expected) + 1
+    assert body["next_cursor"] is None
+
+
+def test_around_me_in_the_middle_of_a_tie(client, past_week):
+    yw, expected = past_week
+    name = [n for n, s, _r in expected if s == 40][2]
+    tid = int(name.split()[1])
+    body = client.get("/api/leaderboard", params={"telegram_id": tid, "window": "around_me", "radius": 2, "yearweek": yw}).json()
+    rows = [(row["name"], row["score"], row["rank"]) for row in body["leaderboard"]]
+    i = expected.index(next(e for e in expected if e[0] == name))
+    assert rows == expected[i - 2:i + 3]
+    assert body["your_rank"] == 2
+    # its cursor continues the board after the window
+    rest = _all_pages(client, 100, yearweek=yw, cursor=body["next_cursor"])
+    assert rest == expected[i + 3:]
+
+
+def _brute_force(scope):
+    if scope == "weekly":
+        sql = (
+            "SELECT u.name, u.telegram_id, w.score FROM weekly_scores w JOIN users u ON u.id = w.user_id"
+            " WHERE w.yearweek = :yw AND w.score > 0 ORDER BY w.score DESC, u.id"
+        )
+    else:
+        sql = (
+            "SELECT u.name, u.telegram_id, s.total_coins FROM user_stats s JOIN users u ON u.id = s.user_id"
+            " WHERE s.total_coins > 0 ORDER BY s.total_coins DESC, u.id"
+        )
+    with engine.connect() as conn:
+        rows = conn.execute(text(sql), {"yw": main._current_yearweek()}).all()
+    return _competition_ranks([(name or f"User {tid}", score) for name, tid, score in rows])
+
+
+@pytest.mark.parametrize("scope", ["weekly", "all_time"])
+def test_current_boards_match_brute_force(client, scope):
+    # a few tied scores on the live boards (first page from the rank index, later ones from SQL)
+    for _ in range(4):
+        tid = next(_ids)
+        client.post("/api/tap/batch", json={"telegram_id": tid, "name": f"Tie {tid}", "count": 7, "seq": 1})
+    main.leaderboard_snapshots[scope].writes = main.LEADERBOARD_SNAPSHOT_WRITES  # rebuild the top snapshot
+    expected = _brute_force(scope)
+    assert len(expected) > 3
+    for limit in (2, 3, 10):
+        assert _all_pages(client, limit, scope=scope) == expected
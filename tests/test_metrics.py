@@ -0,0 +1,39 @@
+import pytest
+from sqlalchemy import create_engine, text
+
+from backend import main
+from backend.metrics import DB_POOL_CHECKOUTS, DB_POOL_CONNECTS, DB_POOL_IN_USE, instrument_engine
+
+
+def test_metrics_are_off_by_default(client):
+    assert main.METRICS_ENABLED is False
+    assert client.get("/metrics").status_code == 404
+
+
+@pytest.fixture
+def metrics_on(monkeypatch):
+    monkeypatch.setattr(main, "METRICS_ENABLED", True)
+    monkeypatch.setattr(main, "METRICS_TOKEN", "s3cret")
+
+
+def test_metrics_token(client, metrics_on):
+    assert client.get("/metrics").status_code == 401
+    assert client.get("/metrics", headers={"Authorization": "Bearer wrong"}).status_code == 401
+    r = client.get("/metrics", headers={"Authorization": "Bearer s3cret"})
+    assert r.status_code == 200
+    assert "# TYPE db_pool_connections_in_use gauge" in r.text
+
+
+def test_pool_events(tmp_path):
+    eng = create_engine(f"sqlite:///{tmp_path / 'pool.db'}")
+    instrument_engine(eng, "test")
+    with eng.connect() as a, eng.connect() as b:
+        a.execute(text("SELECT 1"))
+        b.execute(text("SELECT 1"))
+        assert DB_POOL_IN_USE.value("test") == 2
+    assert DB_POOL_IN_USE.value("test") == 0
+    with eng.connect() as c:
+        c.execute(text("SELECT 1"))
+    assert DB_POOL_CHECKOUTS.value("test") == 3
+    assert DB_POOL_CONNECTS.value("test") == 2  # the third checkout reused a pooled connection
+    eng.dispose()
@@ -0,0 +1,39 @@
+from types import SimpleNamespace
+
+from sqlalchemy import create_engine, text
+
+from backend import migrations
+from backend.db import lift_statement_timeout
+
+
+class _FakePgConnection:
+    dialect = SimpleNamespace(name="postgresql")
+
+    def __init__(self):
+        self.executed = []
+
+    def execute(self, stmt, *args):
+        self.executed.append(str(stmt))
+
+
+def test_lift_statement_timeout_on_postgres():
+    conn = _FakePgConnection()
+    lift_statement_timeout(conn)
+    assert conn.executed == ["SET LOCAL statement_timeout = 0"]
+
+
+def test_lift_statement_timeout_is_noop_on_sqlite(tmp_path):
+    eng = create_engine(f"sqlite:///{tmp_path / 'm.db'}")
+    with eng.begin() as conn:
+        lift_statement_timeout(conn)
+        assert conn.execute(text("SELECT 1")).scalar() == 1
+
+
+def test_prepare_schema_lifts_the_timeout(monkeypatch, tmp_path):
+    lifted = []
+    monkeypatch.setattr(migrations, "lift_statement_timeout", lifted.append)
+    eng = create_engine(f"sqlite:///{tmp_path / 'm.db'}")
+    assert migrations.migrate_engine(eng) == []  # new database: created and stamped
+    assert len(lifted) == 1
+    with eng.connect() as conn:
+        assert all(applied for _v, _d, applied in migrations._status(conn))
@@ -0,0 +1,116 @@
+"""SQL statements per hot request, counted on the engine's after_cursor_execute event.
+
+/api/tap needs three: the user_stats UPDATE ... RETURNING, the weekly_scores upsert and the
+users SELECT for the payload (SQLite's RETURNING cannot return the users columns through
+UPDATE ... FROM, so that read stays separate).
+"""
+import itertools
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import event, text
+
+from backend.db import engine
+
+_ids = itertools.count(1001)
+
+
+@contextmanager
+def count_statements():
+    stmts = []
+
+    def on_execute(conn, cursor, statement, parameters, context, executemany):
+        stmts.append(statement)
+
+    event.listen(engine, "after_cursor_execute", on_execute)
+    try:
+        yield stmts
+    finally:
+        event.remove(engine, "after_cursor_execute", on_execute)
+
+
+@pytest.fixture
+def user(client):
+    tid = next(_ids)
+    assert client.post("/api/me", json={"telegram_id": tid, "name": "Test"}).status_code == 200
+    # First tap of the process also runs the daily/weekly reset check; get it out of the way
+    assert client.post("/api/tap", json={"telegram_id": tid}).status_code == 200
+    return tid
+
+
+def _verbs(stmts):
+    return [s.split()[0].upper() for s in stmts]
+
+
+def test_me_existing_user(client, user):
+    with count_statements() as stmts:
+        r = client.post("/api/me", json={"telegram_id": user, "name": "Renamed", "language": "tr"})
+    assert r.status_code == 200
+    assert r.json()["user"]["language"] == "tr"
+    assert _verbs(stmts) == ["INSERT", "SELECT", "SELECT"], stmts
+
+
+def test_tap(client, user):
+    with count_statements() as stmts:
+        r = client.post("/api/tap", json={"telegram_id": user})
+    assert r.status_code == 200
+    assert _verbs(stmts) == ["UPDATE", "INSERT", "SELECT"], stmts
+
+
+def test_tap_batch(client, user):
+    with count_statements() as stmts:
+        r = client.post("/api/tap/batch", json={"telegram_id": user, "count": 5, "seq": 1})
+    assert r.status_code == 200
+    assert _verbs(stmts) == ["UPDATE", "INSERT", "SELECT"], stmts
+
+
+def test_upgrade_tap_power(client, user):
+    with engine.begin() as conn:
+        conn.execute(
+            text("UPDATE user_stats SET coins = 100000 WHERE user_id = (SELECT id FROM users WHERE telegram_id = :t)"),
+            {"t": user},
+        )
+    with count_statements() as stmts:
+        r = client.post("/api/upgrade_tap_power", json={"telegram_id": user})
+    assert r.status_code == 200
+    assert r.json()["user"]["tap_power"] == 2
+    assert _verbs(stmts) == ["UPDATE", "SELECT", "SELECT"], stmts  # spend, users, weekly score
+
+    with count_statements() as stmts:
+        r = client.post("/api/upgrade_tap_power", json={"telegram_id": user, "count": 1000})
+    assert r.status_code == 400
+    assert _verbs(stmts) == ["UPDATE", "SELECT"], stmts  # missed spend, 404 check
+
+
+@pytest.fixture
+def user_updates():
+    """Counts UPDATEs of users rows (an upsert's DO UPDATE fires UPDATE triggers)."""
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE test_user_updates (telegram_id INTEGER)"))
+        conn.execute(text(
+            "CREATE TRIGGER test_count_user_updates AFTER UPDATE ON users"
+            " BEGIN INSERT INTO test_user_updates VALUES (NEW.telegram_id); END"
+        ))
+
+    def count(tid):
+        with engine.connect() as conn:
+            return conn.execute(text("SELECT COUNT(*) FROM test_user_updates WHERE telegram_id = :t"), {"t": tid}).scalar()
+
+    yield count
+    with engine.begin() as conn:
+        conn.execute(text("DROP TRIGGER test_count_user_updates"))
+        conn.execute(text("DROP TABLE test_user_updates"))
+
+
+def test_me_without_changes_does_not_rewrite_the_user(client, user, user_updates):
+    with count_statements() as stmts:
+        r = client.post("/api/me", json={"telegram_id": user, "name": "Other name", "language": "en"})
+    assert r.status_code == 200
+    assert r.json()["user"]["name"] == "Test"  # the name is only filled in when empty
+    assert _verbs(stmts) == ["INSERT", "SELECT", "SELECT"], stmts  # no-op upsert, users + stats, weekly score
+    assert client.post("/api/me", json={"telegram_id": user}).status_code == 200
+    assert user_updates(user) == 0
+
+    r = client.post("/api/me", json={"telegram_id": user, "language": "tr"})
+    assert r.json()["user"]["language"] == "tr"
+    assert user_updates(user) == 1
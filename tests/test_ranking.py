@@ -0,0 +1,73 @@
+import random
+
+from backend.ranking import Leaderboards, RankIndex
+
+
+class SmallRankIndex(RankIndex):
+    LOAD = 4  # tiny buckets: splits, empty buckets and the Fenwick tree rebuild get exercised
+
+
+def _sorted(scores):
+    """Brute force: (user_id, score) in (score DESC, user_id ASC) order, positive scores only."""
+    return sorted(((uid, s) for uid, s in scores.items() if s > 0), key=lambda e: (-e[1], e[0]))
+
+
+def _check(index, scores, rnd):
+    expected = _sorted(scores)
+    assert len(index) == len(expected)
+    assert index.top(len(expected) + 5) == expected
+    n = rnd.randint(0, len(expected))
+    assert index.top(n) == expected[:n]
+    for pos, (uid, s) in enumerate(expected, 1):
+        assert index.position(uid) == pos
+        assert index.score(uid) == s
+    for s in {0, 1, *(s for _uid, s in expected), max(scores.values(), default=0) + 1}:
+        assert index.rank_of_score(s) == 1 + sum(1 for _uid, other in expected if other > s), s
+    for uid in range(1, 60):
+        if scores.get(uid, 0) <= 0:
+            assert index.position(uid) is None
+            assert index.rank(uid) == len(expected) + 1
+
+
+def test_rank_index_matches_brute_force():
+    rnd = random.Random(5)
+    scores = {uid: rnd.choice((0, rnd.randint(1, 8), rnd.randint(1, 10**6))) for uid in range(1, 40)}
+    index = SmallRankIndex(scores.items())
+    _check(index, scores, rnd)
+    for step in range(3000):
+        uid = rnd.randint(1, 59)
+        # few distinct scores: lots of ties; 0 removes the entry
+        scores[uid] = rnd.choice((0, rnd.randint(1, 8), scores.get(uid, 0) + rnd.randint(1, 50)))
+        index.set(uid, scores[uid])
+        if step % 50 == 0:
+            _check(index, scores, rnd)
+    _check(index, scores, rnd)
+    index.reset()
+    assert len(index) == 0 and index.top(3) == [] and index.rank_of_score(0) == 1
+
+
+def test_rank_index_default_buckets_under_load():
+    rnd = random.Random(6)
+    scores = {uid: rnd.randint(0, 50) for uid in range(1, 5000)}
+    index = RankIndex(scores.items())
+    for _ in range(5000):
+        uid = rnd.randint(1, 5999)
+        scores[uid] = rnd.randint(0, 50)
+        index.set(uid, scores[uid])
+    expected = _sorted(scores)
+    assert index.top(len(expected)) == expected
+    for uid, _s in expected[::97]:
+        assert index.position(uid) == expected.index((uid, scores[uid])) + 1
+
+
+def test_leaderboards_weekly_rollover():
+    boards = Leaderboards()
+    boards.load(202510, [(1, 5), (2, 3)], [(1, 50)])
+    assert boards.ready and boards.weekly.rank(2) == 2
+    boards.set_weekly(202509, 3, 100)  # late write for a past week: ignored
+    assert boards.weekly.score(3) == 0
+    boards.set_weekly(202511, 2, 1)  # first write of a new week starts an empty board
+    assert boards.weekly_yearweek == 202511
+    assert boards.weekly.top(10) == [(2, 1)]
+    boards.set_all_time(2, 60)
+    assert boards.all_time.top(2) == [(2, 60), (1, 50)]
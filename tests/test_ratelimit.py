@@ -0,0 +1,134 @@
+import asyncio
+import itertools
+
+import pytest
+
+from backend import main
+from backend.ratelimit import LocalBucketStore, TokenBucketLimiter, make_bucket_store
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def _limiter(rate=10.0, burst=5.0, max_keys=100):
+    clock = FakeClock()
+    return TokenBucketLimiter(rate, burst, LocalBucketStore(max_keys=max_keys, clock=clock)), clock
+
+
+def _take(limiter, key, n):
+    return asyncio.run(limiter.take(key, n))
+
+
+def test_burst_then_empty():
+    limiter, _clock = _limiter()
+    assert _take(limiter, "u", 3) == 3
+    assert _take(limiter, "u", 3) == 2  # clamped to what is left
+    assert _take(limiter, "u", 1) == 0
+
+
+def test_refill_is_capped_at_burst():
+    limiter, clock = _limiter(rate=10, burst=5)
+    assert _take(limiter, "u", 5) == 5
+    clock.now += 0.25  # 2.5 tokens
+    assert _take(limiter, "u", 5) == 2
+    clock.now += 60
+    assert _take(limiter, "u", 100) == 5
+
+
+def test_refund_returns_tokens_up_to_burst():
+    limiter, _clock = _limiter(rate=10, burst=5)
+    assert _take(limiter, "u", 5) == 5
+    asyncio.run(limiter.refund("u", 3))
+    assert _take(limiter, "u", 5) == 3
+    asyncio.run(limiter.refund("u", 50))
+    assert _take(limiter, "u", 50) == 5
+
+
+def test_keys_are_independent_and_lru_bounded():
+    limiter, _clock = _limiter(burst=2, max_keys=2)
+    assert _take(limiter, "a", 2) == 2
+    assert _take(limiter, "b", 2) == 2
+    assert _take(limiter, "c", 2) == 2  # evicts "a", the least recently used
+    assert _take(limiter, "a", 2) == 2  # starts full again
+    assert _take(limiter, "c", 1) == 0
+
+
+def test_rate_zero_is_off():
+    limiter, _clock = _limiter(rate=0)
+    assert _take(limiter, "u", 10_000) == 10_000
+    assert _take(limiter, "u", -3) == 0
+
+
+def test_unknown_backend():
+    with pytest.raises(ValueError):
+        make_bucket_store("memcached")
+
+
+# ---- endpoints, with the limiter turned back on (tests/conftest.py sets TAP_RATE_PER_SEC=0) ----
+
+_ids = itertools.count(3001)
+
+
+@pytest.fixture
+def limited(monkeypatch):
+    limiter, clock = _limiter(rate=1, burst=5)
+    monkeypatch.setattr(main, "tap_limiter", limiter)
+    return limiter, clock
+
+
+@pytest.fixture
+def user(client):
+    tid = next(_ids)
+    assert client.post("/api/me", json={"telegram_id": tid, "name": "Test"}).status_code == 200
+    return tid
+
+
+def _tokens(limiter, tid):
+    return limiter.store._buckets[str(tid)][0]
+
+
+def test_tap_answers_429_when_the_bucket_is_empty(client, user, limited):
+    for _ in range(5):
+        assert client.post("/api/tap", json={"telegram_id": user}).status_code == 200
+    r = client.post("/api/tap", json={"telegram_id": user})
+    assert r.status_code == 429
+    assert r.headers["Retry-After"] == "1"
+
+
+def test_batch_is_clamped_to_the_granted_taps(client, user, limited):
+    r = client.post("/api/tap/batch", json={"telegram_id": user, "count": 8, "seq": 1})
+    assert r.status_code == 200
+    assert r.json()["applied"] == 5
+    r = client.post("/api/tap/batch", json={"telegram_id": user, "count": 8, "seq": 2})
+    assert r.status_code == 429
+
+
+def test_duplicate_batch_is_not_charged(client, user, limited):
+    limiter, _clock = limited
+    assert client.post("/api/tap/batch", json={"telegram_id": user, "count": 2, "seq": 1}).json()["applied"] == 2
+    left = _tokens(limiter, user)
+    r = client.post("/api/tap/batch", json={"telegram_id": user, "count": 2, "seq": 1})
+    assert r.json()["duplicate"]
+    assert _tokens(limiter, user) == left
+
+
+def test_unapplied_taps_are_refunded(client, user, limited, monkeypatch):
+    limiter, _clock = limited
+    monkeypatch.setattr(main, "TAP_MAX_PER_SEC", 1)  # plausibility: one tap per second since the last one
+    assert client.post("/api/tap", json={"telegram_id": user}).status_code == 200
+    r = client.post("/api/tap/batch", json={"telegram_id": user, "count": 4, "seq": 1})
+    assert r.json()["applied"] == 1
+    assert _tokens(limiter, user) == 3  # 5 - 1 tap - 1 applied from the batch
+
+    def locked(db, payload, count):
+        raise RuntimeError("database is locked")
+
+    monkeypatch.setattr(main, "_apply_tap_count", locked)
+    with pytest.raises(RuntimeError):
+        client.post("/api/tap/batch", json={"telegram_id": user, "count": 3, "seq": 2})
+    assert _tokens(limiter, user) == 3
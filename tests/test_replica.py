@@ -0,0 +1,99 @@
+"""Read routing with a second SQLite file standing in for the replica (it has the schema, no rows)."""
+import itertools
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from backend import db as dbmod
+from backend.db import ReplicaGuard
+from backend.migrations import migrate_engine
+
+_ids = itertools.count(6001)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 500.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def replica(client, monkeypatch, tmp_path):
+    eng = create_engine(f"sqlite:///{tmp_path / 'replica.db'}")
+    migrate_engine(eng)
+    clock = FakeClock()
+    guard = dbmod.replica_guard  # the instance main.py notes writes on
+    monkeypatch.setattr(dbmod, "REPLICA_ENABLED", True)
+    monkeypatch.setattr(
+        dbmod, "ReadSessionLocal",
+        sessionmaker(autoflush=False, expire_on_commit=False, bind=eng, info={"read_only": True}),
+    )
+    monkeypatch.setattr(guard, "clock", clock)
+    monkeypatch.setattr(guard, "window", 5.0)
+    monkeypatch.setattr(guard, "max_lag", 2.0)
+    monkeypatch.setattr(guard, "lag", 0.0)
+    monkeypatch.setattr(guard, "_written", {})
+    yield guard, clock
+    eng.dispose()
+
+
+def _served_by(client, tid):
+    """The replica has no users: /api/tasks answers 404 there and 200 on the primary."""
+    status = client.get("/api/tasks", params={"telegram_id": tid}).status_code
+    return {200: "primary", 404: "replica"}[status]
+
+
+def test_recent_writer_reads_from_the_primary_until_the_window_ends(client, replica):
+    guard, clock = replica
+    tid = next(_ids)
+    assert client.post("/api/me", json={"telegram_id": tid, "name": "Writer"}).status_code == 200
+    assert _served_by(client, tid) == "primary"
+    clock.now += 4.9
+    assert _served_by(client, tid) == "primary"
+    clock.now += 0.2
+    assert _served_by(client, tid) == "replica"
+    assert tid not in guard._written  # expired entries are dropped on read
+
+
+def test_other_users_read_from_the_replica(client, replica):
+    writer, reader = next(_ids), next(_ids)
+    for tid in (writer, reader):
+        assert client.post("/api/me", json={"telegram_id": tid}).status_code == 200
+    _guard, clock = replica
+    clock.now += 10
+    assert client.post("/api/tap", json={"telegram_id": writer}).status_code == 200
+    assert _served_by(client, writer) == "primary"
+    assert _served_by(client, reader) == "replica"
+
+
+def test_lagging_or_unreachable_replica_falls_back_to_the_primary(client, replica):
+    guard, clock = replica
+    tid = next(_ids)
+    assert client.post("/api/me", json={"telegram_id": tid}).status_code == 200
+    clock.now += 10
+    assert _served_by(client, tid) == "replica"
+    guard.lag = 2.5
+    assert _served_by(client, tid) == "primary"
+    guard.lag = 2.0  # at the threshold: still fresh enough
+    assert _served_by(client, tid) == "replica"
+    guard.lag = None  # lag could not be measured
+    assert _served_by(client, tid) == "primary"
+
+
+def test_guard_prunes_expired_writes_beyond_max_keys(monkeypatch):
+    monkeypatch.setattr(dbmod, "REPLICA_ENABLED", True)
+    clock = FakeClock()
+    guard = ReplicaGuard(window=5, max_lag=2, max_keys=3, clock=clock)
+    for key in (1, 2, 3):
+        guard.note_write(key)
+    clock.now += 6
+    guard.note_write(4)
+    guard.note_write(5)  # over max_keys: the expired 1..3 go
+    assert set(guard._written) == {4, 5}
+    assert guard.primary_reason(4) == "recent_write"
+    assert guard.primary_reason(1) is None
+    guard.note_write(None)
+    assert guard.primary_reason(None) is None
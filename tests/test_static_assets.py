@@ -0,0 +1,27 @@
+from backend.static_assets import StaticAssets
+
+
+def _write(path, body=b"x"):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(body)
+
+
+def test_only_web_assets_are_served(tmp_path):
+    _write(tmp_path / "index.html", b'<script src="/static/app.js?v=1"></script>')
+    _write(tmp_path / "app.js", b"console.log(1)")
+    _write(tmp_path / "icons" / "coin.png")
+    _write(tmp_path / "tonconnect-manifest.json", b"{}")
+    # single-folder mode: the backend directory itself
+    for name in ("taptoearnton.db", "main.py", "tasks.json", ".env", "requirements.txt"):
+        _write(tmp_path / name)
+    _write(tmp_path / ".git" / "index.js")
+    _write(tmp_path / "__pycache__" / "main.cpython-311.pyc")
+    _write(tmp_path / "__pycache__" / "stale.js")
+
+    assets = StaticAssets(str(tmp_path)).build()
+    originals = {p for p in assets.routes if p.startswith("/static/") and p.count(".") == 1}
+    assert originals == {
+        "/static/index.html", "/static/app.js", "/static/icons/coin.png", "/static/tonconnect-manifest.json",
+    }
+    assert set(assets.hashed) == {"app.js", "icons/coin.png"}
+    assert assets.hashed["app.js"] in assets.routes["/"].body.decode()
@@ -0,0 +1,55 @@
+import itertools
+
+import pytest
+
+from backend import main
+
+_ids = itertools.count(2001)
+
+
+@pytest.fixture
+def user(client):
+    tid = next(_ids)
+    assert client.post("/api/me", json={"telegram_id": tid, "name": "Test"}).status_code == 200
+    return tid
+
+
+def _batch(client, tid, seq, count=3):
+    return client.post("/api/tap/batch", json={"telegram_id": tid, "count": count, "seq": seq})
+
+
+def test_duplicate_seq_is_not_applied_twice(client, user):
+    first = _batch(client, user, 1).json()
+    again = _batch(client, user, 1).json()
+    assert first["applied"] == 3
+    assert again["duplicate"] and again["applied"] == 0
+    assert again["user"]["total_taps"] == first["user"]["total_taps"]
+
+
+def test_failed_apply_does_not_consume_seq(client, user, monkeypatch):
+    assert _batch(client, user, 1).json()["applied"] == 3
+    real_apply = main._apply_tap_count
+
+    def locked(db, payload, count):
+        raise RuntimeError("database is locked")
+
+    monkeypatch.setattr(main, "_apply_tap_count", locked)
+    with pytest.raises(RuntimeError):
+        _batch(client, user, 2)
+    monkeypatch.setattr(main, "_apply_tap_count", real_apply)
+
+    retry = _batch(client, user, 2).json()
+    assert not retry.get("duplicate")
+    assert retry["applied"] == 3
+    assert retry["user"]["total_taps"] == 6
+    assert _batch(client, user, 2).json()["duplicate"]
+
+
+def test_release_keeps_a_later_seq():
+    tid = next(_ids)
+    assert main._accept_tap_seq(tid, 5) == (True, None)
+    assert main._accept_tap_seq(tid, 6) == (True, 5)
+    main._release_tap_seq(tid, 5, None)  # seq 5's apply failed after 6 was accepted
+    assert main._is_duplicate_tap_seq(tid, 6)
+    main._release_tap_seq(tid, 6, 5)
+    assert not main._is_duplicate_tap_seq(tid, 6) and main._is_duplicate_tap_seq(tid, 5)
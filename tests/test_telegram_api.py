@@ -0,0 +1,48 @@
+import asyncio
+
+import httpx
+import pytest
+
+from backend.telegram_api import TelegramAPIError, TelegramClient, TelegramNetworkError
+
+
+def _client(responses):
+    """TelegramClient whose Bot API answers with the queued httpx.Responses."""
+    calls = []
+
+    def handler(request):
+        calls.append(request.url.path)
+        return responses.pop(0)
+
+    client = TelegramClient("TEST")
+    client._client = httpx.AsyncClient(base_url="https://api.test/botTEST", transport=httpx.MockTransport(handler))
+    return client, calls
+
+
+def test_html_error_page_is_a_network_error_and_not_cached():
+    member = {"ok": True, "result": {"status": "member"}}
+    client, calls = _client([
+        httpx.Response(502, text="<html><body>502 Bad Gateway</body></html>", headers={"content-type": "text/html"}),
+        httpx.Response(200, json=member),
+    ])
+
+    async def run():
+        with pytest.raises(TelegramNetworkError, match="HTTP 502"):
+            await client.get_chat_member("@chan", 1)
+        assert await client.get_chat_member("@chan", 1) == {"status": "member"}  # retried, not a cached failure
+        assert await client.get_chat_member("@chan", 1) == {"status": "member"}  # now cached
+        await client.aclose()
+
+    asyncio.run(run())
+    assert len(calls) == 2
+
+
+def test_api_error_is_still_an_api_error():
+    client, _calls = _client([httpx.Response(400, json={"ok": False, "error_code": 400, "description": "chat not found"})])
+
+    async def run():
+        with pytest.raises(TelegramAPIError):
+            await client.call("getChatMember", retries=0, chat_id="@nope", user_id=1)
+        await client.aclose()
+
+    asyncio.run(run())
@@ -0,0 +1,76 @@
+"""TAP_WRITE_BEHIND: buffered taps must count wherever scores are read from SQL."""
+import itertools
+from datetime import timedelta
+
+import pytest
+from sqlalchemy import text
+
+from backend import main
+from backend.db import SessionLocal, engine
+
+_ids = itertools.count(4001)
+
+
+@pytest.fixture
+def write_behind(client, monkeypatch):
+    monkeypatch.setattr(main, "TAP_WRITE_BEHIND", True)
+    yield
+    db = SessionLocal()
+    try:
+        main._flush_tap_buffer(db)
+    finally:
+        db.close()
+
+
+def _new_user(client, taps):
+    tid = next(_ids)
+    assert client.post("/api/me", json={"telegram_id": tid, "name": f"WB {tid}"}).status_code == 200
+    r = client.post("/api/tap/batch", json={"telegram_id": tid, "count": taps, "seq": 1})
+    assert r.json()["applied"] == taps
+    return tid
+
+
+def test_request_path_rollover_flushes_before_picking_the_winner(client, write_behind, monkeypatch):
+    winner = _new_user(client, 200)  # more than any other test user taps
+    with engine.connect() as conn:
+        before = conn.execute(text("SELECT last_weekly_reset_yearweek, last_weekly_winner_telegram_id FROM app_state")).one()
+    assert len(main.tap_buffer)
+
+    today = main._today()
+    monkeypatch.setattr(main, "_today", lambda: today + timedelta(weeks=1))
+    try:
+        assert client.post("/api/me", json={"telegram_id": next(_ids), "name": "Next week"}).status_code == 200
+        with engine.connect() as conn:
+            state = conn.execute(text("SELECT last_weekly_winner_telegram_id FROM app_state")).scalar()
+        assert state == winner
+    finally:
+        monkeypatch.undo()
+        with engine.begin() as conn:
+            conn.execute(
+                text("UPDATE app_state SET last_weekly_reset_yearweek = :yw, last_weekly_winner_telegram_id = :w"),
+                {"yw": before[0], "w": before[1]},
+            )
+        main._reset_epoch.update(day=None, yearweek=None)
+
+
+def test_sql_leaderboard_reads_include_buffered_taps(client, write_behind):
+    a = _new_user(client, 150)
+    b = _new_user(client, 140)
+    assert len(main.tap_buffer)
+
+    r = client.get("/api/leaderboard", params={"telegram_id": b, "window": "around_me", "radius": 1}).json()
+    scores = {row["name"]: row["score"] for row in r["leaderboard"]}
+    assert scores[f"WB {a}"] == 150 and scores[f"WB {b}"] == 140
+
+    # Pages after the first are keyset queries on SQL
+    rows, cursor = [], None
+    while len(rows) < 5:
+        params = {"limit": 1, **({"cursor": cursor} if cursor else {})}
+        page = client.get("/api/leaderboard", params=params).json()
+        rows += page["leaderboard"]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    by_name = {row["name"]: row for row in rows}
+    assert by_name[f"WB {a}"]["score"] == 150 and by_name[f"WB {b}"]["score"] == 140
+    assert by_name[f"WB {b}"]["rank"] == by_name[f"WB {a}"]["rank"] + 1
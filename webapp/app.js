@@ -208,7 +208,6 @@ function t(key) { return (I18N[locale] && I18N[locale][key]) || I18N.en[key] ||
 // ---- User state ----
 let user = null;
 let taskOpenTimes = {}; // taskId -> timestamp
-let isTapping = false;
 
 // ---- Adsgram ----
 // Replace with your real block ids later
@@ -239,12 +238,15 @@ function pickAdsBlockId(storageKey, serverValue) {
 let SERVER_CONFIG = null;
 async function loadServerConfig() {
   try {
-    SERVER_CONFIG = await apiFetch("/api/config");
+    applyServerConfig(await apiFetch("/api/config"));
   } catch (e) {
     console.warn("Failed to load /api/config:", e);
-    SERVER_CONFIG = null;
+    applyServerConfig(null);
   }
+}
 
+function applyServerConfig(cfg) {
+  SERVER_CONFIG = cfg;
   const autoFromServer =
     SERVER_CONFIG && SERVER_CONFIG.adsgram_interstitial_block_id
       ? String(SERVER_CONFIG.adsgram_interstitial_block_id).trim()
@@ -444,29 +446,31 @@ function calcUpgradeCost(u) {
 
 function updateUI() {
   if (!user) return;
+  // server state + taps the server has not confirmed yet
+  const view = displayUser();
 
-  el("coins").textContent = user.coins.toString();
-  el("tonCredits").textContent = (user.ton_credits ?? 0).toFixed(1);
-  el("level").textContent = user.level.toString();
-  el("tapPower").textContent = user.tap_power.toString();
-  el("weeklyScore").textContent = user.weekly_score.toString();
-  el("totalTaps").textContent = user.total_taps.toString();
+  el("coins").textContent = view.coins.toString();
+  el("tonCredits").textContent = (view.ton_credits ?? 0).toFixed(1);
+  el("level").textContent = view.level.toString();
+  el("tapPower").textContent = view.tap_power.toString();
+  el("weeklyScore").textContent = view.weekly_score.toString();
+  el("totalTaps").textContent = view.total_taps.toString();
 
-  const xpPct = user.next_level_xp > 0 ? (user.xp / user.next_level_xp) * 100 : 0;
+  const xpPct = view.next_level_xp > 0 ? (view.xp / view.next_level_xp) * 100 : 0;
   el("xpFill").style.width = `${clamp(xpPct, 0, 100)}%`;
-  el("xpText").textContent = `${user.xp} / ${user.next_level_xp} XP`;
+  el("xpText").textContent = `${view.xp} / ${view.next_level_xp} XP`;
 
   el("upgradeCost").textContent = calcUpgradeCost(user).toString();
 
   // settings toggles
-  el("soundToggle").checked = !!user.sound_enabled;
-  el("vibrationToggle").checked = !!user.vibration_enabled;
-  el("notifToggle").checked = !!user.notifications_enabled;
-  el("langSelect").value = user.language || locale;
-
-  if (user.wallet_address) {
-    el("walletInput").value = user.wallet_address;
-    el("walletStatus").textContent = `${t("connected")}: ${user.wallet_address.slice(0, 6)}…${user.wallet_address.slice(-4)}`;
+  el("soundToggle").checked = !!view.sound_enabled;
+  el("vibrationToggle").checked = !!view.vibration_enabled;
+  el("notifToggle").checked = !!view.notifications_enabled;
+  el("langSelect").value = view.language || locale;
+
+  if (view.wallet_address) {
+    el("walletInput").value = view.wallet_address;
+    el("walletStatus").textContent = `${t("connected")}: ${view.wallet_address.slice(0, 6)}…${view.wallet_address.slice(-4)}`;
   } else {
     el("walletStatus").textContent = t("notConnected");
   }
@@ -523,6 +527,7 @@ function renderTasks(tasks) {
       const openAgeSec = openedAt ? Math.floor((Date.now() - openedAt) / 1000) : 0;
 
       try {
+        await flushTaps();
         const res = await apiFetch("/api/task/check", {
           method: "POST",
           body: JSON.stringify({ telegram_id: userId, task_id: task.id, open_age_sec: openAgeSec }),
@@ -557,7 +562,10 @@ function renderTasks(tasks) {
 }
 
 async function loadTasks() {
-  const data = await apiFetch(`/api/tasks?telegram_id=${encodeURIComponent(userId)}`);
+  renderTasksData(await apiFetch(`/api/tasks?telegram_id=${encodeURIComponent(userId)}`));
+}
+
+function renderTasksData(data) {
   const tasks = data.tasks || [];
   renderTasks(tasks);
 
@@ -569,6 +577,7 @@ async function loadTasks() {
 // ---- Settings save ----
 async function saveSettings(partial) {
   if (!userId) return;
+  await flushTaps();
   const data = await apiFetch("/api/settings", {
     method: "POST",
     body: JSON.stringify({ telegram_id: userId, ...partial }),
@@ -584,44 +593,222 @@ async function loadUser() {
     method: "POST",
     body: JSON.stringify({ telegram_id: userId, name: userName, language: langGuess }),
   });
-  user = data.user;
+  setLoadedUser(data.user, langGuess);
+}
+
+function setLoadedUser(u, langGuess) {
+  user = u;
   locale = user.language || langGuess;
   applyLocaleTexts();
   updateUI();
 }
 
+// One round trip at launch: config, user, tasks and the weekly leaderboard.
+// Tasks/leaderboard are rendered right away so the first modal open needs no request.
+async function bootstrap() {
+  const langGuess = (tgLang === "tr" ? "tr" : "en");
+  const data = await apiFetch("/api/bootstrap", {
+    method: "POST",
+    body: JSON.stringify({ telegram_id: userId, name: userName, language: langGuess }),
+  });
+  applyServerConfig(data.config);
+  setLoadedUser(data.user, langGuess);
+  renderTasksData(data);
+  if (data.leaderboard) renderLeaderboard(data.leaderboard);
+  bootPrefetched = true;
+}
+
 // ---- Tap handler ----
-async function handleTap() {
-  if (!userId || isTapping) return;
-  isTapping = true;
+// Taps are counted locally, shown immediately and sent in batches: over the /ws socket
+// when it is connected, otherwise to /api/tap/batch on a short timer (or when the page
+// is hidden). `user` always holds the last server state; the UI adds unconfirmed taps.
+const TAP_FLUSH_MS = 1000;
+const WS_SEND_MS = 100;
+let pendingTaps = 0;   // taps not sent yet
+let tapBatch = null;   // HTTP batch {seq, count} not acknowledged yet; resent unchanged until it is
+let tapBatchSend = null; // promise of the request carrying tapBatch
+let tapSeq = Date.now(); // monotonic across reloads
+let tapFlushTimer = null;
+
+function applyLocalTaps(u, n) {
+  if (!u || n <= 0) return;
+  const gained = (u.tap_power || 1) * n;
+  u.coins += gained;
+  u.total_coins += gained;
+  u.weekly_score += gained;
+  u.total_taps += n;
+  u.xp += n;
+}
+
+function unconfirmedTaps() {
+  return pendingTaps + (tapBatch ? tapBatch.count : 0) + (wsSent - wsAcked);
+}
+
+function displayUser() {
+  const n = unconfirmedTaps();
+  if (!user || n <= 0) return user;
+  const u = { ...user };
+  applyLocalTaps(u, n);
+  return u;
+}
+
+function scheduleTapFlush() {
+  const ms = wsReady && !tapBatch ? WS_SEND_MS : TAP_FLUSH_MS;
+  if (!tapFlushTimer) tapFlushTimer = setTimeout(() => flushTaps(), ms);
+}
+
+function handleTap() {
+  if (!userId || !user) return;
 
   playCoinSound();
   vibrate();
 
+  pendingTaps += 1;
+  updateUI();
+
+  // Auto ad each 100 taps (client-side trigger)
+  if ((user.total_taps + unconfirmedTaps()) % 100 === 0) {
+    // don't block tapping too long; fire and forget
+    showAd(AdAuto, { silent: true }).catch(() => {});
+  }
+
+  scheduleTapFlush();
+}
+
+async function flushTaps(opts = {}) {
+  if (tapFlushTimer) {
+    clearTimeout(tapFlushTimer);
+    tapFlushTimer = null;
+  }
+  // An unacknowledged HTTP batch goes first, with its seq (also once the socket is up)
+  if (tapBatch) await sendTapBatch(opts);
+  if (wsReady) {
+    sendWsTaps();
+    // before other API calls: wait until the server has applied everything we sent
+    if (!opts.keepalive) await waitWsAcked();
+    return;
+  }
+  if (!userId || tapBatch || pendingTaps <= 0) return;
+
+  tapSeq += 1;
+  tapBatch = { seq: tapSeq, count: pendingTaps };
+  pendingTaps = 0;
+  await sendTapBatch(opts);
+}
+
+function sendTapBatch(opts = {}) {
+  if (!tapBatchSend) tapBatchSend = postTapBatch(tapBatch, opts).finally(() => { tapBatchSend = null; });
+  return tapBatchSend;
+}
+
+async function postTapBatch(batch, opts) {
   try {
-    const data = await apiFetch("/api/tap", {
+    const data = await apiFetch("/api/tap/batch", {
       method: "POST",
-      body: JSON.stringify({ telegram_id: userId, name: userName, language: locale }),
+      keepalive: !!opts.keepalive,
+      body: JSON.stringify({ telegram_id: userId, count: batch.count, seq: batch.seq, name: userName, language: locale }),
     });
     if (data?.user) user = data.user;
-    updateUI();
-
-    // Auto ad each 100 taps (client-side trigger)
-    if (user?.total_taps && user.total_taps % 100 === 0) {
-      // don't block tapping too long; fire and forget
-      showAd(AdAuto, { silent: true }).catch(() => {});
-    }
+    tapBatch = null;
   } catch (e) {
-    webAlert(e.message || "Tap failed");
+    // Same seq and count next time: if the server applied it and only the response was
+    // lost, the retry is answered as a duplicate instead of counting the taps twice
+    console.warn("Tap flush failed:", e);
   } finally {
-    isTapping = false;
+    updateUI();
+    if (tapBatch || pendingTaps > 0) scheduleTapFlush();
   }
 }
 
+document.addEventListener("visibilitychange", () => {
+  if (document.visibilityState === "hidden") flushTaps({ keepalive: true });
+});
+window.addEventListener("pagehide", () => flushTaps({ keepalive: true }));
+
+// ---- WebSocket tap channel ----
+// Authenticated once with Telegram initData; frames are "t<count>", the server answers with
+// the changed fields of the user state (compact keys) and "k" = taps it has processed.
+const WS_FIELDS = {
+  c: "coins", tc: "total_coins", x: "xp", nx: "next_level_xp", l: "level",
+  w: "weekly_score", n: "total_taps", tp: "tap_power", ton: "ton_credits",
+};
+const WS_ACK_TIMEOUT_MS = 3000;
+let ws = null;
+let wsReady = false;
+let wsSent = 0;   // taps sent over the current socket
+let wsAcked = 0;  // of which the server has processed
+let wsAckWaiters = [];
+let wsRetryMs = 1000;
+
+function connectTapSocket() {
+  if (!tg?.initData || !("WebSocket" in window)) return;
+  const proto = location.protocol === "https:" ? "wss" : "ws";
+  const sock = new WebSocket(`${proto}://${location.host}/ws?init_data=${encodeURIComponent(tg.initData)}`);
+  let opened = false;
+
+  sock.onopen = () => {
+    opened = true;
+    ws = sock;
+    wsReady = true;
+    wsSent = 0;
+    wsAcked = 0;
+    wsRetryMs = 1000;
+  };
+  sock.onmessage = (ev) => {
+    let msg;
+    try { msg = JSON.parse(ev.data); } catch { return; }
+    if (user) {
+      for (const [k, field] of Object.entries(WS_FIELDS)) {
+        if (msg[k] !== undefined) user[field] = msg[k];
+      }
+    }
+    if (msg.k !== undefined) wsAcked = msg.k;
+    if (wsAcked >= wsSent) {
+      wsAckWaiters.forEach((resolve) => resolve());
+      wsAckWaiters = [];
+    }
+    updateUI();
+  };
+  sock.onclose = () => {
+    // Unconfirmed taps of this socket are dropped rather than risk applying them twice;
+    // new taps go over HTTP until the socket is back.
+    ws = null;
+    wsReady = false;
+    wsSent = 0;
+    wsAcked = 0;
+    wsAckWaiters.forEach((resolve) => resolve());
+    wsAckWaiters = [];
+    updateUI();
+    if (pendingTaps > 0) scheduleTapFlush();
+    // Rejected at connect (e.g. server without WS auth): stay on HTTP
+    if (!opened) return;
+    setTimeout(connectTapSocket, wsRetryMs);
+    wsRetryMs = Math.min(wsRetryMs * 2, 30000);
+  };
+}
+
+function sendWsTaps() {
+  if (!wsReady || pendingTaps <= 0) return;
+  const count = Math.min(pendingTaps, 200);
+  ws.send(count === 1 ? "t" : `t${count}`);
+  pendingTaps -= count;
+  wsSent += count;
+  if (pendingTaps > 0) scheduleTapFlush();
+}
+
+function waitWsAcked() {
+  if (!wsReady || wsAcked >= wsSent) return Promise.resolve();
+  return new Promise((resolve) => {
+    wsAckWaiters.push(resolve);
+    setTimeout(resolve, WS_ACK_TIMEOUT_MS);
+  });
+}
+
 // ---- Upgrade ----
 async function handleUpgrade() {
   if (!userId) return;
   try {
+    await flushTaps();
     const data = await apiFetch("/api/upgrade_tap_power", {
       method: "POST",
       body: JSON.stringify({ telegram_id: userId }),
@@ -644,6 +831,7 @@ async function handleWatchAd() {
 
   // then credit
   try {
+    await flushTaps();
     const data = await apiFetch("/api/adwatched", {
       method: "POST",
       body: JSON.stringify({ telegram_id: userId }),
@@ -660,7 +848,10 @@ async function handleWatchAd() {
 
 // ---- Leaderboard ----
 async function loadLeaderboard(scope) {
-  const data = await apiFetch(`/api/leaderboard?scope=${encodeURIComponent(scope)}&telegram_id=${encodeURIComponent(userId)}`);
+  renderLeaderboard(await apiFetch(`/api/leaderboard?scope=${encodeURIComponent(scope)}&telegram_id=${encodeURIComponent(userId)}`));
+}
+
+function renderLeaderboard(data) {
   const list = el("leaderList");
   list.innerHTML = "";
 
@@ -682,12 +873,15 @@ function bindUI() {
 
   el("tasksBtn").addEventListener("click", async () => {
     showModal("tasksModal");
+    if (consumePrefetched("tasks")) return;
     await loadTasks();
   });
   el("closeTasks").addEventListener("click", () => hideModal("tasksModal"));
 
   el("btnLeaderboard").addEventListener("click", async () => {
     showModal("leaderModal");
+    el("lbWeekly").checked = true;
+    if (consumePrefetched("leaderboard")) return;
     await loadLeaderboard("weekly");
   });
   el("closeLeader").addEventListener("click", () => hideModal("leaderModal"));
@@ -725,21 +919,44 @@ function bindUI() {
 window.addEventListener("load", () => { try { initAds(); } catch(e) {} });
 
 // ---- Boot ----
+let bootPrefetched = false;
+const bootConsumed = new Set();
+
+// true the first time a modal opens after /api/bootstrap already rendered its content
+function consumePrefetched(name) {
+  if (!bootPrefetched || bootConsumed.has(name)) return false;
+  bootConsumed.add(name);
+  return true;
+}
+
 (async function boot() {
-  await loadServerConfig();
-  initAds();
-  initTonConnect();
+  const t0 = performance.now();
   bindUI();
 
   if (!userId) {
+    await loadServerConfig();
+    initAds();
+    initTonConnect();
     webAlert("Telegram user id not found. Open inside Telegram Mini App.");
     return;
   }
 
   try {
-    await loadUser();
+    try {
+      await bootstrap();
+    } catch (e) {
+      // older server without /api/bootstrap: the previous sequence
+      console.warn("bootstrap failed, falling back:", e);
+      await loadServerConfig();
+      await loadUser();
+    }
+    console.info(`time to interactive: ${Math.round(performance.now() - t0)} ms`);
+    connectTapSocket();
   } catch (e) {
     console.error(e);
     webAlert(e.message || "Failed to load user");
+  } finally {
+    initAds();
+    initTonConnect();
   }
 })();